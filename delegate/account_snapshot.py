@@ -0,0 +1,255 @@
+import copy
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+# --------------------------------
+# 内存中的持仓与资产快照，盘中策略读取时不再同步查询券商接口
+# 成交回调先在快照上做增量修正，再由后台线程全量查询对账：
+#   1. 按 sync_interval 秒的慢节奏定期对账
+#   2. 收到委托、成交回调后请求一次尽快对账，min_gap 秒内的多次请求合并成一次
+# 下单时在快照上冻结：买单扣减可用资金，卖单扣减可用股数，撤单、废单时解冻剩余部分
+# 对账结果总是采用，查询开始时券商还没有确认的委托，冻结重新叠加在结果上
+# 查询期间如果又收到了回调，结果可能缺少这部分变化，采用后再对账一次
+# --------------------------------
+class AccountSnapshot:
+    def __init__(
+        self,
+        query_positions: Callable[[], List],
+        query_asset: Callable[[], object],
+        new_position: Callable[[str, int, float], object],    # 买入成交但快照里还没有该持仓时创建持仓对象
+        sync_interval: float = 60.0,
+        min_gap: float = 1.0,
+        confirm_timeout: float = 30.0,  # 下单后超过这么久还没有委托回调（如下单出错），对账时不再叠加冻结
+    ):
+        self.query_positions = query_positions
+        self.query_asset = query_asset
+        self.new_position = new_position
+        self.sync_interval = sync_interval
+        self.min_gap = min_gap
+        self.confirm_timeout = confirm_timeout
+
+        self.lock = threading.Lock()
+        self.positions: Dict[str, object] = {}
+        self.asset = None
+        self.version = 0            # 每次回调修正快照时递增，用来识别查询期间发生的变化
+        self.pending: Dict[int, PendingOrder] = {}      # { 本地序号: 在途委托 }
+        self.next_token = 1
+        self.synced = False
+        self.last_sync = 0.0
+
+        self.sync_event = threading.Event()
+        self.stopped = False
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run_sync, daemon=True)
+            self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped = True
+        self.sync_event.set()
+
+    def run_sync(self) -> None:
+        while not self.stopped:
+            self.sync_event.wait(self.sync_interval)
+            self.sync_event.clear()
+            if self.stopped:
+                break
+
+            wait = self.min_gap - (time.monotonic() - self.last_sync)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                self.sync()
+            except Exception as e:
+                print(f'持仓快照对账失败: {e}')
+
+    def request_sync(self) -> None:
+        self.sync_event.set()
+
+    # 全量查询并替换快照，再叠加券商还没有确认的委托的冻结，返回 False 表示查询期间快照有变化，需要再对账
+    def sync(self) -> bool:
+        with self.lock:
+            version = self.version
+            expire = time.monotonic() - self.confirm_timeout
+            expired = [token for token, order in self.pending.items() if not order.confirmed and order.created < expire]
+            closed = [token for token, order in self.pending.items() if order.closed]
+            unconfirmed = {token: order.frozen for token, order in self.pending.items() if not order.confirmed}
+
+        positions = self.query_positions()
+        asset = self.query_asset()
+
+        with self.lock:
+            self.last_sync = time.monotonic()
+            self.positions = {position.stock_code: position for position in positions}
+            self.asset = asset
+            self.synced = True
+
+            # 查询前已经结束的委托，查询结果里已经没有它的冻结
+            for token in closed + expired:
+                self.pending.pop(token, None)
+                unconfirmed.pop(token, None)
+            for token, frozen in unconfirmed.items():
+                order = self.pending.get(token)
+                if order is not None and frozen > 0:
+                    order.frozen = frozen
+                    self.freeze(order, frozen)
+
+            if self.version != version:
+                self.sync_event.set()
+                return False
+            return True
+
+    def ensure_synced(self) -> None:
+        if not self.synced:
+            self.sync()
+
+    def get_positions(self) -> List:
+        self.ensure_synced()
+        with self.lock:
+            return list(self.positions.values())
+
+    def get_asset(self):
+        self.ensure_synced()
+        with self.lock:
+            return self.asset
+
+    # ==========
+    # 回调修正
+    # ==========
+
+    # 券商推送的单个持仓是最新的完整状态，直接替换
+    def on_position(self, position) -> None:
+        with self.lock:
+            self.positions[position.stock_code] = position
+            self.version += 1
+
+    def on_asset(self, asset) -> None:
+        with self.lock:
+            self.asset = asset
+            self.version += 1
+
+    # ==========
+    # 在途委托
+    # ==========
+
+    # 快照上冻结或解冻（volume 为负）一笔委托的数量，买单按委托价冻结资金
+    def freeze(self, order: 'PendingOrder', volume: int) -> None:
+        if order.is_buy:
+            if self.asset is not None:
+                self.asset = copy.copy(self.asset)
+                self.asset.cash -= volume * order.price
+        else:
+            position = self.positions.get(order.code)
+            if position is not None:
+                position = copy.copy(position)
+                position.can_use_volume = max(0, min(position.can_use_volume - volume, position.volume))
+                self.positions[order.code] = position
+
+    # 下单时冻结，返回本地序号，提交失败时用它解冻
+    def on_submit(self, code: str, is_buy: bool, volume: int, price: float) -> int:
+        with self.lock:
+            token = self.next_token
+            self.next_token += 1
+            order = PendingOrder(code, is_buy, volume, price)
+            self.pending[token] = order
+            self.freeze(order, volume)
+            self.version += 1
+            return token
+
+    def on_submit_failed(self, token: int) -> None:
+        with self.lock:
+            order = self.pending.pop(token, None)
+            if order is not None:
+                self.freeze(order, -order.frozen)
+                self.version += 1
+
+    # 按委托编号找在途委托，还没有对应上的按同代码同方向最早的一笔对应
+    def find_pending(self, order_id, code: str, is_buy: bool) -> Optional['PendingOrder']:
+        candidate = None
+        for order in self.pending.values():
+            if order.order_id is not None and order.order_id == order_id:
+                return order
+            if candidate is None and order.order_id is None and order.code == code and order.is_buy == is_buy:
+                candidate = order
+        if candidate is not None:
+            candidate.order_id = order_id
+        return candidate
+
+    # 委托回调：券商已确认的委托对账时不再叠加冻结，结束（成交、撤单、废单）时解冻不会再成交的部分
+    def on_order(self, order_id, code: str, is_buy: bool, order_volume: int, traded_volume: int,
+                 finished: bool) -> None:
+        with self.lock:
+            order = self.find_pending(order_id, code, is_buy)
+            if order is not None:
+                order.confirmed = True
+                if finished and not order.closed:
+                    order.closed = True
+                    release = min(order.frozen, max(0, order_volume - traded_volume))
+                    order.frozen -= release
+                    self.freeze(order, -release)
+                    self.drop_if_done(order_id)
+                self.version += 1
+        self.request_sync()
+
+    def drop_if_done(self, order_id) -> None:
+        for token, order in list(self.pending.items()):
+            if order.order_id == order_id and order.closed and order.frozen <= 0:
+                del self.pending[token]
+
+    # ==========
+    # 回调修正
+    # ==========
+
+    # 成交后按成交量和成交价修正持仓数量与可用资金，手续费等细节等对账时更新
+    # 在途委托的成交先消耗下单时的冻结：卖出的股数已经从可用中扣掉，买入按成交金额替换冻结金额
+    def on_trade(self, code: str, is_buy: bool, volume: int, price: float, order_id=None) -> None:
+        with self.lock:
+            pending = self.find_pending(order_id, code, is_buy)
+            consumed = 0
+            if pending is not None:
+                consumed = min(volume, pending.frozen)
+                pending.frozen -= consumed
+                self.drop_if_done(order_id)
+
+            position = self.positions.get(code)
+            if position is None:
+                position = self.new_position(code, 0, price)
+            else:
+                position = copy.copy(position)  # 不修改已经返回给调用方的对象
+
+            amount = volume * price
+            if is_buy:
+                position.volume += volume   # T+1，当日买入不增加可用数量
+            else:
+                position.volume -= volume
+                # 卖出的股数在下单时（或券商受理时）已经从可用中扣掉，这里只保证不超过持仓
+                position.can_use_volume = max(0, min(position.can_use_volume, position.volume))
+            self.positions[code] = position
+
+            if self.asset is not None:
+                self.asset = copy.copy(self.asset)
+                if is_buy:
+                    unfrozen = consumed * pending.price if pending is not None else 0.0
+                    self.asset.cash += unfrozen - amount
+                else:
+                    self.asset.cash += amount
+
+            self.version += 1
+        self.request_sync()
+
+
+# 本进程提交、还没有结束的委托
+class PendingOrder:
+    def __init__(self, code: str, is_buy: bool, volume: int, price: float):
+        self.code = code
+        self.is_buy = is_buy
+        self.price = price
+        self.frozen = volume        # 快照上仍然冻结的数量
+        self.created = time.monotonic()
+        self.order_id = None        # 收到回调后对应上的委托编号
+        self.confirmed = False      # 已收到券商的委托回调，对账结果里已经包含它的冻结
+        self.closed = False         # 委托已结束，剩余冻结等成交回调消耗
@@ -1,3 +1,4 @@
+import contextlib
 from abc import ABC, abstractmethod
 
 
@@ -5,6 +6,14 @@ class BaseDelegate(ABC):
     def __init__(self):
         self.callback = None
 
+    # 批量下单：with delegate.order_batch(name) 内的委托可以异步提交，默认逐笔同步提交
+    def order_batch(self, name: str):
+        return contextlib.nullcontext()
+
+    # 当前线程正在进行的批次，不在批次内时为 None
+    def current_batch(self):
+        return None
+
     @abstractmethod
     def check_asset(self):
         pass
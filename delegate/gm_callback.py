@@ -10,6 +10,15 @@ from tools.utils_cache import record_deal, new_held, del_key, StockNames
 from tools.utils_ding import DingMessager
 
 
+# 不会再有成交的委托状态，快照收到后解冻剩余部分
+FINISHED_ORDER_STATUS = (
+    OrderStatus_Filled,
+    OrderStatus_Canceled,
+    OrderStatus_Rejected,
+    OrderStatus_Expired,
+)
+
+
 class GmCallback:
     def __init__(
         self,
@@ -33,6 +42,7 @@ class GmCallback:
 
         self.stock_names = StockNames()
         self.debug: bool = debug
+        self.delegate = None    # 由 GmDelegate 注册时设置，用来修正持仓快照
 
         GmCache.gm_callback = self
 
@@ -84,7 +94,14 @@ class GmCallback:
             }
             cost: 830.0000190734863
         """
-        pass
+        if self.delegate is not None and rpt.exec_type == ExecType_Trade:
+            self.delegate.snapshot.on_trade(
+                gmsymbol_to_code(rpt.symbol),
+                rpt.side == OrderSide_Buy,
+                rpt.volume,
+                float(rpt.price),
+                order_id=rpt.cl_ord_id,
+            )
 
         # stock_code = gmsymbol_to_code(rpt.symbol)
         # traded_volume = rpt.volume
@@ -112,6 +129,16 @@ class GmCallback:
         #     )
 
     def on_order_status(self, order: Order):
+        if self.delegate is not None:
+            self.delegate.snapshot.on_order(
+                order.cl_ord_id,
+                gmsymbol_to_code(order.symbol),
+                order.side == OrderSide_Buy,
+                order.volume,
+                order.filled_volume,
+                order.status in FINISHED_ORDER_STATUS,
+            )
+
         if order.status == OrderStatus_Rejected:
             self.ding_messager.send_text(f'订单已拒绝:{order.symbol} {order.ord_rej_reason_detail}')
 
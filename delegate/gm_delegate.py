@@ -7,6 +7,7 @@ from gmtrade.api import *
 from gmtrade.pb.account_pb2 import Cash, Position, Order
 
 from delegate.base_delegate import BaseDelegate
+from delegate.account_snapshot import AccountSnapshot
 from delegate.gm_callback import GmCallback
 
 from credentials import GM_ACCOUNT_ID, GM_CLIENT_TOKEN
@@ -16,6 +17,7 @@ from tools.utils_ding import DingMessager
 
 
 GM_SERVER_HOST = 'api.myquant.cn:9000'
+GM_SNAPSHOT_INTERVAL = 60   # 持仓快照全量对账的间隔秒数
 
 
 class GmAsset:
@@ -50,7 +52,13 @@ class GmPosition:
 
 
 class GmDelegate(BaseDelegate):
-    def __init__(self, account_id: str = None, callback: GmCallback = None, ding_messager: DingMessager = None):
+    def __init__(
+        self,
+        account_id: str = None,
+        callback: GmCallback = None,
+        ding_messager: DingMessager = None,
+        snapshot_interval: float = GM_SNAPSHOT_INTERVAL,
+    ):
         super().__init__()
         self.account_id = '**' + str(account_id)[-4:]
         self.ding_messager = ding_messager
@@ -61,14 +69,29 @@ class GmDelegate(BaseDelegate):
         self.account = account(account_id=GM_ACCOUNT_ID, account_alias='')
         login(self.account)
 
+        self.snapshot = AccountSnapshot(
+            query_positions=self.query_positions,
+            query_asset=self.query_asset,
+            new_position=self.new_position,
+            sync_interval=snapshot_interval,
+        )
+
         if callback is not None:
             self.callback = callback
+            self.callback.delegate = self
             self.callback.register_callback()
 
+        self.snapshot.start()
+
     def shutdown(self):
+        self.snapshot.stop()
         self.callback.unregister_callback()
 
+    # 盘中读取内存快照，不阻塞在掘金接口上
     def check_asset(self) -> GmAsset:
+        return self.snapshot.get_asset()
+
+    def query_asset(self) -> GmAsset:
         cash: Cash = get_cash(self.account)
         return GmAsset(cash)
 
@@ -77,9 +100,22 @@ class GmDelegate(BaseDelegate):
         return [GmOrder(order) for order in orders]
 
     def check_positions(self) -> List[GmPosition]:
+        return [position for position in self.snapshot.get_positions() if position.volume > 0]
+
+    def query_positions(self) -> List[GmPosition]:
         positions = get_positions(self.account)
         return [GmPosition(position) for position in positions if position.volume > 0]
 
+    def new_position(self, code: str, volume: int, price: float) -> GmPosition:
+        return GmPosition(Position(
+            account_id=GM_ACCOUNT_ID,
+            symbol=code_to_gmsymbol(code),
+            volume=volume,
+            available=0,
+            vwap=price,
+            amount=volume * price,
+        ))
+
     def order_market_open(
         self,
         code: str,
@@ -119,6 +155,7 @@ class GmDelegate(BaseDelegate):
                 f'{code}市买{volume}股{price:.2f}元',
                 '')
 
+        self.snapshot.on_submit(code, True, volume, price)
         orders = order_volume(
             symbol=code_to_gmsymbol(code),
             price=price,
@@ -145,6 +182,7 @@ class GmDelegate(BaseDelegate):
                 f'{code}市卖{volume}股{price:.2f}元',
                 '')
 
+        self.snapshot.on_submit(code, False, volume, price)
         orders = order_volume(
             symbol=code_to_gmsymbol(code),
             price=price,
@@ -195,6 +233,7 @@ class GmDelegate(BaseDelegate):
                 f'{code}限买{volume}股{price:.2f}元',
                 '')
 
+        self.snapshot.on_submit(code, True, volume, price)
         orders = order_volume(
             symbol=code_to_gmsymbol(code),
             price=price,
@@ -220,6 +259,7 @@ class GmDelegate(BaseDelegate):
                 f'{code}限卖{volume}股{price:.2f}元',
                 '')
 
+        self.snapshot.on_submit(code, False, volume, price)
         orders = order_volume(
             symbol=code_to_gmsymbol(code),
             price=price,
@@ -0,0 +1,95 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+# --------------------------------
+# 一批委托的异步提交记录
+#   批次内的委托走 order_stock_async，立即返回 seq，不等柜台往返
+#   记录成交日志、写委托记录等收尾工作先 defer，批次结束后交给后台线程执行
+#   异步委托回调按 seq 对应回批次，全部确认后输出本批次的确认耗时，柜台拒绝的委托单独计数
+# --------------------------------
+class OrderBatch:
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.submitted: Optional[float] = None      # 最后一笔提交返回的时间
+        self.sent: Dict[int, Tuple[str, float]] = {}    # { seq: (code, 提交时间) }
+        self.acked: Dict[int, float] = {}               # { seq: 确认耗时 }
+        self.rejected: List[str] = []                   # 回调里被柜台拒绝的 code
+        self.failed: List[str] = []
+        self.deferred: List[Callable[[], None]] = []
+        self.reported = False
+
+    def on_submit(self, seq: int, code: str) -> None:
+        with self.lock:
+            self.sent[seq] = (code, time.perf_counter())
+
+    def on_submit_failed(self, code: str) -> None:
+        with self.lock:
+            self.failed.append(code)
+
+    def defer(self, task: Callable[[], None]) -> None:
+        self.deferred.append(task)
+
+    def close(self) -> None:
+        self.submitted = time.perf_counter()
+        if len(self.sent) + len(self.failed) > 0:
+            logging.warning(f'[批量委托 {self.name}] 提交{len(self.sent)}笔 失败{len(self.failed)}笔 '
+                            f'用时{(self.submitted - self.started) * 1000:.1f}ms')
+        for task in self.deferred:
+            _post_order_queue.put(task)
+        self.deferred = []
+        self.report_if_done()
+
+    def on_response(self, seq: int, rejected: bool = False) -> None:
+        with self.lock:
+            if seq not in self.sent or seq in self.acked:
+                return
+            self.acked[seq] = time.perf_counter() - self.sent[seq][1]
+            if rejected:
+                self.rejected.append(self.sent[seq][0])
+        self.report_if_done()
+
+    def is_done(self) -> bool:
+        return self.submitted is not None and len(self.acked) == len(self.sent)
+
+    def report_if_done(self) -> None:
+        with self.lock:
+            if not self.is_done() or len(self.sent) == 0 or self.reported:
+                return
+            self.reported = True
+            costs = sorted(self.acked.values())
+            rejected = list(self.rejected)
+        logging.warning(f'[批量委托 {self.name}] 确认{len(costs) - len(rejected)}笔 拒绝{len(rejected)}笔 '
+                        f'最快{costs[0] * 1000:.1f}ms 最慢{costs[-1] * 1000:.1f}ms '
+                        f'总耗时{(time.perf_counter() - self.started) * 1000:.1f}ms')
+        if len(rejected) > 0:
+            logging.warning(f'[批量委托 {self.name}] 被拒绝: {rejected}')
+
+
+# 委托后的记录和日志在这个线程里执行，不占用下单线程
+_post_order_queue: queue.Queue = queue.Queue()
+
+
+def _run_post_order() -> None:
+    while True:
+        task = _post_order_queue.get()
+        try:
+            task()
+        except Exception as e:
+            print(f'委托记录失败: {e}')
+
+
+# 退出前把还没执行的记录做完
+def _drain_post_order() -> None:
+    while not _post_order_queue.empty():
+        _post_order_queue.get()()
+
+
+threading.Thread(target=_run_post_order, daemon=True).start()
+atexit.register(_drain_post_order)
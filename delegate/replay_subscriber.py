@@ -0,0 +1,106 @@
+import datetime
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+import pandas as pd
+
+from delegate.base_delegate import BaseDelegate
+from tools.utils_history import HistoryStore
+from tools.utils_remote import DataSource
+from tools.utils_replay import QuoteBatch
+from tools.utils_tick import TickRingBuffer
+
+
+# --------------------------------
+# 回放用的行情订阅器，和 XtSubscriber 对策略暴露相同的属性和回调语义，不依赖 xtquant
+#   callback_sub_whole 与 XtSubscriber 的逻辑一致：合并增量行情、每秒最多执行一次策略、返回 True 时清空行情
+#   时间取自行情批次的时间戳，不等待真实时间，回放速度只取决于 CPU
+#   delegate 如果实现了 on_quotes（例如 SimDelegate），每批行情先推给 delegate 撮合再执行策略
+# --------------------------------
+class ReplaySubscriber:
+    def __init__(
+        self,
+        strategy_name: str,
+        delegate: BaseDelegate,
+        execute_strategy: Callable = None,  # 策略回调函数
+        execute_interval: int = 1,          # 策略执行间隔，单位（秒）
+        open_tick_memory_cache: bool = False,
+        verbose: bool = False,              # 是否和实盘一样逐秒打点输出
+    ):
+        self.strategy_name = strategy_name
+        self.delegate = delegate
+        self.execute_strategy = execute_strategy
+        self.execute_interval = execute_interval
+        self.verbose = verbose
+
+        self.cache_quotes: Dict[str, Dict] = {}
+        self.cache_limits: Dict[str, str] = {
+            'prev_seconds': '',
+            'prev_minutes': '',
+        }
+        self.cache_history: Dict[str, pd.DataFrame] = {}
+
+        self.open_tick = open_tick_memory_cache
+        self.quick_ticks: bool = False
+        self.today_ticks = TickRingBuffer()
+
+    def callback_sub_whole(self, quotes: Dict, now: datetime.datetime) -> None:
+        curr_date = now.strftime('%Y-%m-%d')
+        curr_time = now.strftime('%H:%M')
+
+        if self.cache_limits['prev_minutes'] != curr_time:
+            self.cache_limits['prev_minutes'] = curr_time
+            if self.verbose:
+                print(f'\n[{curr_time}]', end='')
+
+        curr_seconds = now.strftime('%S')
+        self.cache_quotes.update(quotes)
+
+        if self.open_tick and (not self.quick_ticks):
+            self.today_ticks.append_batch(quotes)
+
+        if self.cache_limits['prev_seconds'] != curr_seconds:
+            self.cache_limits['prev_seconds'] = curr_seconds
+
+            if int(curr_seconds) % self.execute_interval == 0:
+                if self.verbose:
+                    print('.' if len(self.cache_quotes) > 0 else 'x', end='')
+
+                if self.execute_strategy(
+                    curr_date,
+                    curr_time,
+                    curr_seconds,
+                    self.cache_quotes,
+                ):
+                    if self.open_tick and self.quick_ticks:
+                        self.today_ticks.append_batch(self.cache_quotes)
+                    self.cache_quotes.clear()
+
+    # 回放一组行情批次，返回批次数和耗时
+    def run(self, source: Iterable[QuoteBatch]) -> Dict[str, float]:
+        on_quotes: Optional[Callable] = getattr(self.delegate, 'on_quotes', None)
+        t0 = time.perf_counter()
+        count = 0
+        for timestamp, quotes in source:
+            now = datetime.datetime.fromtimestamp(timestamp / 1000)
+            if on_quotes is not None:
+                on_quotes(quotes, now)
+            self.callback_sub_whole(quotes, now)
+            count += 1
+        cost = time.perf_counter() - t0
+        return {'batches': count, 'seconds': cost}
+
+    # 和 XtSubscriber 相同的本地增量缓存，回放时通常已经存在，不会触发下载
+    def download_cache_history(
+        self,
+        cache_path: str,
+        code_list: list[str],
+        start: str,
+        end: str,
+        adjust: str,
+        columns: list[str],
+        data_source: int = DataSource.AKSHARE,
+    ):
+        store = HistoryStore(cache_path)
+        self.cache_history = store.update(code_list, start, end, adjust, columns, data_source=data_source)
+        store.save()
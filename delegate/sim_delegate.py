@@ -0,0 +1,480 @@
+import datetime
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from xtquant import xtconstant
+from xtquant.xtconstant import STOCK_BUY, STOCK_SELL
+from xtquant.xttype import XtPosition, XtOrder, XtTrade, XtAsset
+
+from delegate.base_delegate import BaseDelegate
+from tools.utils_basic import get_limit_up_price, get_limit_down_price
+from tools.utils_cache import record_deal, new_held, del_key, StockNames
+from tools.utils_latency import latency
+
+
+BOOK_VOLUME_UNIT = 100          # 全推行情盘口量的单位是手
+
+default_commission_rate = 0.00025   # 佣金，双向收取
+default_commission_min = 5.0        # 单笔最低佣金
+default_stamp_tax_rate = 0.0005     # 印花税，卖出收取
+default_transfer_fee_rate = 0.00001 # 过户费，双向收取
+
+CANCELABLE_STATUS = (xtconstant.ORDER_REPORTED, xtconstant.ORDER_PART_SUCC)
+
+
+# --------------------------------
+# 本地模拟券商，不依赖 QMT 客户端，可以在 Linux 上做回放和下单链路的压测
+#   持仓、资产、委托、成交直接用 xttype 里的结构，回调和 XtDelegate 收到的一致
+#   行情由 on_quotes 推入（ReplaySubscriber 每批行情先调用一次），委托按最新一批行情撮合：
+#     市价单按对手方五档逐档成交，剩余部分撤销（深市五档即成剩撤，沪市按同样处理）
+#     限价单先按限价内的对手盘成交，剩余部分挂单，之后每次该股行情到达时继续撮合，收盘换日时撤销
+#     行情没有盘口时按最新价成交；同一批行情内已经成交的盘口量会扣掉，不会重复成交
+#   委托价超出涨跌停价为废单；买单冻结资金，卖单冻结可用股数，撤单解冻
+#   T+1：买入成交不增加可用股数，换日时可用股数恢复为持仓股数
+# --------------------------------
+class SimDelegate(BaseDelegate):
+    def __init__(
+        self,
+        account_id: str = 'SIM',
+        cash: float = 1000000.0,
+        callback: object = None,
+        commission_rate: float = default_commission_rate,
+        commission_min: float = default_commission_min,
+        stamp_tax_rate: float = default_stamp_tax_rate,
+        transfer_fee_rate: float = default_transfer_fee_rate,
+    ):
+        super().__init__()
+        self.account_id = account_id
+        self.callback = callback
+        if callback is not None:
+            callback.delegate = self
+
+        self.commission_rate = commission_rate
+        self.commission_min = commission_min
+        self.stamp_tax_rate = stamp_tax_rate
+        self.transfer_fee_rate = transfer_fee_rate
+
+        self.lock = threading.RLock()
+        self.asset = XtAsset(account_id, cash, 0.0, 0.0, cash)
+        self.positions: Dict[str, XtPosition] = {}
+        self.quotes: Dict[str, Dict] = {}
+        self.books: Dict[str, Tuple[List, List, List, List]] = {}   # 本批行情剩余可成交的盘口
+        self.now = datetime.datetime.now()
+        self.curr_date = ''
+
+        self.orders: Dict[int, XtOrder] = {}
+        self.resting: Dict[str, List[XtOrder]] = {}     # { code: [挂单] }
+        self.frozen: Dict[int, float] = {}              # { order_id: 买单冻结资金 }
+        self.trades: List[XtTrade] = []                 # 全部成交，回放结束后用来统计
+        self.next_order_id = 1
+        self.next_trade_id = 1
+
+    def shutdown(self):
+        pass
+
+    # ==========
+    # 行情推进
+    # ==========
+
+    def on_quotes(self, quotes: Dict[str, Dict], now: datetime.datetime) -> None:
+        with self.lock:
+            curr_date = now.strftime('%Y%m%d')
+            if curr_date != self.curr_date:
+                if self.curr_date != '':
+                    self.settle_day()
+                self.curr_date = curr_date
+
+            self.now = now
+            self.quotes.update(quotes)
+            for code in quotes:
+                self.books.pop(code, None)
+
+            for code in [code for code in self.resting if code in quotes]:
+                for order in list(self.resting[code]):
+                    self.match(order)
+
+    # 换日：未成交的挂单撤销，T+1 解冻昨日买入
+    def settle_day(self) -> None:
+        for orders in list(self.resting.values()):
+            for order in list(orders):
+                self.cancel(order)
+        for code in list(self.positions.keys()):
+            position = self.positions[code]
+            if position.volume == 0:
+                del self.positions[code]
+                continue
+            position.can_use_volume = position.volume
+            position.yesterday_volume = position.volume
+            position.frozen_volume = 0
+
+    def mark_to_market(self) -> None:
+        market_value = 0.0
+        for code, position in self.positions.items():
+            if code in self.quotes and self.quotes[code]['lastPrice'] > 0:
+                position.market_value = position.volume * self.quotes[code]['lastPrice']
+            market_value += position.market_value
+        self.asset.market_value = market_value
+        self.asset.total_asset = self.asset.cash + self.asset.frozen_cash + market_value
+
+    # ==========
+    # 查询
+    # ==========
+
+    def check_asset(self) -> XtAsset:
+        with self.lock:
+            self.mark_to_market()
+            return self.asset
+
+    def check_order(self, order_id) -> Optional[XtOrder]:
+        return self.orders.get(order_id)
+
+    def check_orders(self, cancelable_only: bool = False) -> List[XtOrder]:
+        with self.lock:
+            if cancelable_only:
+                return [order for orders in self.resting.values() for order in orders]
+            return list(self.orders.values())
+
+    def check_positions(self) -> List[XtPosition]:
+        return [position for position in self.positions.values() if position.volume > 0]
+
+    # ==========
+    # 撮合
+    # ==========
+
+    # 一笔成交的费用，最低佣金按整个委托计算，traded_amount 是该委托之前已经成交的金额
+    def fee_of(self, amount: float, is_buy: bool, traded_amount: float = 0.0) -> float:
+        commission = max((traded_amount + amount) * self.commission_rate, self.commission_min)
+        if traded_amount > 0:
+            commission -= max(traded_amount * self.commission_rate, self.commission_min)
+        fee = commission + amount * self.transfer_fee_rate
+        if not is_buy:
+            fee += amount * self.stamp_tax_rate
+        return fee
+
+    def limit_prices(self, code: str) -> Tuple[float, float]:
+        last_close = self.quotes[code].get('lastClose', 0)
+        return get_limit_up_price(code, last_close), get_limit_down_price(code, last_close)
+
+    # 本批行情剩余的对手盘，第一次用到时从行情复制一份
+    def book_of(self, code: str) -> Tuple[List, List, List, List]:
+        book = self.books.get(code)
+        if book is None:
+            quote = self.quotes[code]
+            book = (
+                list(quote.get('askPrice') or []),
+                [v * BOOK_VOLUME_UNIT for v in (quote.get('askVol') or [])],
+                list(quote.get('bidPrice') or []),
+                [v * BOOK_VOLUME_UNIT for v in (quote.get('bidVol') or [])],
+            )
+            self.books[code] = book
+        return book
+
+    # 按资金最多能买的整手数
+    def affordable(self, budget: float, price: float) -> int:
+        return int(budget / (price * (1 + self.commission_rate + self.transfer_fee_rate)) / 100) * 100
+
+    # 按对手盘逐档计算可成交的 [(价格, 数量)]，limit 为 None 表示市价，budget 不为 None 时按资金截断
+    def take_book(
+        self,
+        code: str,
+        is_buy: bool,
+        volume: int,
+        limit: Optional[float],
+        budget: Optional[float] = None,
+    ) -> List[Tuple[float, int]]:
+        ask_price, ask_vol, bid_price, bid_vol = self.book_of(code)
+        prices, vols = (ask_price, ask_vol) if is_buy else (bid_price, bid_vol)
+
+        if sum(ask_vol) + sum(bid_vol) == 0:
+            # 行情不带盘口，按最新价全部成交，涨跌停时对手方没有量
+            last_price = self.quotes[code]['lastPrice']
+            limit_up, limit_down = self.limit_prices(code)
+            if last_price <= 0 or (is_buy and 0 < limit_up <= last_price) or (not is_buy and last_price <= limit_down):
+                return []
+            if limit is not None and (last_price > limit if is_buy else last_price < limit):
+                return []
+            if budget is not None:
+                volume = min(volume, self.affordable(budget, last_price))
+            return [(last_price, volume)] if volume > 0 else []
+
+        fills = []
+        for i in range(len(prices)):
+            if volume <= 0:
+                break
+            price = prices[i]
+            if price <= 0 or vols[i] <= 0:
+                continue
+            if limit is not None and (price > limit if is_buy else price < limit):
+                break
+            take = min(volume, vols[i])
+            if budget is not None:
+                take = min(take, self.affordable(budget, price))
+                if take <= 0:
+                    break
+                budget -= price * take * (1 + self.commission_rate + self.transfer_fee_rate)
+            vols[i] -= take
+            volume -= take
+            fills.append((price, take))
+        return fills
+
+    def match(self, order: XtOrder) -> None:
+        code = order.stock_code
+        if code not in self.quotes:
+            return
+
+        is_buy = order.order_type == STOCK_BUY
+        limit = order.price if order.price_type == xtconstant.FIX_PRICE else None
+        remain = order.order_volume - order.traded_volume
+        # 市价买入没有冻结资金，按可用资金截断成交量
+        budget = self.asset.cash - self.commission_min if is_buy and limit is None else None
+        fills = self.take_book(code, is_buy, remain, limit, budget)
+
+        for price, take in fills:
+            self.fill(order, price, take)
+
+        if order.traded_volume >= order.order_volume:
+            self.finish(order, xtconstant.ORDER_SUCCEEDED)
+        elif limit is None:
+            self.finish(order, xtconstant.ORDER_PART_CANCEL if order.traded_volume > 0 else xtconstant.ORDER_CANCELED)
+        else:
+            status = xtconstant.ORDER_PART_SUCC if order.traded_volume > 0 else xtconstant.ORDER_REPORTED
+            if order.order_status != status:
+                order.order_status = status
+                self.notify_order(order)
+            resting = self.resting.setdefault(code, [])
+            if order not in resting:
+                resting.append(order)
+
+    def fill(self, order: XtOrder, price: float, volume: int) -> None:
+        code = order.stock_code
+        amount = price * volume
+        is_buy = order.order_type == STOCK_BUY
+        fee = self.fee_of(amount, is_buy, order.traded_price * order.traded_volume)
+
+        position = self.positions.get(code)
+        if is_buy:
+            frozen = self.frozen.get(order.order_id, 0.0)
+            if frozen > 0:
+                # 限价买单从冻结资金里扣，多冻结的部分在订单结束时返还
+                used = min(frozen, amount + fee)
+                self.frozen[order.order_id] = frozen - used
+                self.asset.frozen_cash -= used
+                self.asset.cash -= amount + fee - used
+            else:
+                self.asset.cash -= amount + fee
+            if position is None:
+                position = XtPosition(self.account_id, code, 0, 0, price, 0.0, 0, 0, 0, price, 0, code)
+                self.positions[code] = position
+            position.open_price = (position.open_price * position.volume + amount + fee) / (position.volume + volume)
+            position.avg_price = position.open_price
+            position.volume += volume
+            position.market_value = position.volume * price
+        else:
+            position.volume -= volume
+            position.frozen_volume -= volume
+            position.market_value = position.volume * price
+            self.asset.cash += amount - fee
+
+        order.traded_price = (order.traded_price * order.traded_volume + amount) / (order.traded_volume + volume)
+        order.traded_volume += volume
+
+        trade = XtTrade(
+            self.account_id, code, order.order_type, self.next_trade_id, int(self.now.timestamp()),
+            price, volume, amount, order.order_id, str(order.order_id), order.strategy_name, order.order_remark,
+            0, 0, code, fee)
+        self.next_trade_id += 1
+        self.trades.append(trade)
+        if self.callback is not None and hasattr(self.callback, 'on_stock_trade'):
+            self.callback.on_stock_trade(trade)
+
+    # 订单结束：解冻剩余的资金或股数，从挂单里移除
+    def finish(self, order: XtOrder, status: int, status_msg: str = '') -> None:
+        frozen = self.frozen.pop(order.order_id, 0.0)
+        if frozen > 0:
+            self.asset.frozen_cash -= frozen
+            self.asset.cash += frozen
+        if order.order_type == STOCK_SELL:
+            position = self.positions.get(order.stock_code)
+            remain = order.order_volume - order.traded_volume
+            if position is not None and remain > 0:
+                position.frozen_volume -= remain
+                position.can_use_volume += remain
+
+        resting = self.resting.get(order.stock_code)
+        if resting is not None and order in resting:
+            resting.remove(order)
+            if len(resting) == 0:
+                del self.resting[order.stock_code]
+
+        order.order_status = status
+        order.status_msg = status_msg
+        self.notify_order(order)
+
+    def notify_order(self, order: XtOrder) -> None:
+        if self.callback is not None and hasattr(self.callback, 'on_stock_order'):
+            self.callback.on_stock_order(order)
+
+    def cancel(self, order: XtOrder) -> bool:
+        if order.order_status not in CANCELABLE_STATUS:
+            return False
+        status = xtconstant.ORDER_PART_CANCEL if order.traded_volume > 0 else xtconstant.ORDER_CANCELED
+        self.finish(order, status)
+        return True
+
+    # ==========
+    # 委托
+    # ==========
+
+    def order_submit(
+        self,
+        stock_code: str,
+        order_type: int,
+        order_volume: int,
+        price_type: int,
+        price: float,
+        strategy_name: str,
+        order_remark: str,
+    ) -> int:     # 返回委托编号，废单返回 -1
+        with self.lock:
+            order = XtOrder(
+                self.account_id, stock_code, self.next_order_id, str(self.next_order_id),
+                int(self.now.timestamp()), order_type, order_volume, price_type, price, 0, 0.0,
+                xtconstant.ORDER_UNREPORTED, '', strategy_name, order_remark, 0, 0, stock_code)
+            self.next_order_id += 1
+            self.orders[order.order_id] = order
+
+            reason = self.check_submit(order)
+            if reason:
+                order.order_status = xtconstant.ORDER_JUNK
+                order.status_msg = reason
+                self.notify_order(order)
+                return -1
+
+            if order_type == STOCK_BUY:
+                if price_type == xtconstant.FIX_PRICE:
+                    frozen = price * order_volume + self.fee_of(price * order_volume, True)
+                    self.frozen[order.order_id] = frozen
+                    self.asset.cash -= frozen
+                    self.asset.frozen_cash += frozen
+            else:
+                position = self.positions[stock_code]
+                position.can_use_volume -= order_volume
+                position.frozen_volume += order_volume
+
+            order.order_status = xtconstant.ORDER_REPORTED
+            self.match(order)
+            latency.mark('submit')
+            return order.order_id
+
+    # 返回废单原因，可以委托时返回空串
+    def check_submit(self, order: XtOrder) -> str:
+        code = order.stock_code
+        if order.order_volume <= 0:
+            return '委托数量必须大于0'
+        if code not in self.quotes:
+            return '没有行情'
+
+        if order.price_type == xtconstant.FIX_PRICE:
+            limit_up, limit_down = self.limit_prices(code)
+            if limit_up > 0 and not (limit_down <= round(order.price, 2) <= limit_up):
+                return f'委托价{order.price:.2f}超出涨跌停[{limit_down:.2f}, {limit_up:.2f}]'
+
+        if order.order_type == STOCK_BUY:
+            if order.price_type == xtconstant.FIX_PRICE:
+                amount = order.price * order.order_volume
+                if amount + self.fee_of(amount, True) > self.asset.cash:
+                    return '可用资金不足'
+            elif self.asset.cash <= 0:
+                return '可用资金不足'
+        else:
+            position = self.positions.get(code)
+            if position is None or position.can_use_volume < order.order_volume:
+                return '可用股份不足'
+        return ''
+
+    def order_market_open(self, code: str, price: float, volume: int, remark: str, strategy_name: str = 'non-name'):
+        return self.order_submit(code, STOCK_BUY, volume, xtconstant.LATEST_PRICE, price, strategy_name, remark)
+
+    def order_market_close(self, code: str, price: float, volume: int, remark: str, strategy_name: str = 'non-name'):
+        return self.order_submit(code, STOCK_SELL, volume, xtconstant.LATEST_PRICE, price, strategy_name, remark)
+
+    def order_limit_open(self, code: str, price: float, volume: int, remark: str, strategy_name: str = 'non-name'):
+        return self.order_submit(code, STOCK_BUY, volume, xtconstant.FIX_PRICE, price, strategy_name, remark)
+
+    def order_limit_close(self, code: str, price: float, volume: int, remark: str, strategy_name: str = 'non-name'):
+        return self.order_submit(code, STOCK_SELL, volume, xtconstant.FIX_PRICE, price, strategy_name, remark)
+
+    def order_cancel(self, order_id) -> int:
+        with self.lock:
+            order = self.orders.get(order_id)
+            return 0 if order is not None and self.cancel(order) else -1
+
+    def order_cancel_all(self):
+        for order in self.check_orders(cancelable_only=True):
+            self.order_cancel(order.order_id)
+
+    def order_cancel_buy(self, code: str):
+        for order in self.check_orders(cancelable_only=True):
+            if order.stock_code == code and order.order_type == STOCK_BUY:
+                self.order_cancel(order.order_id)
+
+    def order_cancel_sell(self, code: str):
+        for order in self.check_orders(cancelable_only=True):
+            if order.stock_code == code and order.order_type == STOCK_SELL:
+                self.order_cancel(order.order_id)
+
+
+# --------------------------------
+# 模拟券商的回调，和 XtCustomCallback 一样维护成交记录、持仓天数和最高价缓存，不发钉钉
+# XtCustomCallback 继承自 xttrader 的回调基类，Linux 上无法导入，回放和压测时用这个
+# --------------------------------
+class SimCallback:
+    def __init__(
+        self,
+        lock_of_disk_cache: threading.Lock,
+        path_deal: str,
+        path_held: str,
+        path_maxp: str,
+        record_deal_enabled: bool = True,
+    ):
+        self.delegate = None
+        self.lock_of_disk_cache = lock_of_disk_cache
+        self.path_deal = path_deal
+        self.path_held = path_held
+        self.path_maxp = path_maxp
+        self.record_deal_enabled = record_deal_enabled
+
+        self.stock_names = StockNames()
+
+    def record_order(self, order_time: str, code: str, price: float, volume: int, side: str, remark: str):
+        if not self.record_deal_enabled:
+            return
+        record_deal(
+            lock=self.lock_of_disk_cache,
+            path=self.path_deal,
+            timestamp=order_time,
+            code=code,
+            name=self.stock_names.get_name(code),
+            order_type=side,
+            remark=remark,
+            price=round(price, 3),
+            volume=volume,
+        )
+
+    def on_stock_trade(self, trade: XtTrade):
+        if trade.order_type == STOCK_SELL:
+            del_key(self.lock_of_disk_cache, self.path_held, trade.stock_code)
+            del_key(self.lock_of_disk_cache, self.path_maxp, trade.stock_code)
+        elif trade.order_type == STOCK_BUY:
+            new_held(self.lock_of_disk_cache, self.path_held, [trade.stock_code])
+
+    def on_stock_order(self, order: XtOrder):
+        pass
+
+
+def is_position_holding(position: XtPosition) -> bool:
+    return position.volume > 0
+
+
+def get_holding_position_count(positions: List[XtPosition]) -> int:
+    return sum(1 for position in positions if is_position_holding(position))
@@ -6,12 +6,22 @@ from typing import Callable
 
 from xtquant import xtconstant
 from xtquant.xttrader import XtQuantTraderCallback
-from xtquant.xttype import XtOrder, XtTrade, XtOrderError, XtCancelError, XtOrderResponse, XtCancelOrderResponse
+from xtquant.xttype import XtOrder, XtTrade, XtOrderError, XtCancelError, XtOrderResponse, XtCancelOrderResponse, \
+    XtPosition, XtAsset
 
 from tools.utils_cache import record_deal, new_held, del_key, StockNames
 from tools.utils_ding import DingMessager
 
 
+# 不会再有成交的委托状态，快照收到后解冻剩余部分
+FINISHED_ORDER_STATUS = (
+    xtconstant.ORDER_PART_CANCEL,
+    xtconstant.ORDER_CANCELED,
+    xtconstant.ORDER_SUCCEEDED,
+    xtconstant.ORDER_JUNK,
+)
+
+
 class XtBaseCallback(XtQuantTraderCallback):
     def __init__(self):
         self.delegate = None
@@ -22,21 +32,60 @@ class XtBaseCallback(XtQuantTraderCallback):
         if self.delegate is not None:
             self.delegate.xt_trader = None
 
+    # 以下修正 delegate 的持仓快照，子类重写 on_stock_trade / on_stock_order 时需要先调用
+    def update_snapshot_trade(self, trade: XtTrade):
+        if self.delegate is not None:
+            self.delegate.snapshot.on_trade(
+                trade.stock_code,
+                trade.order_type == xtconstant.STOCK_BUY,
+                trade.traded_volume,
+                trade.traded_price,
+                order_id=trade.order_id,
+            )
+
+    def update_snapshot_order(self, order: XtOrder):
+        if self.delegate is not None:
+            self.delegate.snapshot.on_order(
+                order.order_id,
+                order.stock_code,
+                order.order_type == xtconstant.STOCK_BUY,
+                order.order_volume,
+                order.traded_volume,
+                order.order_status in FINISHED_ORDER_STATUS,
+            )
+
+    # 异步委托的回调交给 delegate 按 seq 对应回批次，order_id 为负或带错误信息的是柜台拒绝
+    def update_async_response(self, res: XtOrderResponse):
+        if self.delegate is not None:
+            rejected = (res.order_id is not None and res.order_id < 0) or bool(res.error_msg)
+            self.delegate.on_order_async_response(res.seq, rejected)
+
+    def on_stock_position(self, position: XtPosition):
+        if self.delegate is not None:
+            self.delegate.snapshot.on_position(position)
+
+    def on_stock_asset(self, asset: XtAsset):
+        if self.delegate is not None:
+            self.delegate.snapshot.on_asset(asset)
+
 
 class XtDefaultCallback(XtBaseCallback):
     def on_stock_trade(self, trade: XtTrade):
+        self.update_snapshot_trade(trade)
         print(
             datetime.datetime.now(),
             f'成交回调 id:{trade.order_id} code:{trade.stock_code} remark:{trade.order_remark}',
         )
 
     def on_stock_order(self, order: XtOrder):
+        self.update_snapshot_order(order)
         print(
             datetime.datetime.now(),
             f'委托回调 id:{order.order_id} code:{order.stock_code} remark:{order.order_remark}',
         )
 
     def on_order_stock_async_response(self, res: XtOrderResponse):
+        self.update_async_response(res)
         print(
             datetime.datetime.now(),
             f'异步委托回调 id:{res.order_id} sysid:{res.error_msg} remark:{res.order_remark}',
@@ -105,6 +154,7 @@ class XtCustomCallback(XtBaseCallback):
         )
 
     def on_stock_trade(self, trade: XtTrade):
+        self.update_snapshot_trade(trade)
         stock_code = trade.stock_code
         traded_volume = trade.traded_volume
         traded_price = trade.traded_price
@@ -156,7 +206,11 @@ class XtCustomCallback(XtBaseCallback):
 
         return
 
+    def on_stock_order(self, order: XtOrder):
+        self.update_snapshot_order(order)
+
     def on_order_stock_async_response(self, res: XtOrderResponse):
+        self.update_async_response(res)
         log = f'异步下单委托 {res.order_id} msg:{res.error_msg} remark:{res.order_remark}',
         logging.warning(log)
 
@@ -1,6 +1,8 @@
 import time
+import threading
+from contextlib import contextmanager
 from threading import Thread
-from typing import List
+from typing import Dict, List, Optional
 
 from xtquant import xtconstant
 from xtquant.xtconstant import STOCK_BUY, STOCK_SELL
@@ -11,6 +13,9 @@ from xtquant.xttype import StockAccount, XtPosition, XtOrder, XtAsset
 from credentials import *
 from tools.utils_basic import get_code_exchange
 from delegate.base_delegate import BaseDelegate
+from delegate.account_snapshot import AccountSnapshot
+from delegate.order_batch import OrderBatch
+from tools.utils_latency import latency
 from delegate.xt_callback import XtDefaultCallback
 
 
@@ -19,12 +24,31 @@ default_account_id = QMT_ACCOUNT_ID
 
 default_reconnect_duration = 60
 default_wait_duration = 15
+default_snapshot_interval = 60  # 持仓快照全量对账的间隔秒数
 
 
 class XtDelegate(BaseDelegate):
-    def __init__(self, account_id: str = None, client_path: str = None, callback: object = None):
+    def __init__(
+        self,
+        account_id: str = None,
+        client_path: str = None,
+        callback: object = None,
+        snapshot_interval: float = default_snapshot_interval,
+    ):
         super().__init__()
         self.xt_trader = None
+        self.snapshot = AccountSnapshot(
+            query_positions=self.query_positions,
+            query_asset=self.query_asset,
+            new_position=self.new_position,
+            sync_interval=snapshot_interval,
+        )
+
+        self.batch_local = threading.local()
+        self.async_lock = threading.Lock()
+        self.async_pending: Dict[int, OrderBatch] = {}     # { seq: 所属批次 }
+        self.async_early: Dict[int, bool] = {}             # { seq: 是否被拒绝 } 提交返回前就收到回调的 seq
+        self.async_open = 0                                # 正在提交的批次数，只有这期间才可能出现提前的回调
 
         if client_path is None:
             client_path = default_client_path
@@ -37,6 +61,8 @@ class XtDelegate(BaseDelegate):
         self.connect(self.callback)
         # 保证QMT持续连接
         Thread(target=self.keep_connected).start()
+        # 持仓快照后台对账
+        self.snapshot.start()
 
     def connect(self, callback: object) -> (XtQuantTrader, bool):
         session_id = int(time.time())  # 生成session id 整数类型 同时运行的策略不能重复
@@ -90,9 +116,30 @@ class XtDelegate(BaseDelegate):
             self.reconnect()
 
     def shutdown(self):
+        self.snapshot.stop()
         self.xt_trader.stop()
         self.xt_trader = None
 
+    # 批次内的委托改为异步提交，批次结束时输出提交耗时
+    @contextmanager
+    def order_batch(self, name: str):
+        batch = OrderBatch(name)
+        self.batch_local.batch = batch
+        with self.async_lock:
+            self.async_open += 1
+        try:
+            yield batch
+        finally:
+            self.batch_local.batch = None
+            with self.async_lock:
+                self.async_open -= 1
+                if self.async_open == 0:
+                    self.async_early.clear()  # 没有批次在提交，剩下的都是批次外异步委托的回调
+            batch.close()
+
+    def current_batch(self) -> Optional[OrderBatch]:
+        return getattr(self.batch_local, 'batch', None)
+
     def order_submit(
         self,
         stock_code: str,
@@ -102,9 +149,40 @@ class XtDelegate(BaseDelegate):
         price: float,
         strategy_name: str,
         order_remark: str,
+        freeze_price: float = None,     # 快照冻结资金用的价格，市价单的委托价不是行情价时传入
     ) -> bool:
+        if freeze_price is None:
+            freeze_price = price
+        token = self.snapshot.on_submit(stock_code, order_type == STOCK_BUY, order_volume, freeze_price)
+
+        batch = self.current_batch()
+        if batch is not None:
+            seq = self.order_submit_async(
+                stock_code=stock_code,
+                order_type=order_type,
+                order_volume=order_volume,
+                price_type=price_type,
+                price=price,
+                strategy_name=strategy_name,
+                order_remark=order_remark,
+            )
+            if seq is None or seq < 0:
+                self.snapshot.on_submit_failed(token)
+                batch.on_submit_failed(stock_code)
+                return False
+
+            latency.mark('submit')
+            batch.on_submit(seq, stock_code)
+            with self.async_lock:
+                if seq not in self.async_early:
+                    self.async_pending[seq] = batch
+                    return True
+                rejected = self.async_early.pop(seq)
+            batch.on_response(seq, rejected)
+            return True
+
         if self.xt_trader is not None:
-            self.xt_trader.order_stock(
+            order_id = self.xt_trader.order_stock(
                 account=self.account,
                 stock_code=stock_code,
                 order_type=order_type,
@@ -114,8 +192,13 @@ class XtDelegate(BaseDelegate):
                 strategy_name=strategy_name,
                 order_remark=order_remark,
             )
+            latency.mark('submit')
+            if order_id is not None and order_id < 0:
+                self.snapshot.on_submit_failed(token)
+                return False
             return True
         else:
+            self.snapshot.on_submit_failed(token)
             return False
 
     def order_submit_async(
@@ -127,9 +210,9 @@ class XtDelegate(BaseDelegate):
         price: float,
         strategy_name: str,
         order_remark: str,
-    ) -> bool:
+    ) -> Optional[int]:     # 返回请求序号 seq，与 on_order_stock_async_response 的 res.seq 对应
         if self.xt_trader is not None:
-            self.xt_trader.order_stock_async(
+            return self.xt_trader.order_stock_async(
                 account=self.account,
                 stock_code=stock_code,
                 order_type=order_type,
@@ -139,9 +222,18 @@ class XtDelegate(BaseDelegate):
                 strategy_name=strategy_name,
                 order_remark=order_remark,
             )
-            return True
         else:
-            return False
+            return None
+
+    # 异步委托回调按 seq 找回所属批次，批次外的异步委托不记录
+    def on_order_async_response(self, seq: int, rejected: bool = False) -> None:
+        with self.async_lock:
+            batch = self.async_pending.pop(seq, None)
+            if batch is None:
+                if self.async_open > 0:
+                    self.async_early[seq] = rejected
+                return
+        batch.on_response(seq, rejected)
 
     def order_cancel(self, order_id) -> int:
         cancel_result = self.xt_trader.cancel_order_stock(self.account, order_id)
@@ -151,7 +243,11 @@ class XtDelegate(BaseDelegate):
         cancel_result = self.xt_trader.cancel_order_stock_async(self.account, order_id)
         return cancel_result
 
+    # 盘中读取内存快照，不阻塞在券商接口上
     def check_asset(self) -> XtAsset:
+        return self.snapshot.get_asset()
+
+    def query_asset(self) -> XtAsset:
         if self.xt_trader is not None:
             return self.xt_trader.query_stock_asset(self.account)
         else:
@@ -182,11 +278,18 @@ class XtDelegate(BaseDelegate):
             raise Exception('xt_trader为空')
 
     def check_positions(self) -> List[XtPosition]:
+        return self.snapshot.get_positions()
+
+    def query_positions(self) -> List[XtPosition]:
         if self.xt_trader is not None:
             return self.xt_trader.query_stock_positions(self.account)
         else:
             raise Exception('xt_trader为空')
 
+    def new_position(self, code: str, volume: int, price: float) -> XtPosition:
+        return XtPosition(
+            self.account.account_id, code, volume, 0, price, volume * price, 0, 0, 0, price, 0, code)
+
     def order_market_open(
         self,
         code: str,
@@ -196,22 +299,24 @@ class XtDelegate(BaseDelegate):
         strategy_name: str = 'non-name',
     ):
         price_type = xtconstant.LATEST_PRICE
+        order_price = price
 
         if get_code_exchange(code) == 'SZ':
             price_type = xtconstant.MARKET_SZ_CONVERT_5_CANCEL
-            price = -1
+            order_price = -1
         if get_code_exchange(code) == 'SH':
             price_type = xtconstant.MARKET_PEER_PRICE_FIRST
-            price = price
+            order_price = price
 
         self.order_submit(
             stock_code=code,
             order_type=xtconstant.STOCK_BUY,
             order_volume=volume,
             price_type=price_type,
-            price=price,
+            price=order_price,
             strategy_name=strategy_name,
             order_remark=remark,
+            freeze_price=price,
         )
 
     def order_market_close(
@@ -223,22 +328,24 @@ class XtDelegate(BaseDelegate):
         strategy_name: str = 'non-name',
     ):
         price_type = xtconstant.LATEST_PRICE
+        order_price = price
 
         if get_code_exchange(code) == 'SZ':
             price_type = xtconstant.MARKET_SZ_CONVERT_5_CANCEL
-            price = -1
+            order_price = -1
         if get_code_exchange(code) == 'SH':
             price_type = xtconstant.MARKET_PEER_PRICE_FIRST
-            price = price
+            order_price = price
 
         self.order_submit(
             stock_code=code,
             order_type=xtconstant.STOCK_SELL,
             order_volume=volume,
             price_type=price_type,
-            price=price,
+            price=order_price,
             strategy_name=strategy_name,
             order_remark=remark,
+            freeze_price=price,
         )
 
     def order_limit_open(
@@ -1,22 +1,25 @@
-import json
 import datetime
 import time
 
 import schedule
 import threading
-import os
 import pandas as pd
 
-from typing import Dict, Callable
+from typing import Dict, Callable, Optional
 
 from xtquant import xtdata
 
 from delegate.xt_delegate import XtDelegate
 from tools.utils_basic import code_to_symbol
 from tools.utils_cache import check_is_open_day, get_total_asset_increase, \
-    load_pickle, save_pickle, load_json, save_json, StockNames
+    JsonStateStore, DealJournal, DEAL_HEADER, StockNames
 from tools.utils_ding import DingMessager
-from tools.utils_remote import get_daily_history, DataSource
+from tools.utils_download import download_daily_histories
+from tools.utils_history import HistoryStore
+from tools.utils_latency import latency
+from tools.utils_remote import DataSource
+from tools.utils_replay import QuoteRecorder, QUOTE_RECORD_PATH
+from tools.utils_tick import TickRingBuffer, TickArchiveWriter, TICK_ARCHIVE_PATH
 
 
 class XtSubscriber:
@@ -33,6 +36,8 @@ class XtSubscriber:
         open_tick_memory_cache: bool = False,
         open_today_deal_report: bool = False,
         open_today_hold_report: bool = False,
+        open_latency_monitor: bool = False,   # 记录行情到委托各阶段的延迟
+        open_quote_record: bool = False,      # 录制全推行情，供 ReplaySubscriber 回放
     ):
         self.account_id = '**' + str(account_id)[-4:]
         self.strategy_name = strategy_name
@@ -56,11 +61,16 @@ class XtSubscriber:
 
         self.open_tick = open_tick_memory_cache
         self.quick_ticks: bool = False              # 是否开启quick tick模式
-        self.today_ticks: Dict[str, list] = {}      # 记录tick的历史信息
-        # [ 成交时间, 成交价格, 累计成交量 ]
+        self.today_ticks = TickRingBuffer()         # 记录tick的历史信息，按列存储
+        # [ 成交时间, 成交价格, 累计成交量, 卖一价, 卖一量, 买一价, 买一量 ]
+        self.tick_archive: Optional[TickArchiveWriter] = None  # 当日tick的磁盘归档，盘中增量写入
+        self.open_quote_record = open_quote_record
+        self.quote_recorder: Optional[QuoteRecorder] = None
 
         self.open_today_deal_report = open_today_deal_report
         self.open_today_hold_report = open_today_hold_report
+        self.open_latency_monitor = open_latency_monitor
+        latency.configure(strategy_name, enabled=open_latency_monitor)
 
         self.code_list = ['SH', 'SZ']
         self.stock_names = StockNames()
@@ -70,6 +80,7 @@ class XtSubscriber:
     # 策略触发主函数
     # -----------------------
     def callback_sub_whole(self, quotes: Dict) -> None:
+        latency.begin(quotes)
         now = datetime.datetime.now()
         self.last_callback_time = now
 
@@ -88,6 +99,9 @@ class XtSubscriber:
         if self.open_tick and (not self.quick_ticks):
             self.record_tick_to_memory(quotes)  # 更全（默认：先记录再执行）
 
+        if self.open_quote_record:
+            self.record_quotes(quotes, now)
+
         # 执行策略
         if self.cache_limits['prev_seconds'] != curr_seconds:
             self.cache_limits['prev_seconds'] = curr_seconds
@@ -95,12 +109,15 @@ class XtSubscriber:
             if int(curr_seconds) % self.execute_interval == 0:
                 print('.' if len(self.cache_quotes) > 0 else 'x', end='')  # 每秒钟开始的时候输出一个点
 
-                if self.execute_strategy(
+                latency.mark('strategy_start')
+                need_clear = self.execute_strategy(
                     curr_date,
                     curr_time,
                     curr_seconds,
                     self.cache_quotes,
-                ):
+                )
+                latency.mark('strategy_end')
+                if need_clear:
                     with self.lock_quotes_update:
                         if self.open_tick and self.quick_ticks:
                             self.record_tick_to_memory(self.cache_quotes)  # 更快（先执行再记录）
@@ -162,36 +179,48 @@ class XtSubscriber:
     # -----------------------
     def record_tick_to_memory(self, quotes):
         # 记录 tick 历史
-        for code in quotes:
-            if code not in self.today_ticks:
-                self.today_ticks[code] = []
-
-            quote = quotes[code]
-            tick_time = datetime.datetime.fromtimestamp(quote['time'] / 1000).strftime('%H:%M:%S')
-            self.today_ticks[code].append([
-                tick_time,                          # 成交时间，格式：%H:%M:%S
-                round(quote['lastPrice'], 3),       # 成交价格
-                int(quote['volume']),          # 累计成交量（手）
-                round(quote['askPrice'][0], 3),     # 卖一价
-                int(quote['askVol'][0]),            # 卖一量
-                round(quote['bidPrice'][0], 3),     # 买一价
-                int(quote['bidVol'][0]),            # 买一量
-            ])
+        self.today_ticks.append_batch(quotes)
+
+    def record_quotes(self, quotes: Dict, now: datetime.datetime):
+        path = QUOTE_RECORD_PATH.format(now.strftime('%Y%m%d'))
+        if self.quote_recorder is None or self.quote_recorder.path != path:
+            if self.quote_recorder is not None:
+                self.quote_recorder.close()
+            self.quote_recorder = QuoteRecorder(path)
+        self.quote_recorder.append(quotes, int(now.timestamp() * 1000))
 
     def clean_ticks_history(self):
         if not check_is_open_day(datetime.datetime.now().strftime('%Y-%m-%d')):
             return
         self.today_ticks.clear()
-        self.today_ticks = {}
+        self.tick_archive = None
         print(f"已清除tick缓存")
 
+    # 定时增量落盘只在交易日的盘中进行：缓存要到次日 09:10 才清除，收盘后再落盘会把当日的 tick 写进次日的归档
+    def flush_tick_history(self) -> int:
+        now = datetime.datetime.now()
+        if not check_is_open_day(now.strftime('%Y-%m-%d')):
+            return 0
+        if not ('09:15' <= now.strftime('%H:%M') < '15:10'):
+            return 0
+        return self.write_tick_archive(now)
+
+    def write_tick_archive(self, now: datetime.datetime) -> int:
+        if len(self.today_ticks) == 0:
+            return 0
+
+        archive_path = TICK_ARCHIVE_PATH.format(now.strftime('%Y%m%d'))
+        if self.tick_archive is None or self.tick_archive.path_prefix != archive_path:
+            self.tick_archive = TickArchiveWriter(archive_path)
+        return self.tick_archive.flush(self.today_ticks)
+
     def save_tick_history(self):
-        if not check_is_open_day(datetime.datetime.now().strftime('%Y-%m-%d')):
+        now = datetime.datetime.now()
+        if not check_is_open_day(now.strftime('%Y-%m-%d')):
             return
-        json_file = './_cache/debug/tick_history.json'
-        with open(json_file, 'w') as file:
-            json.dump(self.today_ticks, file, indent=4)
-        print(f"当日tick数据已存储为 {json_file} 文件")
+        self.write_tick_archive(now)
+        if self.tick_archive is not None:
+            print(f"当日tick数据已存储为 {self.tick_archive.path_bin} 文件")
 
     # -----------------------
     # 盘前下载数据缓存
@@ -209,26 +238,11 @@ class XtSubscriber:
         t0 = datetime.datetime.now()
 
         print(f'Downloading {len(target_codes)} stocks from {start} to {end} ...')
-        group_size = 200
-        for i in range(0, len(target_codes), group_size):
-            sub_codes = [sub_code for sub_code in target_codes[i:i + group_size]]
-            time.sleep(1)
-            print(i, sub_codes)  # 已更新数量
-
-            # TUSHARE 批量下载限制总共8000天条数据，所以暂时弃用
-            # if data_source == DataSource.TUSHARE:
-            #     # 使用 TUSHARE 数据源批量下载
-            #     dfs = get_ts_daily_histories(sub_codes, start, end, columns)
-            #     self.cache_history.update(dfs)
-            #     time.sleep(0.1)
-
-            # 默认使用 AKSHARE 数据源
-            for code in sub_codes:
-                df = get_daily_history(code, start, end, columns=columns, adjust=adjust, data_source=data_source)
-                if df is not None:
-                    self.cache_history[code] = df
-                if data_source == DataSource.TUSHARE:
-                    time.sleep(0.1)
+        # TUSHARE 批量下载限制总共8000天条数据，所以暂时弃用，按数据源限流后逐个 code 并发下载
+        histories = dict(self.cache_history)  # cache_history 可能是只读的 HistoryView
+        histories.update(download_daily_histories(
+            target_codes, start, end, adjust, columns, data_source=data_source))
+        self.cache_history = histories
 
         t1 = datetime.datetime.now()
         print(f'Prepared TIME COST: {t1 - t0}')
@@ -243,24 +257,16 @@ class XtSubscriber:
         columns: list[str],
         data_source: int = DataSource.AKSHARE,
     ):
-        temp_indicators = load_pickle(cache_path)
-        if temp_indicators is not None and len(temp_indicators) > 0:
-            # 如果有缓存就读缓存
-            self.cache_history.clear()
-            self.cache_history = {}
-            self.cache_history.update(temp_indicators)
-            print(f'{len(self.cache_history)} histories loaded from {cache_path}')
-            if self.ding_messager is not None:
-                self.ding_messager.send_text(f'[{self.account_id}]{self.strategy_name}:加载{len(self.cache_history)}支')
-        else:
-            # 如果没缓存就刷新白名单
-            self.cache_history.clear()
-            self.cache_history = {}
-            self.download_from_remote(code_list, start, end, adjust, columns, data_source)
-            save_pickle(cache_path, self.cache_history)
-            print(f'{len(self.cache_history)} of {len(code_list)} histories saved to {cache_path}')
-            if self.ding_messager is not None:
-                self.ding_messager.send_text(f'[{self.account_id}]{self.strategy_name}:下载{len(self.cache_history)}支')
+        # 增量缓存：已存储的票只下载缺失的尾部，复权因子变化或新加入的票才整段下载
+        # 返回的是列式存储上的惰性视图，cache_history[code] 访问时才生成 DataFrame
+        t0 = datetime.datetime.now()
+        store = HistoryStore(cache_path)
+        self.cache_history = store.update(code_list, start, end, adjust, columns, data_source=data_source)
+        store.save()
+        print(f'{len(self.cache_history)} of {len(code_list)} histories prepared in {cache_path}, '
+              f'TIME COST: {datetime.datetime.now() - t0}')
+        if self.ding_messager is not None:
+            self.ding_messager.send_text(f'[{self.account_id}]{self.strategy_name}:加载{len(self.cache_history)}支')
 
     # -----------------------
     # 盘后报告总结
@@ -273,6 +279,7 @@ class XtSubscriber:
         self.today_deal_report(today=curr_date)
         self.today_hold_report(today=curr_date)
         self.check_asset(today=curr_date)
+        self.today_latency_report(today=curr_date)
 
     def check_asset(self, today):
         asset = self.delegate.check_asset()
@@ -299,18 +306,13 @@ class XtSubscriber:
 
     def today_deal_report(self, today):
         if self.open_today_deal_report:
-            if not os.path.exists(self.path_deal):
-                return
-
-            df = pd.read_csv(self.path_deal, encoding='gbk')
-            if '日期' in df.columns:
-                df = df[df['日期'] == today]
+            rows = DealJournal.get(self.path_deal).rows_of_date(today)
 
-            if len(df) > 0:
-                title = f'{self.strategy_name} {today} 记录 {len(df)} 条'
+            if len(rows) > 0:
+                title = f'{self.strategy_name} {today} 记录 {len(rows)} 条'
                 txt = title
-                for index, row in df.iterrows():
-                    # ['日期', '时间', '代码', '名称', '类型', '注释', '成交价', '成交量']
+                for row in rows:
+                    row = dict(zip(DEAL_HEADER, row))
                     txt += '\n\n> '
                     txt += f'{row["时间"]} {row["注释"]} {code_to_symbol(row["代码"])} '
                     txt += '\n>\n> '
@@ -319,6 +321,15 @@ class XtSubscriber:
                 if self.ding_messager is not None:
                     self.ding_messager.send_markdown(title, txt)
 
+    def today_latency_report(self, today):
+        if self.open_latency_monitor:
+            txt = latency.summary()
+            print(txt)
+            if self.ding_messager is not None:
+                title = f'{self.strategy_name} {today} 延迟统计'
+                self.ding_messager.send_markdown(title, txt.replace('\n', '\n>\n> '))
+            latency.reset()
+
     def today_hold_report(self, today):
         if self.open_today_hold_report:
             positions = self.delegate.check_positions()
@@ -371,6 +382,7 @@ class XtSubscriber:
 
         if self.open_tick:
             schedule.every().day.at('09:10').do(self.clean_ticks_history)
+            schedule.every(10).minutes.do(self.flush_tick_history)  # 盘中增量落盘
             schedule.every().day.at('15:10').do(self.save_tick_history)
 
         schedule.every().day.at('09:25').do(self.subscribe_tick)
@@ -398,7 +410,7 @@ def prev_check_open_day():
     curr_date = now.strftime('%Y-%m-%d')
     curr_time = now.strftime('%H:%M')
     print(f'[{curr_time}]', end='')
-    check_is_open_day(curr_date)
+    print(f'[{curr_date} is {check_is_open_day(curr_date)} trade day in memory]')
 
 
 # -----------------------
@@ -408,13 +420,14 @@ def update_position_held(lock: threading.Lock, delegate: XtDelegate, path: str):
     with lock:
         positions = delegate.check_positions()
 
-        held_days = load_json(path)
+        store = JsonStateStore.get(path)
+        held_days = store.copy()
 
         # 添加未被缓存记录的持仓
         for position in positions:
             if position.can_use_volume > 0:
                 if position.stock_code not in held_days.keys():
-                    held_days[position.stock_code] = 0
+                    store.set(position.stock_code, 0)
 
         if positions is not None and len(positions) > 0:
             # 删除已清仓的held_days记录
@@ -424,11 +437,11 @@ def update_position_held(lock: threading.Lock, delegate: XtDelegate, path: str):
             for code in holding_codes:
                 if len(code) > 0 and code[0] != '_':
                     if code not in position_codes:
-                        del held_days[code]
+                        store.delete(code)
         else:
             print('当前空仓！')
 
-        save_json(path, held_days)
+        store.flush()
 
 
 # -----------------------
@@ -18,9 +18,24 @@
 
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from mytt import MyTT_kernels as _K
 
 
 # ------------------ 0级：核心工具函数 --------------------------------------------
+def _WINDOWS(S, N):  # 返回float序列和N周期滑动窗口视图(零拷贝), 长度不足N时窗口为None
+    S = np.asarray(S, dtype=float)
+    if N <= 0 or N > len(S): return S, None
+    return S, sliding_window_view(S, N)
+
+
+def _PAD(S, R, N, fill=np.nan):  # 滑动窗口结果前面补N-1个fill, 和rolling的输出对齐
+    res = np.full(len(S), fill, dtype=np.result_type(R, type(fill)) if R is not None else float)
+    if R is not None: res[N - 1:] = R
+    return res
+
+
 def RD(N, D=3):   return np.round(N, D)  # 四舍五入取3位小数
 
 
@@ -76,11 +91,19 @@ def LLV(S,N):             #LLV(C, 5) 最近5天收盘最低价
 
 
 def HHVBARS(S, N):  # 求N周期内S最高值到当前周期数, 返回序列
-    return pd.Series(S).rolling(N).apply(lambda x: np.argmax(x[::-1]), raw=True).values
+    S, W = _WINDOWS(S, N)
+    if W is None: return _PAD(S, None, N)
+    R = np.argmax(W[:, ::-1], axis=1).astype(float)
+    R[np.isnan(W).any(axis=1)] = np.nan  # 窗口内有nan时和rolling一样返回nan
+    return _PAD(S, R, N)
 
 
 def LLVBARS(S, N):  # 求N周期内S最低值到当前周期数, 返回序列
-    return pd.Series(S).rolling(N).apply(lambda x: np.argmin(x[::-1]), raw=True).values
+    S, W = _WINDOWS(S, N)
+    if W is None: return _PAD(S, None, N)
+    R = np.argmin(W[:, ::-1], axis=1).astype(float)
+    R[np.isnan(W).any(axis=1)] = np.nan
+    return _PAD(S, R, N)
 
 
 def MA(S, N):  # 求序列的N日简单移动平均值，返回序列
@@ -96,33 +119,46 @@ def SMA(S, N, M=1):  # 中国式的SMA,至少需要120周期才精确 (雪球180
 
 
 def WMA(S, N):  # 通达信S序列的N日加权移动平均 Yn = (1*X1+2*X2+3*X3+...+n*Xn)/(1+2+3+...+Xn)
-    return pd.Series(S).rolling(N).apply(lambda x: x[::-1].cumsum().sum() * 2 / N / (N + 1), raw=True).values
+    S, W = _WINDOWS(S, N)
+    if W is None: return _PAD(S, None, N)
+    return _PAD(S, W @ np.arange(1, N + 1, dtype=float) * 2 / N / (N + 1), N)
 
 
 def DMA(S, A):  # 求S的动态移动平均，A作平滑因子,必须 0<A<1  (此为核心函数，非指标）
     if isinstance(A, (int, float)):  return pd.Series(S).ewm(alpha=A, adjust=False).mean().values
-    A = np.array(A);
+    A = np.array(A, dtype=float);
     A[np.isnan(A)] = 1.0;
-    Y = np.zeros(len(S));
-    Y[0] = S[0]
-    for i in range(1, len(S)): Y[i] = A[i] * S[i] + (1 - A[i]) * Y[i - 1]  # A支持序列 by jqz1226
-    return Y
+    return _K.dma_loop(np.asarray(S, dtype=float), A)  # A支持序列 by jqz1226, 有numba时编译执行
 
 
 def AVEDEV(S, N):  # 平均绝对偏差  (序列与其平均值的绝对差的平均值)
-    return pd.Series(S).rolling(N).apply(lambda x: (np.abs(x - x.mean())).mean()).values
+    S, W = _WINDOWS(S, N)
+    if W is None: return _PAD(S, None, N)
+    return _PAD(S, np.abs(W - W.mean(axis=1, keepdims=True)).mean(axis=1), N)
+
+
+def _REGRESS(N):  # N周期线性回归的窗口权重: 窗口 @ 权重 = 斜率
+    X = np.arange(N, dtype=float) - (N - 1) / 2
+    return X / np.sum(X * X)
 
 
 def SLOPE(S, N):  # 返S序列N周期回线性回归斜率
-    return pd.Series(S).rolling(N).apply(lambda x: np.polyfit(range(N), x, deg=1)[0], raw=True).values
+    S, W = _WINDOWS(S, N)
+    if W is None: return _PAD(S, None, N)
+    return _PAD(S, W @ _REGRESS(N), N)
 
 
 def FORCAST(S, N):  # 返回S序列N周期回线性回归后的预测值， jqz1226改进成序列出
-    return pd.Series(S).rolling(N).apply(lambda x: np.polyval(np.polyfit(range(N), x, deg=1), N - 1), raw=True).values
+    S, W = _WINDOWS(S, N)
+    if W is None: return _PAD(S, None, N)
+    return _PAD(S, W.mean(axis=1) + (W @ _REGRESS(N)) * (N - 1) / 2, N)  # 均值 + 斜率 * (末点 - 中点)
 
 
 def LAST(S, A, B):  # 从前A日到前B日一直满足S_BOOL条件, 要求A>B & A>0 & B>=0
-    return np.array(pd.Series(S).rolling(A + 1).apply(lambda x: np.all(x[::-1][B:]), raw=True), dtype=bool)
+    S, W = _WINDOWS(S, A + 1)
+    if W is None: return np.ones(len(S), dtype=bool)  # 和rolling一样，窗口不足时nan转bool为True
+    R = np.all(W[:, :A - B + 1] != 0, axis=1) | np.isnan(W).any(axis=1)
+    return _PAD(S, R, A + 1, fill=True)
 
 
 # ------------------   1级：应用层函数(通过0级核心函数实现）使用方法请参考通达信--------------------------------
@@ -139,20 +175,17 @@ def EXIST(S, N):  # EXIST(CLOSE>3010, N=5)  n日内是否存在一天大于3000
 
 
 def FILTER(S, N):  # FILTER函数，S满足条件后，将其后N周期内的数据置为0, FILTER(C==H,5)
-    for i in range(len(S)): S[i + 1:i + 1 + N] = 0 if S[i] else S[i + 1:i + 1 + N]
+    T = np.flatnonzero(S)  # 只需遍历条件成立的位置
+    S[T[_K.filter_drop(T, N)]] = 0
     return S  # 例：FILTER(C==H,5) 涨停后，后5天不再发出信号
 
 
 def BARSLAST(S):  # 上一次条件成立到当前的周期, BARSLAST(C/REF(C,1)>=1.1) 上一次涨停到今天的天数
-    M = np.concatenate(([0], np.where(S, 1, 0)))
-    for i in range(1, len(M)):  M[i] = 0 if M[i] else M[i - 1] + 1
-    return M[1:]
+    return _K.barslast(S)  # maximum.accumulate 无循环实现
 
 
 def BARSLASTCOUNT(S):  # 统计连续满足S条件的周期数        by jqz1226
-    rt = np.zeros(len(S) + 1)  # BARSLASTCOUNT(CLOSE>OPEN)表示统计连续收阳的周期数
-    for i in range(len(S)): rt[i + 1] = rt[i] + 1 if S[i] else rt[i + 1]
-    return rt[1:]
+    return _K.barslastcount(S)  # BARSLASTCOUNT(CLOSE>OPEN)表示统计连续收阳的周期数
 
 
 def BARSSINCEN(S, N):  # N周期内第一次S条件成立到现在的周期数,N为常量  by jqz1226
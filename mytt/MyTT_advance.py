@@ -6,6 +6,7 @@
 import math
 from typing import Optional
 from mytt.MyTT import *
+from mytt import MyTT_kernels as _K
 
 
 # ------------------------工具函数---------------------------------------------
@@ -18,11 +19,7 @@ def HHV(S, N):  # HHV,支持N为序列版本
     if isinstance(N, (int, float)):
         return pd.Series(S).rolling(N).max().values
     else:
-        res = np.repeat(np.nan, len(S))
-        for i in range(len(S)):
-            if (not np.isnan(N[i])) and 0 < N[i] <= i + 1:
-                res[i] = S[i + 1 - N[i]:i + 1].max()
-        return res
+        return _K.hhv_series(S, N)  # 倍增表无循环实现
 
 
 def LLV(S, N):  # LLV,支持N为序列版本
@@ -33,11 +30,7 @@ def LLV(S, N):  # LLV,支持N为序列版本
     if isinstance(N, (int, float)):
         return pd.Series(S).rolling(N).min().values
     else:
-        res = np.repeat(np.nan, len(S))
-        for i in range(len(S)):
-            if (not np.isnan(N[i])) and 0 < N[i] <= i + 1:
-                res[i] = S[i + 1 - N[i]:i + 1].min()
-        return res
+        return _K.llv_series(S, N)  # 倍增表无循环实现
 
 
 def DSMA(X, N):  # 偏差自适应移动平均线   type: (np.ndarray, int) -> np.ndarray
@@ -51,9 +44,7 @@ def DSMA(X, N):  # 偏差自适应移动平均线   type: (np.ndarray, int) -> n
     c3 = -a1 * a1
     c1 = 1 - c2 - c3
     Zeros = np.pad(X[2:] - X[:-2], (2, 0), 'constant')
-    Filt = np.zeros(len(X))
-    for i in range(len(X)):
-        Filt[i] = c1 * (Zeros[i] + Zeros[i - 1]) / 2 + c2 * Filt[i - 1] + c3 * Filt[i - 2]
+    Filt = _K.dsma_filt(Zeros.astype(float), c1, c2, c3)
 
     RMS = np.sqrt(SUM(np.square(Filt), N) / N)
     ScaledFilt = Filt / RMS
@@ -101,32 +92,13 @@ def SAR(HIGH, LOW, N=10, S=2, M=20):
     :param M: 步长极限
     :return: 抛物转向
     """
-    f_step = S / 100;
-    f_max = M / 100;
-    af = 0.0
+    HIGH = np.asarray(HIGH, dtype=float)
+    LOW = np.asarray(LOW, dtype=float)
     is_long = HIGH[N - 1] > HIGH[N - 2]
-    b_first = True
-    length = len(HIGH)
 
     s_hhv = REF(HHV(HIGH, N), 1)  # type: np.ndarray
     s_llv = REF(LLV(LOW, N), 1)  # type: np.ndarray
-    sar_x = np.repeat(np.nan, length)  # type: np.ndarray
-    for i in range(N, length):
-        if b_first:  # 第一步
-            af = f_step
-            sar_x[i] = s_llv[i] if is_long else s_hhv[i]
-            b_first = False
-        else:  # 继续多 或者 空
-            ep = s_hhv[i] if is_long else s_llv[i]  # 极值
-            if (is_long and HIGH[i] > ep) or ((not is_long) and LOW[i] < ep):  # 顺势：多创新高 或者 空创新低
-                af = min(af + f_step, f_max)
-            #
-            sar_x[i] = sar_x[i - 1] + af * (ep - sar_x[i - 1])
-
-        if (is_long and LOW[i] < sar_x[i]) or ((not is_long) and HIGH[i] > sar_x[i]):  # 反空 或者 反多
-            is_long = not is_long
-            b_first = True
-    return sar_x
+    return _K.sar_loop(HIGH, LOW, s_hhv.astype(float), s_llv.astype(float), N, S / 100, M / 100, bool(is_long))
 
 
 def TDX_SAR(High, Low, iAFStep=2, iAFLimit=20):  # type: (np.ndarray, np.ndarray, int, int) -> np.ndarray
@@ -137,51 +109,6 @@ def TDX_SAR(High, Low, iAFStep=2, iAFLimit=20):  # type: (np.ndarray, np.ndarray
     :param iAFLimit: AF极限值
     :return: SAR序列
     """
-    af_step = iAFStep / 100;
-    af_limit = iAFLimit / 100
-    SarX = np.zeros(len(High))  # 初始化返回数组
-
-    # 第一个bar
-    bull = True
-    af = af_step
-    ep = High[0]
-    SarX[0] = Low[0]
-    # 第2个bar及其以后
-    for i in range(1, len(High)):
-        # 1.更新：hv, lv, af, ep
-        if bull:  # 多
-            if High[i] > ep:  # 创新高
-                ep = High[i]
-                af = min(af + af_step, af_limit)
-        else:  # 空
-            if Low[i] < ep:  # 创新低
-                ep = Low[i]
-                af = min(af + af_step, af_limit)
-        # 2.计算SarX
-        SarX[i] = SarX[i - 1] + af * (ep - SarX[i - 1])
-
-        # 3.修正SarX
-        if bull:
-            SarX[i] = max(SarX[i - 1], min(SarX[i], Low[i], Low[i - 1]))
-        else:
-            SarX[i] = min(SarX[i - 1], max(SarX[i], High[i], High[i - 1]))
-
-        # 4. 判断是否：向下跌破，向上突破
-        if bull:  # 多
-            if Low[i] < SarX[i]:  # 向下跌破，转空
-                bull = False
-                tmp_SarX = ep  # 上阶段的最高点
-                ep = Low[i]
-                af = af_step
-                if High[i - 1] == tmp_SarX:  # 紧邻即最高点
-                    SarX[i] = tmp_SarX
-                else:
-                    SarX[i] = tmp_SarX + af * (ep - tmp_SarX)
-        else:  # 空
-            if High[i] > SarX[i]:  # 向上突破, 转多
-                bull = True
-                ep = High[i]
-                af = af_step
-                SarX[i] = min(Low[i], Low[i - 1])
-    # end for
-    return SarX
+    High = np.asarray(High, dtype=float)
+    Low = np.asarray(Low, dtype=float)
+    return _K.tdx_sar_loop(High, Low, iAFStep / 100, iAFLimit / 100)
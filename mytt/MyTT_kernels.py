@@ -0,0 +1,162 @@
+# MyTT 逐K线递推函数的加速内核
+# 能改写成 ufunc.accumulate 或倍增表的函数直接用 numpy 无循环实现
+# 其余必须逐K线递推的函数(DMA序列,SAR,TDX_SAR,DSMA)写成 numba 兼容的纯 Python 循环:
+# import 时检测到 numba 就编译成机器码，没有安装 numba 时原样作为纯 Python 版本运行，结果完全一致
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND = 'numba' if numba is not None else 'python'
+
+
+def _jit(func):  # 有 numba 时编译，否则返回原函数
+    if numba is None:
+        return func
+    return numba.njit(cache=True, nogil=True)(func)
+
+
+# ------------------ 无循环实现 --------------------------------------------
+
+def barslast(S):  # 当前下标减去最近一次成立的下标，从未成立时视作 -1 处成立
+    S = np.asarray(S).astype(bool)
+    idx = np.arange(len(S))
+    return idx - np.maximum.accumulate(np.where(S, idx, -1))
+
+
+def barslastcount(S):  # 当前下标减去最近一次不成立的下标，不成立处为0
+    S = np.asarray(S).astype(bool)
+    idx = np.arange(len(S))
+    return np.where(S, idx - np.maximum.accumulate(np.where(S, -1, idx)), 0).astype(float)
+
+
+def _range_reduce(S, N, ufunc):  # N为序列的区间最值，倍增表(sparse table)查询，每个区间拆成两段重叠的 2^k 长度
+    S = np.asarray(S, dtype=float)
+    N = np.asarray(N, dtype=float)
+    res = np.repeat(np.nan, len(S))
+    right = np.arange(len(S))
+    valid = ~np.isnan(N) & (N > 0) & (N <= right + 1)
+    if not valid.any(): return res
+
+    right = right[valid]
+    length = N[valid].astype(np.int64)
+    left = right + 1 - length
+    level = np.frexp(length)[1] - 1  # floor(log2(length))，整数运算无浮点误差
+
+    table = S
+    for k in range(int(level.max()) + 1):
+        if k > 0: table = ufunc(table[:-(1 << (k - 1))], table[1 << (k - 1):])  # table[p] = 区间 [p, p + 2^k) 的最值
+        hit = level == k
+        if hit.any():
+            res[right[hit]] = ufunc(table[left[hit]], table[right[hit] + 1 - (1 << k)])
+    return res
+
+
+def hhv_series(S, N):  return _range_reduce(S, N, np.maximum)
+
+
+def llv_series(S, N):  return _range_reduce(S, N, np.minimum)
+
+
+# ------------------ 逐K线递推内核 --------------------------------------------
+
+@_jit
+def filter_drop(T, N):  # T为条件成立的升序下标，返回落在前一个有效信号后N周期内、需要置0的位置
+    drop = np.zeros(len(T), dtype=np.bool_)
+    end = -1
+    for j in range(len(T)):
+        if T[j] <= end:
+            drop[j] = True
+        else:
+            end = T[j] + N
+    return drop
+
+
+@_jit
+def dma_loop(S, A):  # Y = A*S + (1-A)*REF(Y)，A为序列
+    Y = np.zeros(len(S))
+    Y[0] = S[0]
+    for i in range(1, len(S)): Y[i] = A[i] * S[i] + (1 - A[i]) * Y[i - 1]
+    return Y
+
+
+@_jit
+def dsma_filt(Zeros, c1, c2, c3):  # DSMA 的二阶滤波递推，保留原实现 i=0 时 Zeros[-1] 的回绕引用
+    Filt = np.zeros(len(Zeros))
+    for i in range(len(Zeros)):
+        Filt[i] = c1 * (Zeros[i] + Zeros[i - 1]) / 2 + c2 * Filt[i - 1] + c3 * Filt[i - 2]
+    return Filt
+
+
+@_jit
+def sar_loop(HIGH, LOW, s_hhv, s_llv, N, f_step, f_max, is_long):
+    af = 0.0
+    b_first = True
+    sar_x = np.full(len(HIGH), np.nan)
+    for i in range(N, len(HIGH)):
+        if b_first:  # 第一步
+            af = f_step
+            sar_x[i] = s_llv[i] if is_long else s_hhv[i]
+            b_first = False
+        else:  # 继续多 或者 空
+            ep = s_hhv[i] if is_long else s_llv[i]  # 极值
+            if (is_long and HIGH[i] > ep) or ((not is_long) and LOW[i] < ep):  # 顺势：多创新高 或者 空创新低
+                af = min(af + f_step, f_max)
+            sar_x[i] = sar_x[i - 1] + af * (ep - sar_x[i - 1])
+
+        if (is_long and LOW[i] < sar_x[i]) or ((not is_long) and HIGH[i] > sar_x[i]):  # 反空 或者 反多
+            is_long = not is_long
+            b_first = True
+    return sar_x
+
+
+@_jit
+def tdx_sar_loop(High, Low, af_step, af_limit):
+    SarX = np.zeros(len(High))
+
+    # 第一个bar
+    bull = True
+    af = af_step
+    ep = High[0]
+    SarX[0] = Low[0]
+    # 第2个bar及其以后
+    for i in range(1, len(High)):
+        # 1.更新：hv, lv, af, ep
+        if bull:  # 多
+            if High[i] > ep:  # 创新高
+                ep = High[i]
+                af = min(af + af_step, af_limit)
+        else:  # 空
+            if Low[i] < ep:  # 创新低
+                ep = Low[i]
+                af = min(af + af_step, af_limit)
+        # 2.计算SarX
+        SarX[i] = SarX[i - 1] + af * (ep - SarX[i - 1])
+
+        # 3.修正SarX
+        if bull:
+            SarX[i] = max(SarX[i - 1], min(SarX[i], Low[i], Low[i - 1]))
+        else:
+            SarX[i] = min(SarX[i - 1], max(SarX[i], High[i], High[i - 1]))
+
+        # 4. 判断是否：向下跌破，向上突破
+        if bull:  # 多
+            if Low[i] < SarX[i]:  # 向下跌破，转空
+                bull = False
+                tmp_SarX = ep  # 上阶段的最高点
+                ep = Low[i]
+                af = af_step
+                if High[i - 1] == tmp_SarX:  # 紧邻即最高点
+                    SarX[i] = tmp_SarX
+                else:
+                    SarX[i] = tmp_SarX + af * (ep - tmp_SarX)
+        else:  # 空
+            if High[i] > SarX[i]:  # 向上突破, 转多
+                bull = True
+                ep = High[i]
+                af = af_step
+                SarX[i] = min(Low[i], Low[i - 1])
+    return SarX
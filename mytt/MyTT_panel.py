@@ -0,0 +1,80 @@
+# MyTT 面板版本：所有函数沿最后一个轴计算
+# 输入既可以是单只股票的一维序列，也可以是 (codes × days) 的二维数组，一次算完全市场
+# 递推类函数(EMA/SMA)与 pandas ewm(adjust=False) 的计算顺序一致，结果和 MyTT 逐位相同
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from mytt.MyTT import RD, ABS, MAX, MIN, IF
+
+
+def _pad_left(S, R, N):
+    res = np.full(S.shape, np.nan)
+    if N <= S.shape[-1]:
+        res[..., N - 1:] = R
+    return res
+
+
+def REF(S, N=1):  # 沿时间轴整体下移N，前面补nan
+    S = np.asarray(S, dtype=float)
+    if N == 0:
+        return S.copy()
+    res = np.full(S.shape, np.nan)
+    if N < S.shape[-1]:
+        res[..., N:] = S[..., :-N]
+    return res
+
+
+def MA(S, N):  # N日简单移动平均
+    S = np.asarray(S, dtype=float)
+    if N > S.shape[-1]:
+        return np.full(S.shape, np.nan)
+    return _pad_left(S, sliding_window_view(S, N, axis=-1).mean(axis=-1), N)
+
+
+def SUM(S, N):  # N日累计和
+    S = np.asarray(S, dtype=float)
+    if N > S.shape[-1]:
+        return np.full(S.shape, np.nan)
+    return _pad_left(S, sliding_window_view(S, N, axis=-1).sum(axis=-1), N)
+
+
+def HHV(S, N):  # N日最高
+    S = np.asarray(S, dtype=float)
+    if N > S.shape[-1]:
+        return np.full(S.shape, np.nan)
+    return _pad_left(S, sliding_window_view(S, N, axis=-1).max(axis=-1), N)
+
+
+def LLV(S, N):  # N日最低
+    S = np.asarray(S, dtype=float)
+    if N > S.shape[-1]:
+        return np.full(S.shape, np.nan)
+    return _pad_left(S, sliding_window_view(S, N, axis=-1).min(axis=-1), N)
+
+
+def EWM(S, alpha):  # pandas ewm(alpha, adjust=False)，前导nan从第一个有效值开始
+    S = np.asarray(S, dtype=float)
+    if S.shape[-1] == 0:
+        return np.empty(S.shape)
+
+    T = np.ascontiguousarray(np.moveaxis(S, -1, 0))  # 时间轴放到最前，逐日递推时内存连续
+    res = np.empty(T.shape)
+    old_wt = 1. - alpha
+    weighted = T[0].copy()
+    res[0] = weighted
+    for i in range(1, T.shape[0]):
+        cur = T[i]
+        step = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        keep = np.isnan(cur) | (weighted == cur)
+        weighted = np.where(np.isnan(weighted), cur, np.where(keep, weighted, step))
+        res[i] = weighted
+    return np.moveaxis(res, 0, -1)
+
+
+def EMA(S, N):  # 指数移动平均 alpha=2/(span+1)
+    return EWM(S, 2.0 / (1.0 + N))
+
+
+def SMA(S, N, M=1):  # 中国式的SMA alpha=M/N
+    return EWM(S, M / N)
@@ -8,7 +8,8 @@ from credentials import *
 from tools.utils_basic import logging_init, is_symbol
 from tools.utils_cache import *
 from tools.utils_ding import DingMessager
-from tools.utils_remote import append_ak_quote_dict, DataSource
+from tools.utils_latency import latency
+from tools.utils_remote import DataSource
 
 from delegate.xt_subscriber import XtSubscriber, update_position_held
 
@@ -16,7 +17,8 @@ from trader.buyer import BaseBuyer as Buyer
 from trader.pools import StocksPoolWhitePrefixes as Pool
 from trader.seller_groups import DeepseekGroupSeller as Seller
 
-from selector.selector_deepseek import select
+from selector.selector_deepseek import select_panel
+from tools.utils_panel import HistoryPanel
 
 data_source = DataSource.AKSHARE
 
@@ -32,11 +34,12 @@ PATH_DEAL = PATH_BASE + '/deal_hist.csv'        # 记录历史成交
 PATH_HELD = PATH_BASE + '/held_days.json'       # 记录持仓日期
 PATH_MAXP = PATH_BASE + '/max_price.json'       # 记录历史最高
 PATH_LOGS = PATH_BASE + '/logs.txt'             # 用来存储选股和委托操作
-PATH_INFO = PATH_BASE + '/tmp_{}.pkl'           # 用来缓存当天的指标信息
+PATH_HIST = PATH_BASE + '/history'              # 增量缓存的历史日线，列式存储目录
 
 lock_of_disk_cache = threading.Lock()           # 操作磁盘文件缓存的锁
 
 cache_selected: Dict[str, Set] = {}             # 记录选股历史，去重
+cache_panel: Optional[HistoryPanel] = None      # 盘前堆叠好的历史行情面板
 
 
 def debug(*args):
@@ -124,9 +127,6 @@ def prepare_history() -> None:
         return
 
     now = datetime.datetime.now()
-    for i in range(15, 30):
-        delete_file(PATH_INFO.format((now - datetime.timedelta(days=i)).strftime('%Y_%m_%d')))
-    cache_path = PATH_INFO.format(now.strftime('%Y_%m_%d'))
 
     start = get_prev_trading_date(now, PoolConf.day_count)
     end = get_prev_trading_date(now, 1)
@@ -137,7 +137,7 @@ def prepare_history() -> None:
     history_list += [position.stock_code for position in positions if is_symbol(position.stock_code)]
 
     my_suber.download_cache_history(
-        cache_path=cache_path,
+        cache_path=PATH_HIST,
         code_list=history_list,
         start=start,
         end=end,
@@ -146,21 +146,26 @@ def prepare_history() -> None:
         data_source=data_source
     )
 
+    global cache_panel
+    cache_panel = HistoryPanel(my_suber.cache_history, PoolConf.columns)
+    print(f'History panel stacked {len(cache_panel)} codes x {cache_panel.days} days')
 
-# ======== 买点 ========
 
+# ======== 买点 ========
 
-def check_stock(code: str, quote: Dict, curr_date: str) -> (bool, Dict):
-    df = append_ak_quote_dict(my_suber.cache_history[code], quote, curr_date)
 
-    result_df = select(df, code, quote)
-    buy = result_df['PASS'].values[-1]
+def check_stocks(quotes: Dict) -> Set[str]:
+    if cache_panel is None:
+        return set()
 
-    return buy, {'reason': ''}
+    cache_panel.set_quotes(quotes)
+    passed = select_panel(cache_panel)
+    return set(cache_panel.get_codes(passed))
 
 
 def select_stocks(quotes: Dict, curr_date: str) -> List[Dict[str, any]]:
     selections = []
+    passed_codes = check_stocks(quotes)
 
     for code in quotes:
         if code not in my_suber.cache_history:
@@ -177,10 +182,9 @@ def select_stocks(quotes: Dict, curr_date: str) -> List[Dict[str, any]]:
 
         quote = quotes[code]
 
-        passed, info = check_stock(code, quote, curr_date)
-        if not passed:
-            # debug(f'{code} {info}')
+        if code not in passed_codes:
             continue
+        info = {'reason': ''}
 
         prev_close = quote['lastClose']
         curr_open = quote['open']
@@ -214,6 +218,7 @@ def select_stocks(quotes: Dict, curr_date: str) -> List[Dict[str, any]]:
 def scan_buy(quotes: Dict, curr_date: str, positions: List) -> None:
     selections = select_stocks(quotes, curr_date)
     debug(len(quotes), selections)
+    latency.mark('select')
 
     # 选出一个以上的股票
     if len(selections) > 0:
@@ -282,7 +287,8 @@ def execute_strategy(curr_date: str, curr_time: str, curr_seconds: str, curr_quo
     for time_range in BuyConf.time_ranges:
         if time_range[0] <= curr_time <= time_range[1]:
             if int(curr_seconds) % BuyConf.interval == 0:
-                scan_buy(curr_quotes, curr_date, positions)
+                with my_delegate.order_batch('买入'):  # 整批异步提交，委托记录在提交完成后执行
+                    scan_buy(curr_quotes, curr_date, positions)
                 return True
 
     return False
@@ -8,6 +8,7 @@ from credentials import *
 from tools.utils_basic import logging_init, is_symbol
 from tools.utils_cache import *
 from tools.utils_ding import DingMessager
+from tools.utils_latency import latency
 
 from delegate.xt_delegate import xt_get_ticks
 from delegate.xt_subscriber import XtSubscriber, update_position_held
@@ -32,7 +33,7 @@ PATH_DEAL = PATH_BASE + '/deal_hist.csv'        # 记录历史成交
 PATH_HELD = PATH_BASE + '/held_days.json'       # 记录持仓日期
 PATH_MAXP = PATH_BASE + '/max_price.json'       # 记录历史最高
 PATH_LOGS = PATH_BASE + '/logs.txt'             # 用来存储选股和委托操作
-PATH_INFO = PATH_BASE + '/tmp_{}.pkl'           # 用来缓存当天的指标信息
+PATH_HIST = PATH_BASE + '/history'              # 增量缓存的历史日线，列式存储目录
 
 lock_of_disk_cache = threading.Lock()           # 操作磁盘文件缓存的锁
 
@@ -125,9 +126,6 @@ def prepare_history() -> None:
         return
 
     now = datetime.datetime.now()
-    for i in range(15, 30):
-        delete_file(PATH_INFO.format((now - datetime.timedelta(days=i)).strftime('%Y_%m_%d')))
-    cache_path = PATH_INFO.format(now.strftime('%Y_%m_%d'))
 
     start = get_prev_trading_date(now, PoolConf.day_count)
     end = get_prev_trading_date(now, 1)
@@ -137,7 +135,7 @@ def prepare_history() -> None:
     holding_list = [position.stock_code for position in positions if is_symbol(position.stock_code)]
 
     my_suber.download_cache_history(
-        cache_path=cache_path,
+        cache_path=PATH_HIST,
         code_list=holding_list,
         start=start,
         end=end,
@@ -200,6 +198,8 @@ def scan_buy(quotes: Dict, curr_date: str, positions: List) -> None:
         once_quotes = xt_get_ticks(selected_codes)
         selections = check_stock_codes(selected_codes, once_quotes)
 
+    latency.mark('select')
+
     if len(selections) > 0:
         position_codes = [position.stock_code for position in positions]
         position_count = get_holding_position_count(positions)
@@ -266,7 +266,8 @@ def execute_strategy(curr_date: str, curr_time: str, curr_seconds: str, curr_quo
     for time_range in BuyConf.time_ranges:
         if time_range[0] <= curr_time <= time_range[1]:
             if int(curr_seconds) % BuyConf.interval == 0:
-                scan_buy(curr_quotes, curr_date, positions)
+                with my_delegate.order_batch('买入'):  # 整批异步提交，委托记录在提交完成后执行
+                    scan_buy(curr_quotes, curr_date, positions)
                 return True
 
     return True
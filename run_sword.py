@@ -8,6 +8,7 @@ from credentials import *
 from tools.utils_basic import logging_init, is_symbol
 from tools.utils_cache import *
 from tools.utils_ding import DingMessager
+from tools.utils_latency import latency
 
 from delegate.xt_subscriber import XtSubscriber, update_position_held
 
@@ -152,6 +153,7 @@ def select_stocks(quotes: Dict) -> List[Dict[str, any]]:
 
 def scan_buy(quotes: Dict, curr_date: str, positions: List) -> None:
     selections = select_stocks(quotes)
+    latency.mark('select')
 
     # 选出一个以上的股票
     if len(selections) > 0:
@@ -198,7 +200,8 @@ def execute_strategy(curr_date: str, curr_time: str, curr_seconds: str, curr_quo
     for time_range in BuyConf.time_ranges:
         if time_range[0] <= curr_time <= time_range[1]:
             if int(curr_seconds) % BuyConf.interval == 0:
-                scan_buy(curr_quotes, curr_date, positions)
+                with my_delegate.order_batch('买入'):  # 整批异步提交，委托记录在提交完成后执行
+                    scan_buy(curr_quotes, curr_date, positions)
                 return True
 
     return False
@@ -8,6 +8,7 @@ from credentials import *
 from tools.utils_basic import logging_init, is_symbol
 from tools.utils_cache import *
 from tools.utils_ding import DingMessager
+from tools.utils_latency import latency
 
 from delegate.xt_delegate import xt_get_ticks
 from delegate.xt_subscriber import XtSubscriber, update_position_held
@@ -157,6 +158,8 @@ def scan_buy(quotes: Dict, curr_date: str, positions: List) -> None:
         once_quotes = xt_get_ticks(selected_codes)
         selections = check_stock_codes(selected_codes, once_quotes)
 
+    latency.mark('select')
+
     if len(selections) > 0:
         position_codes = [position.stock_code for position in positions]
         position_count = get_holding_position_count(positions)
@@ -223,7 +226,8 @@ def execute_strategy(curr_date: str, curr_time: str, curr_seconds: str, curr_quo
     for time_range in BuyConf.time_ranges:
         if time_range[0] <= curr_time <= time_range[1]:
             if int(curr_seconds) % BuyConf.interval == 0:
-                scan_buy(curr_quotes, curr_date, positions)
+                with my_delegate.order_batch('买入'):  # 整批异步提交，委托记录在提交完成后执行
+                    scan_buy(curr_quotes, curr_date, positions)
                 return True
 
     return False
@@ -87,22 +87,20 @@
 
 """
 
-# from mytt.MyTT import *
-from mytt.MyTT_advance import *
-from mytt.MyTT_custom import *
+import numpy as np
+import pandas as pd
 
+from mytt.MyTT_custom import ATAN
+from mytt.MyTT_panel import *
 
-def select(df: pd.DataFrame, code: str, quote: dict):
-    if len(df.close) < 90:
-        df['PASS'] = False
-        return df
+from tools.utils_panel import HistoryPanel
 
-    O = df.open
-    C = df.close
-    H = df.high
-    L = df.low
-    V = df.volume
 
+MIN_HISTORY = 90    # 至少需要的K线数量
+
+
+# 选股公式，所有计算沿最后一个轴，既支持单只股票的一维序列，也支持 (codes × days) 面板
+def select_formula(O: np.ndarray, C: np.ndarray, H: np.ndarray, L: np.ndarray, V: np.ndarray) -> np.ndarray:
     # ————— 参数模块（可自定义调整）—————
     趋势周期 = 30   # 趋势判定周期，建议20~60
     动量周期 = 5    # 短期动量周期，建议5~10
@@ -138,8 +136,33 @@ def select(df: pd.DataFrame, code: str, quote: dict):
     # 短期动量加速
     # 波动率可控
     # 基础流动性保障
-    选股信号 = COND_趋势 & COND_放量 & COND_动量 & COND_波动 & COND_流动性
+    return COND_趋势 & COND_放量 & COND_动量 & COND_波动 & COND_流动性
 
-    df['PASS'] = 选股信号
 
+def select(df: pd.DataFrame, code: str, quote: dict):
+    if len(df.close) < MIN_HISTORY:
+        df['PASS'] = False
+        return df
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        df['PASS'] = select_formula(
+            df.open.values,
+            df.close.values,
+            df.high.values,
+            df.low.values,
+            df.volume.values,
+        )
     return df
+
+
+# 面板模式：先用 panel.set_quotes() 写入实时行情，再一次性计算所有 code 的最后一根K线
+def select_panel(panel: HistoryPanel) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        passed = select_formula(
+            panel['open'],
+            panel['close'],
+            panel['high'],
+            panel['low'],
+            panel['volume'],
+        )[:, -1]
+    return passed & panel.quoted & (panel.lengths + 1 >= MIN_HISTORY)
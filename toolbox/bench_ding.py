@@ -0,0 +1,73 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tools.utils_ding import DingMessager
+
+
+# --------------------------------
+# 本地钉钉机器人替身，验证异步发送不阻塞调用方、同标签消息合并、限流和重试
+#   delay: 每次请求的响应延迟，模拟网络慢
+#   fail_first: 前几次请求返回发送过快的错误码，触发重试
+# --------------------------------
+class StandIn:
+    def __init__(self, delay: float = 0.0, fail_first: int = 0):
+        self.delay = delay
+        self.fail_first = fail_first
+        self.requests = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stand_in.requests.append((time.monotonic(), body))
+                time.sleep(stand_in.delay)
+                if len(stand_in.requests) <= stand_in.fail_first:
+                    res = {'errcode': 130101, 'errmsg': 'send too fast'}
+                else:
+                    res = {'errcode': 0, 'errmsg': 'ok'}
+                payload = json.dumps(res).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/robot/send?access_token=test'
+
+    def titles(self) -> list[str]:
+        return [body.get('markdown', {}).get('title', body.get('text', {}).get('content')) for _, body in self.requests]
+
+
+def burst_fills(count: int = 30) -> None:
+    stand_in = StandIn(delay=0.5)
+    messager = DingMessager('SECtest', stand_in.url)
+    t0 = time.perf_counter()
+    for i in range(count):
+        messager.send_text(f'[**0000]测试 买入\n09:31:{i:02d} 买成 {600000 + i}.SH\n测试 100股 10.00元', '[BUY]')
+    cost = (time.perf_counter() - t0) * 1000
+    messager.close()
+    print(f'\n{count} 条成交消息入队 {cost:.2f}ms，实际请求 {len(stand_in.requests)} 次: {stand_in.titles()}')
+
+
+def rate_limited(count: int = 12, limit: int = 5, period: float = 2.0) -> None:
+    stand_in = StandIn(fail_first=2)
+    messager = DingMessager('SECtest', stand_in.url, rate_limit=limit, rate_period=period, retry_backoff=0.1)
+    for i in range(count):
+        messager.send_markdown(f'日报 {i}', f'第{i}条')
+    t0 = time.monotonic()
+    messager.close(timeout=30)
+    times = [t - t0 for t, _ in stand_in.requests]
+    worst = max(sum(1 for t in times if s <= t < s + period) for s in times)
+    print(f'{count} 条不合并的消息 + 2 次限流错误重试，共请求 {len(times)} 次，'
+          f'用时 {time.monotonic() - t0:.1f}s，任意 {period}s 内最多 {worst} 次（上限 {limit}）')
+
+
+if __name__ == '__main__':
+    burst_fills()
+    rate_limited()
@@ -0,0 +1,41 @@
+import time
+
+from tools.utils_download import FakeDataSource, TokenBucket, download_daily_histories
+
+columns = ['datetime', 'open', 'high', 'low', 'close', 'volume', 'amount']
+start, end = '20240101', '20241031'
+adjust = 'qfq'
+
+
+def run(code_count: int, rate: float, burst: int, workers: int, latency: float,
+        fail_times: int = 0, fail_ratio: float = 0.0) -> None:
+    codes = [f'{600000 + i}.SH' for i in range(code_count)]
+    codes.reverse()     # 打乱自然顺序，检查结果按 target_codes 的顺序返回
+    fake = FakeDataSource(latency=latency, fail_times=fail_times, fail_ratio=fail_ratio)
+    bucket = TokenBucket(rate, burst)
+
+    t0 = time.perf_counter()
+    histories = download_daily_histories(
+        codes, start, end, adjust, columns,
+        fetch=fake, bucket=bucket, max_workers=workers, backoff=0.05, progress=lambda *args: None)
+    cost = time.perf_counter() - t0
+
+    # 令牌桶允许的上限：任意 1 秒内最多 burst + rate 次请求
+    ceiling = burst + rate
+    peak = fake.max_calls_in_window(1.0)
+    print(f'{code_count} codes, rate {rate}/s burst {burst} workers {workers} latency {latency * 1000:.0f}ms: '
+          f'{len(fake.calls)} calls in {cost:.2f}s ({len(fake.calls) / cost:.1f}/s), '
+          f'peak {peak} per second, ceiling {ceiling:.0f}')
+
+    assert peak <= ceiling, f'rate limit exceeded: {peak} > {ceiling}'
+    assert list(histories.keys()) == codes, 'result order differs from target_codes'
+    for code in codes[:10]:
+        assert histories[code].equals(fake(code, start, end, columns)), code
+
+
+if __name__ == '__main__':
+    run(code_count=200, rate=50.0, burst=10, workers=8, latency=0.02)
+    # 部分 code 前两次请求失败，重试也要先拿令牌
+    run(code_count=200, rate=50.0, burst=10, workers=8, latency=0.02, fail_times=2, fail_ratio=0.3)
+    # 网络慢时吞吐受并发数限制，网络快时受限流限制
+    run(code_count=100, rate=100.0, burst=10, workers=4, latency=0.1)
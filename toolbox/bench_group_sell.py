@@ -0,0 +1,157 @@
+import time
+
+import numpy as np
+
+from xtquant.xttype import XtPosition
+
+from delegate.base_delegate import BaseDelegate
+from trader.seller import BaseSeller
+from trader.seller_groups import GroupSellers, HardSeller, SwitchSeller, FallSeller, ReturnSeller, DropSeller
+
+
+# 核对 GroupSellers 批量卖出和逐只 check_sell 的卖出决定是否一致，并比较耗时
+class RecordDelegate(BaseDelegate):
+    def __init__(self):
+        super().__init__()
+        self.orders = []
+
+    def check_asset(self):
+        pass
+
+    def check_orders(self):
+        return []
+
+    def check_positions(self):
+        return []
+
+    def order_market_open(self, code, price, volume, remark, strategy_name='non-name'):
+        self.orders.append((code, volume, remark))
+
+    def order_market_close(self, code, price, volume, remark, strategy_name='non-name'):
+        self.orders.append((code, volume, remark))
+
+    def order_limit_open(self, code, price, volume, remark, strategy_name='non-name'):
+        self.orders.append((code, volume, remark))
+
+    def order_limit_close(self, code, price, volume, remark, strategy_name='non-name'):
+        self.orders.append((code, volume, remark))
+
+    def order_cancel_all(self):
+        pass
+
+    def order_cancel_buy(self, code):
+        pass
+
+    def order_cancel_sell(self, code):
+        pass
+
+
+class BenchConf:
+    order_premium = 0.03
+
+    hard_time_range = ['09:31', '14:57']
+    earn_limit = 1.25
+    risk_limit = 1 - 0.05
+    risk_tight = 0.002
+
+    switch_time_range = ['14:30', '14:57']
+    switch_hold_days = 3
+    switch_demand_daily_up = 0.003
+
+    fall_time_range = ['09:31', '14:57']
+    fall_from_top = [
+        (1.08, 9.99, 0.02),
+        (1.02, 1.08, 0.05),
+    ]
+
+    return_time_range = ['09:31', '14:57']
+    return_of_profit = [
+        (1.11, 9.99, 0.100),
+        (1.08, 1.11, 0.300),
+        (1.05, 1.08, 0.600),
+        (1.03, 1.05, 0.800),
+        (1.02, 1.03, 0.900),
+    ]
+
+    drop_time_range = ['09:31', '14:57']
+    drop_out_limits = [
+        (1.07, 9.99, 0.030),
+        (1.03, 1.07, 0.020),
+    ]
+
+
+class BenchGroupSeller(GroupSellers):
+    components = [DropSeller, HardSeller, SwitchSeller, FallSeller, ReturnSeller]
+
+
+def make_case(count: int, seed: int):
+    rng = np.random.default_rng(seed)
+    quotes, positions, held_days, max_prices = {}, [], {}, {}
+    for i in range(count):
+        code = f'{600000 + i}.SH'
+        cost = round(float(rng.uniform(5, 50)), 2)
+        last_close = round(cost * float(rng.uniform(0.9, 1.2)), 2)
+        o = round(last_close * float(rng.uniform(0.97, 1.10)), 2)
+        c = round(o * float(rng.uniform(0.92, 1.05)), 2)
+        h = max(o, c) + round(float(rng.choice([0, 0.01, 0.05])), 2)
+        l = c if rng.random() < 0.5 else min(o, c) - 0.01
+        quotes[code] = {'lastPrice': c, 'open': o, 'high': h, 'low': l, 'lastClose': last_close, 'volume': 1000}
+        positions.append(XtPosition('SIM', code, 1000, 1000, cost, cost * 1000, 0, 0, 0, cost, 0, code))
+        if rng.random() < 0.95:
+            held_days[code] = int(rng.integers(0, 6))
+        if rng.random() < 0.8:
+            max_prices[code] = round(max(cost, c) * float(rng.uniform(1.0, 1.2)), 2)
+    return quotes, positions, held_days, max_prices
+
+
+def run(seller: BenchGroupSeller, batch: bool, case, curr_time: str) -> list:
+    quotes, positions, held_days, max_prices = case
+    seller.delegate.orders = []
+    if batch:
+        seller.execute_sell(quotes, '2024-12-31', curr_time, positions, held_days, max_prices, {})
+    else:
+        BaseSeller.execute_sell(seller, quotes, '2024-12-31', curr_time, positions, held_days, max_prices, {})
+    return sorted(seller.delegate.orders)
+
+
+def check_parity(count: int = 300, seeds=range(20), times=('09:30', '09:45', '14:40', '14:57')) -> bool:
+    seller = BenchGroupSeller('压测', RecordDelegate(), BenchConf)
+    all_passed = True
+    sold = 0
+    for seed in seeds:
+        case = make_case(count, seed)
+        for curr_time in times:
+            expected = run(seller, False, case, curr_time)
+            actual = run(seller, True, case, curr_time)
+            sold += len(expected)
+            if expected != actual:
+                all_passed = False
+                print(f'[MISMATCH] seed={seed} time={curr_time}\n  old={expected}\n  new={actual}')
+    print(f'parity {"OK" if all_passed else "FAILED"}, {sold} sells compared')
+    return all_passed
+
+
+def bench(count: int = 200, loops: int = 200) -> None:
+    seller = BenchGroupSeller('压测', RecordDelegate(), BenchConf)
+    # 没有任何卖出的行情，所有规则和档位都要判断一遍，只测扫描本身
+    case = make_case(count, 0)
+    quotes, positions, held_days, max_prices = case
+    for position in positions:
+        code = position.stock_code
+        quote = quotes[code]
+        quote['lastPrice'] = quote['high'] = quote['low'] = quote['open']
+        position.open_price = quote['lastPrice']
+        held_days[code] = 1
+        max_prices[code] = quote['lastPrice'] * 1.01
+
+    for batch in (False, True):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            run(seller, batch, case, '10:00')
+        cost = (time.perf_counter() - t0) / loops * 1000
+        print(f'{"batch" if batch else "loop "}: {count} positions {cost:.3f} ms/scan')
+
+
+if __name__ == '__main__':
+    check_parity()
+    bench()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import time
+
+from tools.utils_cache import load_pickle, save_pickle
+from tools.utils_download import FakeDataSource
+from tools.utils_history import ColumnarFrames, HistoryStore, feather
+from tools.utils_panel import HistoryPanel
+
+root = './_cache/debug/bench_history'
+pickle_path = f'{root}/tmp.pkl'
+store_path = f'{root}/history'
+
+columns = ['datetime', 'open', 'high', 'low', 'close', 'volume', 'amount']
+start, end = '20240101', '20241031'
+adjust = 'qfq'
+
+
+def prepare(code_count: int) -> list:
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root, exist_ok=True)
+
+    fake = FakeDataSource()
+    codes = [f'{600000 + i}.SH' for i in range(code_count)]
+    histories = {code: fake(code, start, end, columns) for code in codes}
+
+    save_pickle(pickle_path, histories)  # 原来的 download_cache_history 缓存格式
+    ColumnarFrames.write(store_path, {(code, adjust): df for code, df in histories.items()},
+                         {(code, adjust): start for code in codes})
+    return codes
+
+
+def measure(codes: list) -> None:
+    t0 = time.perf_counter()
+    histories = load_pickle(pickle_path)
+    t1 = time.perf_counter()
+    print(f'pickle   load {len(histories)} codes: {(t1 - t0) * 1000:.1f} ms')
+
+    t0 = time.perf_counter()
+    view = HistoryStore(store_path).get(codes, start, end, adjust, columns)
+    t1 = time.perf_counter()
+    print(f'columnar open {len(view)} codes: {(t1 - t0) * 1000:.1f} ms '
+          f'({"feather" if feather is not None else "npy memmap"})')
+
+    # 全市场扫描：字典里的 DataFrame 与惰性视图直接取列分别堆叠成面板
+    t0 = time.perf_counter()
+    panel_dict = HistoryPanel(histories, columns)
+    t1 = time.perf_counter()
+    panel_view = HistoryPanel(view, columns)
+    t2 = time.perf_counter()
+    print(f'panel from pickle: {(t1 - t0) * 1000:.1f} ms, from columnar: {(t2 - t1) * 1000:.1f} ms')
+    assert all((panel_dict[c] == panel_view[c]).sum() == (panel_dict[c] == panel_dict[c]).sum() for c in panel_view.columns)
+
+    # 按需访问：cache_history[code] 首次访问时生成 DataFrame
+    t0 = time.perf_counter()
+    for code in view:
+        _ = view[code]
+    t1 = time.perf_counter()
+    print(f'columnar materialize all: {(t1 - t0) * 1000:.1f} ms, per code: {(t1 - t0) / len(view) * 1e6:.0f} us')
+    assert all(view[code].equals(histories[code]) for code in codes)
+
+
+if __name__ == '__main__':
+    measure(prepare(4000))
@@ -0,0 +1,142 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from mytt import MyTT, MyTT_kernels
+
+
+# 旧版 rolling().apply 实现，用来核对新版向量化函数的结果
+def OLD_HHVBARS(S, N):
+    return pd.Series(S).rolling(N).apply(lambda x: np.argmax(x[::-1]), raw=True).values
+
+
+def OLD_LLVBARS(S, N):
+    return pd.Series(S).rolling(N).apply(lambda x: np.argmin(x[::-1]), raw=True).values
+
+
+def OLD_WMA(S, N):
+    return pd.Series(S).rolling(N).apply(lambda x: x[::-1].cumsum().sum() * 2 / N / (N + 1), raw=True).values
+
+
+def OLD_AVEDEV(S, N):
+    return pd.Series(S).rolling(N).apply(lambda x: (np.abs(x - x.mean())).mean()).values
+
+
+def OLD_SLOPE(S, N):
+    return pd.Series(S).rolling(N).apply(lambda x: np.polyfit(range(N), x, deg=1)[0], raw=True).values
+
+
+def OLD_FORCAST(S, N):
+    return pd.Series(S).rolling(N).apply(lambda x: np.polyval(np.polyfit(range(N), x, deg=1), N - 1), raw=True).values
+
+
+def OLD_LAST(S, A, B):
+    return np.array(pd.Series(S).rolling(A + 1).apply(lambda x: np.all(x[::-1][B:]), raw=True), dtype=bool)
+
+
+CASES = [
+    ('HHVBARS', OLD_HHVBARS, MyTT.HHVBARS, 'price', (10,)),
+    ('LLVBARS', OLD_LLVBARS, MyTT.LLVBARS, 'price', (10,)),
+    ('WMA', OLD_WMA, MyTT.WMA, 'price', (10,)),
+    ('AVEDEV', OLD_AVEDEV, MyTT.AVEDEV, 'price', (14,)),
+    ('SLOPE', OLD_SLOPE, MyTT.SLOPE, 'price', (5,)),
+    ('FORCAST', OLD_FORCAST, MyTT.FORCAST, 'price', (5,)),
+    ('LAST', OLD_LAST, MyTT.LAST, 'bool', (5, 1)),
+]
+
+
+def make_series(length: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    price = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    price[:3] = np.nan  # 模拟 MACD 等指标开头的 nan
+    return {
+        'price': price,
+        'bool': rng.random(length) > 0.3,
+    }
+
+
+def check_parity(lengths=(1, 3, 5, 6, 20, 250), rtol=1e-9, atol=1e-9) -> bool:
+    all_passed = True
+    for length in lengths:
+        series = make_series(length, seed=length)
+        for name, old_func, new_func, kind, args in CASES:
+            expected = old_func(series[kind], *args)
+            actual = new_func(series[kind], *args)
+            passed = expected.shape == actual.shape and \
+                np.allclose(expected, actual, rtol=rtol, atol=atol, equal_nan=True)
+            if not passed:
+                all_passed = False
+                print(f'[FAIL] {name} length={length}\n  old: {expected}\n  new: {actual}')
+    print(f'Parity {"passed" if all_passed else "FAILED"}')
+    return all_passed
+
+
+def benchmark(length: int = 5000, repeat: int = 3) -> None:
+    series = make_series(length)
+    print(f'{"function":<10}{"old(ms)":>12}{"new(ms)":>12}{"speedup":>10}')
+    for name, old_func, new_func, kind, args in CASES:
+        costs = []
+        for func in [old_func, new_func]:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                func(series[kind], *args)
+            costs.append((time.perf_counter() - t0) / repeat * 1000)
+        print(f'{name:<10}{costs[0]:>12.2f}{costs[1]:>12.3f}{costs[0] / costs[1]:>9.0f}x')
+
+
+# 逐K线递推内核：对比 numba 编译版本和纯 Python 版本
+def kernel_cases(length: int, seed: int = 0) -> list:
+    rng = np.random.default_rng(seed)
+    close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, length)))
+    high, low = close * (1 + rng.random(length) * 0.02), close * (1 - rng.random(length) * 0.02)
+    alpha = rng.random(length)
+    zeros = np.pad(close[2:] - close[:-2], (2, 0), 'constant')
+    hhv, llv = np.roll(np.maximum.accumulate(high), 1), np.roll(np.minimum.accumulate(low), 1)
+    return [
+        ('filter_drop', (np.flatnonzero(rng.random(length) > 0.6), 5)),
+        ('dma_loop', (close, alpha)),
+        ('dsma_filt', (zeros, 0.5, 0.3, 0.2)),
+        ('sar_loop', (high, low, hhv, llv, 10, 0.02, 0.2, True)),
+        ('tdx_sar_loop', (high, low, 0.02, 0.2)),
+    ]
+
+
+def check_kernels(lengths=(12, 250)) -> bool:
+    if MyTT_kernels.numba is None:
+        print('numba 未安装，内核以纯 Python 运行')
+        return True
+
+    all_passed = True
+    for length in lengths:
+        for name, args in kernel_cases(length, seed=length):
+            kernel = getattr(MyTT_kernels, name)
+            if not np.array_equal(kernel(*args), kernel.py_func(*args), equal_nan=True):
+                all_passed = False
+                print(f'[FAIL] {name} length={length}')
+    print(f'Kernel parity {"passed" if all_passed else "FAILED"}')
+    return all_passed
+
+
+def benchmark_kernels(length: int = 5000, repeat: int = 3) -> None:
+    if MyTT_kernels.numba is None:
+        return
+
+    print(f'{"kernel":<14}{"python(ms)":>12}{"numba(ms)":>12}{"speedup":>10}')
+    for name, args in kernel_cases(length):
+        kernel = getattr(MyTT_kernels, name)
+        kernel(*args)  # 首次调用触发编译
+        costs = []
+        for func in [kernel.py_func, kernel]:
+            t0 = time.perf_counter()
+            for _ in range(repeat):
+                func(*args)
+            costs.append((time.perf_counter() - t0) / repeat * 1000)
+        print(f'{name:<14}{costs[0]:>12.2f}{costs[1]:>12.3f}{costs[0] / costs[1]:>9.0f}x')
+
+
+if __name__ == '__main__':
+    check_parity()
+    benchmark()
+    check_kernels()
+    benchmark_kernels()
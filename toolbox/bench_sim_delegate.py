@@ -0,0 +1,83 @@
+import os
+import time
+import tempfile
+import datetime
+import threading
+
+import numpy as np
+
+from delegate.sim_delegate import SimDelegate, SimCallback
+from trader.buyer import BaseBuyer
+from trader.seller import BaseSeller
+
+
+# 用模拟券商压测买卖下单链路：BaseBuyer/BaseSeller -> SimDelegate 撮合 -> 回调记录成交
+class BenchConf:
+    order_premium = 0.02
+
+
+def make_quotes(codes: list[str], now: datetime.datetime, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    quotes = {}
+    for code in codes:
+        price = round(float(rng.uniform(5, 50)), 2)
+        quotes[code] = {
+            'time': int(now.timestamp() * 1000),
+            'lastPrice': price,
+            'open': price,
+            'high': price,
+            'low': price,
+            'lastClose': price,
+            'volume': 10000,
+            'amount': price * 1000000,
+            'askPrice': [round(price + 0.01 * (i + 1), 2) for i in range(5)],
+            'askVol': [int(v) for v in rng.integers(1, 200, 5)],
+            'bidPrice': [round(price - 0.01 * i, 2) for i in range(5)],
+            'bidVol': [int(v) for v in rng.integers(1, 200, 5)],
+        }
+    return quotes
+
+
+def bench(code_count: int = 2000, rounds: int = 3, record: bool = True) -> None:
+    root = tempfile.mkdtemp(prefix='bench_sim_')
+    callback = SimCallback(
+        lock_of_disk_cache=threading.Lock(),
+        path_deal=os.path.join(root, 'deal_hist.csv'),
+        path_held=os.path.join(root, 'held_days.json'),
+        path_maxp=os.path.join(root, 'max_price.json'),
+        record_deal_enabled=record,
+    )
+    delegate = SimDelegate(cash=1e10, callback=callback)
+    buyer = BaseBuyer(account_id='SIM', strategy_name='压测', delegate=delegate, parameters=BenchConf)
+    seller = BaseSeller(strategy_name='压测', delegate=delegate, parameters=BenchConf)
+
+    codes = [f'{600000 + i}.SH' for i in range(code_count)]
+    day = datetime.datetime(2024, 12, 30, 9, 31)
+    for r in range(rounds):
+        quotes = make_quotes(codes, day, seed=r)
+        delegate.on_quotes(quotes, day)
+
+        t0 = time.perf_counter()
+        for code in codes:
+            quote = quotes[code]
+            buyer.order_buy(code, quote['lastPrice'], quote['lastClose'], 100, '压测买入', market=(r % 2 == 0), log=False)
+        buy_cost = time.perf_counter() - t0
+
+        # T+1：换日后才能卖出
+        day += datetime.timedelta(days=1)
+        quotes = make_quotes(codes, day, seed=r + 100)
+        delegate.on_quotes(quotes, day)
+
+        t0 = time.perf_counter()
+        for position in delegate.check_positions():
+            seller.order_sell(position.stock_code, quotes[position.stock_code], position.can_use_volume, '压测卖出', log=False)
+        sell_cost = time.perf_counter() - t0
+
+        print(f'round {r}: 买入 {code_count / buy_cost:.0f} 笔/秒  卖出 {code_count / sell_cost:.0f} 笔/秒  '
+              f'成交 {len(delegate.trades)} 笔  现金 {delegate.check_asset().cash:.2f}')
+        day += datetime.timedelta(days=1)
+
+
+if __name__ == '__main__':
+    bench(record=False)
+    bench(record=True)
@@ -1,13 +1,12 @@
-import json
 import datetime
-import pandas as pd
 from toolbox.draw_two_lines import draw_two
+from tools.utils_tick import TickArchive, ticks_to_rows, format_tick_times, TICK_ARCHIVE_PATH
 
 stock_code = '301396.SZ'
 root = './_cache/debug'
 today = datetime.datetime.now().date().strftime("%Y%m%d")
 
-source_path = f'{root}/tick_history.json'
+source_path = TICK_ARCHIVE_PATH.format(today)
 target_path = f'{root}/tick_{today}_{stock_code.split(".")[0]}.csv'
 visualization_path = f'{root}/tick_{today}_{stock_code.split(".")[0]}.html'
 
@@ -15,30 +14,28 @@ headers = ['timestamp', 'price', 'volume', 'askPrice', 'askVol', 'bidPrice', 'bi
 
 
 def locate_and_save():
-    with open(source_path, 'r') as file:
-        ticks = json.load(file)[stock_code]
+    ticks = TickArchive(source_path).get_ticks(stock_code)
+    if ticks is None:
+        print(f'{stock_code} 不在 {source_path} 归档中')
+        return
 
     with open(target_path, 'w') as w:
         w.write(',  \t'.join(headers))
         w.write('\n')
-        for tick in ticks:
+        for tick in ticks_to_rows(ticks):
             w.write(',   \t'.join([str(i) for i in tick]))
             w.write('\n')
 
 
 def visualization():
-    # with open(source_path, 'r') as file:
-    #     data = json.load(file)[stock_code]
-    #
-    # x_data = [str(row[0]) for row in data]
-    # y1_data = [row[1] for row in data]
-    # y2_data = [row[6] for row in data]
-
-    df = pd.read_csv(target_path)
-    df.columns = headers
-    x_data = list(df['timestamp'].astype(str).values)
-    y1_data = list(df['price'].astype(float).values)
-    y2_data = list(df['bidVol'].astype(float).values)
+    ticks = TickArchive(source_path).get_ticks(stock_code)
+    if ticks is None:
+        print(f'{stock_code} 不在 {source_path} 归档中')
+        return
+
+    x_data = format_tick_times(ticks['time'])
+    y1_data = ticks['price'].astype(float).round(3).tolist()
+    y2_data = ticks['bidVol'].astype(float).tolist()
 
     print(x_data)
     print(y1_data)
@@ -0,0 +1,200 @@
+import os
+import sys
+import time
+import shutil
+import importlib
+import tempfile
+import threading
+
+from tools.utils_basic import is_symbol
+from tools.utils_cache import JsonStateStore, TradeCalendar
+from tools.utils_history import HistoryStore
+from tools.utils_panel import HistoryPanel
+from tools.utils_replay import find_quote_source
+
+from delegate.replay_subscriber import ReplaySubscriber
+from delegate.sim_delegate import SimDelegate, SimCallback, get_holding_position_count
+from trader.pools import StockPool
+
+
+# --------------------------------
+# 用录制的全推行情回放 run_*.py 策略，策略文件本身不需要任何修改
+#   导入策略模块后替换模块级的 my_delegate / my_suber / my_buyer / my_seller / my_pool
+#   持仓天数、最高价、成交记录等磁盘缓存改写到临时目录，日线缓存复制一份到临时目录再增量更新，不会碰到实盘文件
+#   xt_get_ticks 换成回放中的最新行情；选股依赖在线服务（远程推荐、问财）的策略拿到的是今天的结果，默认拒绝回放
+#   没有 PATH_HIST 的策略从 PATH_BASE 下的日线缓存只读加载昨收和历史，不下载
+# 用法：python -m toolbox.replay_day run_sword 20241230 20241231 [--allow-live]
+# --------------------------------
+
+INITIAL_CASH = 1000000.0
+
+LIVE_SELECTIONS = ['pull_stock_codes', 'get_wencai_codes_prices']   # 在线选股接口，回放时返回的是当前数据
+HISTORY_DAY_COUNT = 100     # 没有 PoolConf.day_count 的策略加载的历史自然日数
+HISTORY_ADJUST = 'qfq'
+HISTORY_COLUMNS = ['datetime', 'open', 'high', 'low', 'close', 'volume', 'amount']
+
+
+def live_dependencies(module) -> list[str]:
+    return [name for name in LIVE_SELECTIONS if hasattr(module, name)]
+
+
+def load_strategy(module_name: str, workdir: str, allow_live: bool = False):
+    module = importlib.import_module(module_name)
+
+    live = live_dependencies(module)
+    if len(live) > 0:
+        if not allow_live:
+            raise ValueError(f'{module_name} 的选股依赖在线服务 {live}，回放得到的是今天的选股结果；'
+                             f'确认仍要回放请加 --allow-live')
+        print(f'[警告] {module_name} 的选股依赖在线服务 {live}，回放结果不代表历史当日的选股')
+
+    # 没有 PATH_HIST 的策略使用同一缓存目录下其他策略下载的日线，只读
+    path_hist = getattr(module, 'PATH_HIST', None)
+    read_only = path_hist is None
+    if read_only:
+        path_hist = os.path.join(getattr(module, 'PATH_BASE', '.'), 'history')
+    if not os.path.isdir(path_hist):
+        raise ValueError(f'回放需要本地日线缓存 {path_hist} 提供昨收价，请先运行带 PATH_HIST 的策略完成盘前下载')
+
+    for name in ['PATH_ASSETS', 'PATH_DEAL', 'PATH_HELD', 'PATH_MAXP', 'PATH_LOGS']:
+        if hasattr(module, name):
+            setattr(module, name, os.path.join(workdir, os.path.basename(getattr(module, name))))
+    replay_hist = os.path.join(workdir, os.path.basename(path_hist))
+    shutil.copytree(path_hist, replay_hist)
+    module.PATH_HIST = replay_hist
+    module.REPLAY_HIST_READ_ONLY = read_only
+
+    strategy_name = module.STRATEGY_NAME + '(回放)'
+    callback = SimCallback(
+        lock_of_disk_cache=getattr(module, 'lock_of_disk_cache', threading.Lock()),
+        path_deal=module.PATH_DEAL,
+        path_held=module.PATH_HELD,
+        path_maxp=module.PATH_MAXP,
+    )
+    delegate = SimDelegate(account_id='SIM', cash=INITIAL_CASH, callback=callback)
+    subscriber = ReplaySubscriber(
+        strategy_name=strategy_name,
+        delegate=delegate,
+        execute_strategy=module.execute_strategy,
+    )
+
+    module.STRATEGY_NAME = strategy_name
+    module.my_delegate = delegate
+    module.my_suber = subscriber
+    module.get_holding_position_count = get_holding_position_count
+    if hasattr(module, 'xt_get_ticks'):
+        # 行情快照取回放中每个代码最新的一笔，不请求实时行情
+        module.xt_get_ticks = lambda code_list: \
+            {code: delegate.quotes[code] for code in code_list if code in delegate.quotes}
+    if hasattr(module, 'Buyer'):
+        module.my_buyer = module.Buyer(
+            account_id=delegate.account_id,
+            strategy_name=strategy_name,
+            delegate=delegate,
+            parameters=module.BuyConf,
+        )
+    if hasattr(module, 'Seller'):
+        module.my_seller = module.Seller(
+            strategy_name=strategy_name,
+            delegate=delegate,
+            parameters=module.SellConf,
+        )
+
+    # 票池不在线刷新，白名单直接取本地日线缓存里已有的代码
+    module.my_pool = StockPool(
+        account_id=delegate.account_id,
+        strategy_name=strategy_name,
+        parameters=getattr(module, 'PoolConf', None),
+        ding_messager=None,
+    )
+    if not read_only:
+        adjust = getattr(module.PoolConf, 'price_adjust', None)
+        module.my_pool.cache_whitelist = set(
+            code for code, code_adjust in HistoryStore(module.PATH_HIST).keys()
+            if is_symbol(code) and (adjust is None or code_adjust == adjust))
+    return module, delegate, subscriber
+
+
+# 用本地日线缓存准备盘前数据，和策略的 prepare_history 一样，只是日期取回放日
+# 策略自己没有日线缓存时，只读加载缓存里的全部代码，用于昨收价和卖出策略的历史数据
+def prepare_history(module, subscriber: ReplaySubscriber, date: str) -> None:
+    conf = module.PoolConf
+    day_count = getattr(conf, 'day_count', HISTORY_DAY_COUNT)
+    adjust = getattr(conf, 'price_adjust', HISTORY_ADJUST)
+    columns = getattr(conf, 'columns', HISTORY_COLUMNS)
+
+    calendar = TradeCalendar()
+    start = calendar.prev(date, day_count)
+    end = calendar.prev(date, 1)
+
+    if module.REPLAY_HIST_READ_ONLY:
+        store = HistoryStore(module.PATH_HIST)
+        code_list = [code for code, code_adjust in store.keys() if code_adjust == adjust]
+        subscriber.cache_history = store.get(code_list, start, end, adjust, columns)
+        if hasattr(module, 'cache_history'):
+            module.cache_history = subscriber.cache_history
+        return
+
+    code_list = module.my_pool.get_code_list()
+    code_list += [position.stock_code for position in subscriber.delegate.check_positions()]
+
+    subscriber.download_cache_history(
+        cache_path=module.PATH_HIST,
+        code_list=code_list,
+        start=start,
+        end=end,
+        adjust=adjust,
+        columns=columns,
+    )
+    if hasattr(module, 'cache_panel'):
+        module.cache_panel = HistoryPanel(subscriber.cache_history, columns)
+
+
+def last_closes_of(subscriber: ReplaySubscriber):
+    return {code: df['close'].iloc[-1] for code, df in subscriber.cache_history.items()
+            if len(df) > 0 and 'close' in df.columns}
+
+
+# 回放的日期与真实日期不同，持仓天数按回放日自增，不走 all_held_inc 的当日去重
+def held_days_increase(module, delegate: SimDelegate) -> None:
+    store = JsonStateStore.get(module.PATH_HELD)
+    held_days = store.copy()
+    holding = set(position.stock_code for position in delegate.check_positions())
+    for code in held_days.keys():
+        if code not in holding:
+            store.delete(code)
+    for code in holding:
+        store.set(code, held_days.get(code, 0) + 1)
+
+
+def replay(module_name: str, dates: list[str], allow_live: bool = False) -> None:
+    workdir = tempfile.mkdtemp(prefix='replay_')
+    module, delegate, subscriber = load_strategy(module_name, workdir, allow_live)
+    print(f'回放 {module.STRATEGY_NAME}，临时目录 {workdir}')
+
+    t0 = time.perf_counter()
+    for date in dates:
+        prepare_history(module, subscriber, date)
+        source = find_quote_source(date, last_closes_of(subscriber))
+        if source is None:
+            print(f'[{date}] 没有行情录制或 tick 归档，跳过')
+            continue
+
+        held_days_increase(module, delegate)
+        trade_count = len(delegate.trades)
+        result = subscriber.run(source)
+        asset = delegate.check_asset()
+        print(f'[{date}] 批次 {result["batches"]} 用时 {result["seconds"]:.1f}s '
+              f'成交 {len(delegate.trades) - trade_count} 笔 总资产 {asset.total_asset:.2f}')
+
+    asset = delegate.check_asset()
+    print(f'回放结束 用时 {time.perf_counter() - t0:.1f}s '
+          f'收益 {(asset.total_asset / INITIAL_CASH - 1) * 100:.2f}%')
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--allow-live']
+    if len(args) < 2:
+        print('用法：python -m toolbox.replay_day <策略模块> <日期%Y%m%d> [日期...] [--allow-live]')
+        sys.exit(1)
+    replay(args[0], args[1:], allow_live='--allow-live' in sys.argv)
@@ -1,6 +1,9 @@
 import os
 import csv
 import json
+import time
+import queue
+import atexit
 import pickle
 import threading
 import datetime
@@ -12,10 +15,11 @@ import akshare as ak
 
 from tools.utils_basic import symbol_to_code
 
-trade_day_cache = {}
-trade_max_year_key = 'max_year'
 TRADE_DAY_CACHE_PATH = './_cache/_open_day_list_sina.csv'
 CODE_NAME_CACHE_PATH = './_cache/_code_names.csv'
+CODE_NAME_INDEX_PATH = './_cache/_code_names_index.json'
+CODE_NAME_SH_PATH = './_data/mktdt00.txt'
+CODE_NAME_SZ_PATH = './_data/sjshq.txt'
 
 
 # 指数常量
@@ -38,6 +42,9 @@ class IndexSymbol:
 
 
 # 查询股票名称
+# 构造时不加载，第一次 get_name 时才读取 CODE_NAME_INDEX_PATH 的紧凑索引
+# 索引记录了源文件的修改时间，源文件变化后才重新解析 _data 下的文件
+# 新浪名称缓存过期时在后台线程刷新，不阻塞成交回调
 class StockNames:
     _instance = None
     _data = None
@@ -46,16 +53,37 @@ class StockNames:
         if cls._instance is None:
             cls._instance = super(StockNames, cls).__new__(cls)
             cls._data = None  # Initialize data as None initially
+            cls._lock = threading.Lock()
+            cls._refreshing = False
         return cls._instance
 
-    def __init__(self):
-        if self._data is None:
-            self.load_codes_and_names()
-
     def load_codes_and_names(self):
-        print('Loading codes and names...', end='')
-        self._data = get_stock_codes_and_names()
-        print('Complete!')
+        with self._lock:
+            if self._data is not None:
+                return
+            print('Loading codes and names...', end='')
+            self.__class__._data = load_code_name_index()
+            print('Complete!')
+
+        if not is_code_name_cache_available():
+            self.refresh_in_background()
+
+    def refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self.__class__._refreshing = True
+
+        def refresh():
+            try:
+                get_stock_code_and_names_sina()
+                self.__class__._data = load_code_name_index()
+            except Exception as e:
+                print(f'刷新股票名称失败: {e}')
+            finally:
+                self.__class__._refreshing = False
+
+        threading.Thread(target=refresh, daemon=True).start()
 
     def get_name(self, code) -> str:
         if self._data is None:
@@ -66,17 +94,26 @@ class StockNames:
         return '[Unknown]'
 
 
+def is_code_name_cache_available() -> bool:
+    if not os.path.exists(CODE_NAME_CACHE_PATH):
+        return False
+    try:
+        # to_csv 按 utf-8 写入，Windows 下默认编码是 gbk，需要显式指定
+        with open(CODE_NAME_CACHE_PATH, 'r', encoding='utf-8') as r:
+            r.readline()
+            cache_date_str = r.readline().strip().split(',')[-1]
+        cache_date = datetime.datetime.strptime(cache_date_str, '%Y-%m-%d')
+    except (ValueError, OSError):  # UnicodeDecodeError 是 ValueError 的子类
+        return False
+    return datetime.datetime.today() - cache_date < datetime.timedelta(days=90)
+
+
 # 获取股票的中文名称
 def get_stock_code_and_names_sina():
-    cache_available = False
+    cache_available = is_code_name_cache_available()
     df = pd.DataFrame(columns=['代码', '名称', '日期'])
-    if os.path.exists(CODE_NAME_CACHE_PATH):
+    if cache_available:
         df = pd.read_csv(CODE_NAME_CACHE_PATH, dtype={'代码': str})
-        cache_date_str = df['日期'].head(1).values[0]
-        cache_date = datetime.datetime.strptime(cache_date_str, '%Y-%m-%d')
-        curr_date = datetime.datetime.today()
-        if curr_date - cache_date < datetime.timedelta(days=90):
-            cache_available = True
 
     if not cache_available:
         df = ak.stock_zh_a_spot()
@@ -90,29 +127,57 @@ def get_stock_code_and_names_sina():
     return df
 
 
-def get_stock_codes_and_names() -> Dict[str, str]:
+# 只读本地文件，不访问网络：交易所行情文件 + 新浪名称缓存（如果有）
+def get_local_codes_and_names() -> Dict[str, str]:
     ans = {}
 
-    with open('./_data/mktdt00.txt', 'r', errors='replace') as r:
-        lines = r.readlines()
-        for line in lines:
-            arr = line.split('|')
-            if len(arr) > 2 and len(arr[1]) == 6:
-                ans[arr[1] + '.SH'] = arr[2]
-
-    with open('./_data/sjshq.txt', 'r', encoding='utf-8', errors='replace') as r:
-        lines = r.readlines()
-        for line in lines:
-            arr = json.loads(line)
-            ans[arr['code']] = arr['name']
-
-    # df = ak.stock_zh_a_spot_em()
-    df = get_stock_code_and_names_sina()
-    df['代码'] = df['代码'].apply(lambda x: symbol_to_code(x))
-    ans.update(dict(zip(df['代码'], df['名称'])))
+    if os.path.exists(CODE_NAME_SH_PATH):
+        with open(CODE_NAME_SH_PATH, 'r', errors='replace') as r:
+            for line in r:
+                arr = line.split('|')
+                if len(arr) > 2 and len(arr[1]) == 6:
+                    ans[arr[1] + '.SH'] = arr[2]
+
+    if os.path.exists(CODE_NAME_SZ_PATH):
+        with open(CODE_NAME_SZ_PATH, 'r', encoding='utf-8', errors='replace') as r:
+            for line in r:
+                arr = json.loads(line)
+                ans[arr['code']] = arr['name']
+
+    if os.path.exists(CODE_NAME_CACHE_PATH):
+        df = pd.read_csv(CODE_NAME_CACHE_PATH, dtype={'代码': str})
+        codes = [symbol_to_code(symbol) for symbol in df['代码']]
+        ans.update(dict(zip(codes, df['名称'])))
     return ans
 
 
+def get_stock_codes_and_names() -> Dict[str, str]:
+    get_stock_code_and_names_sina()  # 新浪名称缓存过期时先联网刷新
+    return get_local_codes_and_names()
+
+
+# 名称索引：{'mtimes': 各源文件修改时间, 'names': {code: name}}，源文件没变就直接使用
+def load_code_name_index() -> Dict[str, str]:
+    sources = [CODE_NAME_SH_PATH, CODE_NAME_SZ_PATH, CODE_NAME_CACHE_PATH]
+    mtimes = {path: os.path.getmtime(path) if os.path.exists(path) else None for path in sources}
+
+    if os.path.exists(CODE_NAME_INDEX_PATH):
+        try:
+            with open(CODE_NAME_INDEX_PATH, 'r', encoding='utf-8') as r:
+                index = json.load(r)
+            if index['mtimes'] == mtimes:
+                return index['names']
+        except (ValueError, KeyError):
+            pass
+
+    names = get_local_codes_and_names()
+    temp_path = CODE_NAME_INDEX_PATH + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as w:
+        json.dump({'mtimes': mtimes, 'names': names}, w, ensure_ascii=False, separators=(',', ':'))
+    os.replace(temp_path, CODE_NAME_INDEX_PATH)
+    return names
+
+
 # ==========
 # 本地磁盘缓存
 # ==========
@@ -163,41 +228,149 @@ def save_json(path: str, var: dict) -> None:
         w.write(json.dumps(var, indent=4))
 
 
+# --------------------------------
+# 内存中的 json 状态缓存（held_days / max_price），写后延迟落盘
+#   每次修改追加一行到 .journal 文件，进程崩溃后启动时重放恢复
+#   距离上次落盘超过 flush_interval 秒或退出时，整体写临时文件再 rename 原子替换，并清空 journal
+# --------------------------------
+class JsonStateStore:
+    _stores: Dict[str, 'JsonStateStore'] = {}
+    _stores_lock = threading.Lock()
+
+    def __init__(self, path: str, flush_interval: float = 30.0):
+        self.path = path
+        self.path_journal = path + '.journal'
+        self.flush_interval = flush_interval
+
+        self.lock = threading.RLock()
+        self.dirty = False
+        self.last_flush = time.monotonic()
+
+        self.data: dict = load_json(path)
+        replayed = self.replay_journal()
+        self.journal = open(self.path_journal, 'a')
+        if replayed > 0:
+            self.dirty = True
+            self.flush()
+
+    # 同一个文件在进程内只保留一个 store
+    @classmethod
+    def get(cls, path: str) -> 'JsonStateStore':
+        with cls._stores_lock:
+            if path not in cls._stores:
+                cls._stores[path] = JsonStateStore(path)
+            return cls._stores[path]
+
+    @classmethod
+    def flush_all(cls) -> None:
+        with cls._stores_lock:
+            for store in cls._stores.values():
+                store.flush()
+
+    def replay_journal(self) -> int:
+        if not os.path.exists(self.path_journal):
+            return 0
+
+        count = 0
+        with open(self.path_journal, 'r') as r:
+            for line in r:
+                try:
+                    op, key, value = json.loads(line)
+                except ValueError:
+                    break  # 崩溃时写了一半的最后一行
+                if op == 'set':
+                    self.data[key] = value
+                elif op == 'update':
+                    self.data.update(value)
+                else:
+                    self.data.pop(key, None)
+                count += 1
+        return count
+
+    def _log(self, op: str, key: str, value=None) -> None:
+        self.journal.write(json.dumps([op, key, value]) + '\n')
+        self.journal.flush()
+        self.dirty = True
+
+    def copy(self) -> dict:
+        with self.lock:
+            return dict(self.data)
+
+    def set(self, key: str, value) -> None:
+        with self.lock:
+            if self.data.get(key) != value or key not in self.data:
+                self.data[key] = value
+                self._log('set', key, value)
+            self.flush_if_due()
+
+    # 多个 key 作为一条 journal 记录写入，崩溃时要么全部生效要么全部丢弃
+    def update(self, values: dict) -> None:
+        with self.lock:
+            self.data.update(values)
+            self._log('update', None, values)
+            self.flush_if_due()
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            if key in self.data:
+                del self.data[key]
+                self._log('del', key)
+            self.flush_if_due()
+
+    def flush_if_due(self) -> None:
+        if self.dirty and time.monotonic() - self.last_flush > self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            self.last_flush = time.monotonic()
+            if not self.dirty and os.path.exists(self.path):
+                return
+
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as w:
+                w.write(json.dumps(self.data, indent=4))
+                w.flush()
+                os.fsync(w.fileno())
+            os.replace(temp_path, self.path)
+
+            self.journal.truncate(0)
+            self.journal.flush()
+            self.dirty = False
+
+
+atexit.register(JsonStateStore.flush_all)
+
+
 # 删除json缓存中的单个key-value，key为字符串
 def del_key(lock: threading.Lock, path: str, key: str) -> None:
     with lock:
-        temp_json = load_json(path)
-        if key in temp_json:
-            del temp_json[key]
-        save_json(path, temp_json)
+        JsonStateStore.get(path).delete(key)
 
 
 # 删除json缓存中的多个个key-value，key为字符串
 def del_keys(lock: threading.Lock, path: str, keys: List[str]) -> None:
     with lock:
-        temp_json = load_json(path)
+        store = JsonStateStore.get(path)
         for key in keys:
-            if key in temp_json:
-                del temp_json[key]
-        save_json(path, temp_json)
+            store.delete(key)
 
 
 # 所有缓存持仓天数+1，_inc_date为单日判重标记位
 def all_held_inc(held_operation_lock: threading.Lock, path: str) -> bool:
     with held_operation_lock:
-        held_days = load_json(path)
+        store = JsonStateStore.get(path)
+        held_days = store.copy()
 
         today = datetime.datetime.now().strftime('%Y-%m-%d')
         inc_date_key = '_inc_date'
 
         try:
             if (inc_date_key not in held_days) or (held_days[inc_date_key] != today):
-                held_days[inc_date_key] = today
-                for code in held_days.keys():
-                    if code != inc_date_key:
-                        held_days[code] += 1
-
-                save_json(path, held_days)
+                values = {code: held_days[code] + 1 for code in held_days.keys() if code != inc_date_key}
+                values[inc_date_key] = today
+                store.update(values)  # 自增和判重标记一起写入，崩溃重放时不会重复自增
+                store.flush()
                 return True
             else:
                 return False
@@ -208,10 +381,9 @@ def all_held_inc(held_operation_lock: threading.Lock, path: str) -> bool:
 # 增加新的持仓记录
 def new_held(held_operation_lock: threading.Lock, path: str, codes: List[str]) -> None:
     with held_operation_lock:
-        held_days = load_json(path)
+        store = JsonStateStore.get(path)
         for code in codes:
-            held_days[code] = 0
-        save_json(path, held_days)
+            store.set(code, 0)
 
 
 # 更新持仓股买入开始最高价格
@@ -223,35 +395,27 @@ def update_max_prices(
     path_held_days: str,
     ignore_open_day: bool = True,  # 是否忽略开仓日，从次日开始计算最高价
 ):
-    held_days = load_json(path_held_days)
-
     with lock:
-        max_prices = load_json(path_max_prices)
-
-    # 更新历史最高
-    updated = False
-    for position in positions:
-        code = position.stock_code
-        if code in held_days:  # 只更新持仓超过一天的
-            if ignore_open_day:  # 忽略开仓日的最高价
-                held_day = held_days[code]
-                if held_day <= 0:
-                    continue
-            if code in quotes:
-                quote = quotes[code]
-                high_price = quote['high']
-
-                if code in max_prices:
-                    if max_prices[code] < high_price:
-                        max_prices[code] = round(high_price, 3)
-                        updated = True
-                else:
-                    max_prices[code] = round(high_price, 3)
-                    updated = True
-
-    if updated:
-        with lock:
-            save_json(path_max_prices, max_prices)
+        held_days = JsonStateStore.get(path_held_days).copy()
+        store = JsonStateStore.get(path_max_prices)
+
+        # 更新历史最高
+        for position in positions:
+            code = position.stock_code
+            if code in held_days:  # 只更新持仓超过一天的
+                if ignore_open_day:  # 忽略开仓日的最高价
+                    held_day = held_days[code]
+                    if held_day <= 0:
+                        continue
+                if code in quotes:
+                    quote = quotes[code]
+                    high_price = quote['high']
+
+                    max_price = store.data.get(code)
+                    if max_price is None or max_price < high_price:
+                        store.set(code, round(high_price, 3))
+
+        max_prices = store.copy()
 
     return max_prices, held_days
 
@@ -273,8 +437,134 @@ def save_symbols(path: str, symbols: list[str]) -> None:
 
 
 # 记录成交单
+# --------------------------------
+# 成交记录的追加写日志，下单线程只把记录放进有界队列，由后台线程写盘
+#   文件句柄常驻打开，攒够 flush_size 条或距上次落盘超过 flush_interval 秒时 flush
+#   close 时写完队列里剩余的记录并 fsync，进程退出时自动调用
+#   当日记录同时保存在内存索引里，盘后报告不再读取整个历史文件
+# --------------------------------
+DEAL_HEADER = ['日期', '时间', '代码', '名称', '类型', '注释', '成交价', '成交量']
+
+
+class DealJournal:
+    _journals: Dict[str, 'DealJournal'] = {}
+    _journals_lock = threading.Lock()
+
+    def __init__(self, path: str, flush_size: int = 20, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.path = path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self.index_lock = threading.Lock()
+        self.index: Dict[str, List[list]] = {}      # 日期 -> 当日记录
+        self.loaded_dates: Set[str] = set()         # 已从文件补齐启动前记录的日期
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a+', newline='')
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(DEAL_HEADER)
+        self.file.flush()
+        self.initial_size = self.file.tell()        # 之前的内容是启动前写入的，之后的记录都在内存索引里
+
+        self.queue = queue.Queue(maxsize=max_queue)  # 队列满时 append 阻塞，避免内存无限增长
+        self.closed = False
+        self.thread = threading.Thread(target=self.run_flush, daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def get(cls, path: str) -> 'DealJournal':
+        with cls._journals_lock:
+            if path not in cls._journals:
+                cls._journals[path] = DealJournal(path)
+            return cls._journals[path]
+
+    @classmethod
+    def close_all(cls) -> None:
+        with cls._journals_lock:
+            for journal in cls._journals.values():
+                journal.close()
+
+    def append(self, row: list) -> None:
+        with self.index_lock:
+            self.index.setdefault(row[0], []).append(row)
+        self.queue.put(row)
+
+    def run_flush(self) -> None:
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                row = self.queue.get(timeout=timeout if pending > 0 else None)
+            except queue.Empty:
+                row = False
+
+            if row is None:  # close 发出的结束标记
+                break
+            if row:
+                self.writer.writerow(row)
+                pending += 1
+            if pending > 0 and (pending >= self.flush_size or time.monotonic() - last_flush >= self.flush_interval):
+                self.file.flush()
+                pending = 0
+                last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    # 指定日期的全部记录，启动前写入文件的部分从文件末尾向前读取，只在第一次查询时读一次
+    def rows_of_date(self, date: str) -> List[list]:
+        with self.index_lock:
+            if date not in self.loaded_dates:
+                self.loaded_dates.add(date)
+                self.index[date] = self.read_file_rows(date) + self.index.get(date, [])
+            return list(self.index.get(date, []))
+
+    def read_file_rows(self, date: str) -> List[list]:
+        prefix = date.encode('ascii') + b','
+        lines = []
+        for line in read_lines_backward(self.path, end=self.initial_size):
+            if line.startswith(prefix):
+                lines.append(line)
+            elif len(lines) > 0 or line[:len(prefix)] < prefix:
+                break  # 按时间追加，早于该日期的记录不用再读
+        encoding = self.file.encoding
+        return [row for row in csv.reader(line.decode(encoding) for line in reversed(lines))]
+
+
+atexit.register(DealJournal.close_all)
+
+
+# 从文件末尾向前按块读取，逐行倒序返回（不含换行符），只读到需要的位置为止
+def read_lines_backward(path: str, end: int = None, block_size: int = 8192):
+    with open(path, 'rb') as r:
+        pos = r.seek(0, os.SEEK_END) if end is None else end
+        rest = b''
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            r.seek(pos)
+            lines = (r.read(size) + rest).split(b'\n')
+            rest = lines[0]  # 块首可能是半行，留到下一块拼接
+            for line in reversed(lines[1:]):
+                line = line.rstrip(b'\r')
+                if len(line) > 0:
+                    yield line
+        rest = rest.rstrip(b'\r')
+        if len(rest) > 0:
+            yield rest
+
+
 def record_deal(
-    lock: threading.Lock,
+    lock: threading.Lock,   # 保留参数兼容调用方，写盘已移到后台线程，不再需要持锁
     path: str,
     timestamp: str,
     code: str,
@@ -284,34 +574,106 @@ def record_deal(
     price: float,
     volume: int,
 ):
-    with lock:
-        if not os.path.exists(path):
-            with open(path, 'w') as w:
-                w.write(','.join(['日期', '时间', '代码', '名称', '类型', '注释', '成交价', '成交量']))
-                w.write('\n')
-
-        with open(path, 'a+', newline='') as w:
-            wf = csv.writer(w)
-            dt = datetime.datetime.fromtimestamp(int(timestamp))
+    dt = datetime.datetime.fromtimestamp(int(timestamp))
+    DealJournal.get(path).append([
+        str(dt.date()), str(dt.time()),
+        code, name, order_type, remark, price, volume,
+    ])
+
+
+# --------------------------------
+# 每日总资产台账，assets.csv 只追加一行，不再整表读写
+#   上一条记录从文件末尾向前读取
+#   同时维护定长二进制索引 assets.csv.idx（日期 int32 + 资产 float64），按日期区间查询时 memmap 后二分
+#   索引缺失或与 csv 末行不一致时从 csv 重建一次
+# --------------------------------
+ASSET_RECORD = np.dtype([('date', '<i4'), ('asset', '<f8')])
+
+
+class AssetLedger:
+    def __init__(self, path: str):
+        self.path = path
+        self.path_index = path + '.idx'
+
+    def last(self) -> Optional[tuple]:
+        if not os.path.exists(self.path):
+            return None
+        for line in read_lines_backward(self.path):
+            date, asset = line.decode().split(',')[:2]
+            if date == 'date':
+                return None
+            return date, float(asset)
+        return None
 
-            wf.writerow([
-                dt.date(), dt.time(),
-                code, name, order_type, remark, price, volume
-            ])
+    def append(self, date: str, asset: float) -> None:
+        last = self.last()
+        if last is None or not self._index_matches(last):
+            self._rebuild_index()
+
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, 'a') as w:
+            if new_file:
+                w.write('date,asset\n')
+            w.write(f'{date},{asset}\n')
+        with open(self.path_index, 'ab') as w:
+            w.write(np.array([(int(date.replace('-', '')), asset)], dtype=ASSET_RECORD).tobytes())
+
+    def records(self) -> np.ndarray:
+        last = self.last()
+        if last is None:
+            return np.empty(0, dtype=ASSET_RECORD)
+        if not self._index_matches(last):
+            self._rebuild_index()
+        return np.memmap(self.path_index, dtype=ASSET_RECORD, mode='r')
+
+    # 日期区间 [start, end] 内的记录，日期格式同 csv
+    def between(self, start: str, end: str) -> pd.DataFrame:
+        records = self.records()
+        lo = np.searchsorted(records['date'], int(start.replace('-', '')), side='left')
+        hi = np.searchsorted(records['date'], int(end.replace('-', '')), side='right')
+        return self._to_frame(records[lo:hi])
+
+    # 最近 n 条记录
+    def recent(self, n: int) -> pd.DataFrame:
+        records = self.records()
+        return self._to_frame(records[max(0, len(records) - n):])
+
+    def _index_matches(self, last: tuple) -> bool:
+        if not os.path.exists(self.path_index) or os.path.getsize(self.path_index) < ASSET_RECORD.itemsize:
+            return False
+        with open(self.path_index, 'rb') as r:
+            r.seek(-ASSET_RECORD.itemsize, os.SEEK_END)
+            record = np.frombuffer(r.read(ASSET_RECORD.itemsize), dtype=ASSET_RECORD)[0]
+        return record['date'] == int(last[0].replace('-', '')) and record['asset'] == last[1]
+
+    def _rebuild_index(self) -> None:
+        records = np.empty(0, dtype=ASSET_RECORD)
+        if os.path.exists(self.path):
+            df = pd.read_csv(self.path, dtype={'date': str})
+            records = np.empty(len(df), dtype=ASSET_RECORD)
+            records['date'] = df['date'].str.replace('-', '').astype(np.int32)
+            records['asset'] = df['asset'].astype(float)
+        temp_path = self.path_index + '.tmp'
+        records.tofile(temp_path)
+        os.replace(temp_path, self.path_index)
+
+    @staticmethod
+    def _to_frame(records: np.ndarray) -> pd.DataFrame:
+        dates = records['date'].astype(str)
+        return pd.DataFrame({
+            'date': [f'{d[:4]}-{d[4:6]}-{d[6:]}' for d in dates],
+            'asset': np.array(records['asset']),
+        })
 
 
 # 获取总仓位价格增幅
 def get_total_asset_increase(path_assets: str, curr_date: str, curr_asset: float) -> Optional[float]:
-    if os.path.exists(path_assets):
-        df = pd.read_csv(path_assets)
-        prev_asset = df.tail(1)['asset'].values[0]
-        df.loc[len(df)] = [curr_date, curr_asset]
-        df.to_csv(path_assets, index=False)
-        return curr_asset - prev_asset
-    else:
-        df = pd.DataFrame({'date': [curr_date], 'asset': [curr_asset]})
-        df.to_csv(path_assets, index=False)
+    ledger = AssetLedger(path_assets)
+    last = ledger.last()
+    ledger.append(curr_date, curr_asset)
+    if last is None:
         return None
+    return curr_asset - last[1]
 
 
 # ==========
@@ -319,29 +681,105 @@ def get_total_asset_increase(path_assets: str, curr_date: str, curr_asset: float
 # ==========
 
 
-# 获取磁盘缓存的交易日列表
-def get_disk_trade_day_list_and_update_max_year() -> list:
-    # 读磁盘，这里可以有内存缓存的速度优化
-    df = pd.read_csv(TRADE_DAY_CACHE_PATH)
-    trade_dates = pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d').values
-    trade_day_cache[trade_max_year_key] = trade_dates[-1][:4]
-    return trade_dates
+# --------------------------------
+# 交易日历，进程内单例，启动后只读一次磁盘缓存
+#   交易日存成升序的 int32 数组(YYYYMMDD)，所有查询都是二分
+#   查询的年份超过缓存的最大年份时才从新浪刷新一次
+#   日期参数支持 '2024-12-31'、'20241231' 以及 datetime/date
+# --------------------------------
+class TradeCalendar:
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(TradeCalendar, cls).__new__(cls)
+            cls._instance.lock = threading.Lock()
+            cls._instance.dates = np.empty(0, dtype=np.int32)
+            cls._instance.max_year = 0
+            cls._instance.refreshed_year = 0    # 已经尝试过网络刷新的年份，避免每次查询都请求
+        return cls._instance
+
+    @staticmethod
+    def to_int(date) -> int:
+        if isinstance(date, (datetime.date, datetime.datetime)):
+            return date.year * 10000 + date.month * 100 + date.day
+        return int(str(date).replace('-', ''))
+
+    @staticmethod
+    def to_str(date: int, basic_format: bool = True) -> str:
+        s = str(date)
+        return s if basic_format else f'{s[:4]}-{s[4:6]}-{s[6:]}'
+
+    def load_disk(self) -> None:
+        df = pd.read_csv(TRADE_DAY_CACHE_PATH, usecols=['trade_date'], dtype=str)
+        self.dates = np.sort(df['trade_date'].str.replace('-', '').astype(np.int32).values)
+        self.max_year = int(self.dates[-1]) // 10000 if len(self.dates) > 0 else 0
+
+    def refresh(self) -> None:
+        df = ak.tool_trade_date_hist_sina()
+        df.to_csv(TRADE_DAY_CACHE_PATH)
+        print(f'Cache trade day list until {df["trade_date"].values[-1]} in {TRADE_DAY_CACHE_PATH}.')
+        self.load_disk()
+
+    # 保证日历覆盖 year，返回 False 表示拿不到这一年的数据
+    def ensure_year(self, year: int) -> bool:
+        if year <= self.max_year:
+            return True
+        with self.lock:
+            if len(self.dates) == 0 and os.path.exists(TRADE_DAY_CACHE_PATH):
+                self.load_disk()
+            if year > self.max_year and year > self.refreshed_year:
+                self.refreshed_year = year
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f'刷新交易日历失败: {e}')
+            return year <= self.max_year
+
+    def is_open(self, date) -> bool:
+        d = self.to_int(date)
+        if not self.ensure_year(d // 10000):
+            print(f'[DO NOT KNOW {date}, default to True trade day]')  # 实在拿不到数据默认为True
+            return True
+        i = np.searchsorted(self.dates, d)
+        return i < len(self.dates) and self.dates[i] == d
+
+    # 前n个交易日，date 为交易日时自身是前0天，非交易日时上一个交易日是前0天
+    def prev(self, date, n: int = 1, basic_format: bool = True) -> str:
+        d = self.to_int(date)
+        self.ensure_year(d // 10000)
+        i = np.searchsorted(self.dates, d, side='right') - 1
+        return self.to_str(self.dates[i - n], basic_format)
+
+    # 后n个交易日，date 为交易日时自身是后0天，非交易日时下一个交易日是后0天
+    def next(self, date, n: int = 1, basic_format: bool = True) -> str:
+        d = self.to_int(date)
+        self.ensure_year(d // 10000)
+        i = np.searchsorted(self.dates, d, side='left')
+        if i + n >= len(self.dates) and self.ensure_year(self.max_year + 1):  # 跨到了下一年
+            i = np.searchsorted(self.dates, d, side='left')
+        return self.to_str(self.dates[i + n], basic_format)
+
+    # [start, end] 闭区间内的交易日
+    def range(self, start, end, basic_format: bool = True) -> List[str]:
+        lo, hi = self._bounds(start, end)
+        return [self.to_str(d, basic_format) for d in self.dates[lo:hi]]
+
+    # [start, end] 闭区间内的交易日数量
+    def count_between(self, start, end) -> int:
+        lo, hi = self._bounds(start, end)
+        return max(0, int(hi - lo))
+
+    def _bounds(self, start, end) -> tuple:
+        a, b = self.to_int(start), self.to_int(end)
+        self.ensure_year(b // 10000)
+        return np.searchsorted(self.dates, a, side='left'), np.searchsorted(self.dates, b, side='right')
 
 
 # 获取前n个交易日，返回格式 基本格式：%Y%m%d，扩展格式：%Y-%m-%d
 # 如果为非交易日，则取上一个交易日为前0天
 def get_prev_trading_date(now: datetime.datetime, count: int, basic_format: bool=True) -> str:
-    trading_day_list = get_disk_trade_day_list_and_update_max_year()
-    today = now.strftime('%Y-%m-%d')
-    try:
-        trading_index = list(trading_day_list).index(today)
-    except ValueError:
-        trading_index = np.searchsorted(trading_day_list, today) - 1
-
-    if basic_format:
-        return trading_day_list[trading_index - count].replace('-', '')
-    else:
-        return trading_day_list[trading_index - count]
+    return TradeCalendar().prev(now, count, basic_format)
 
 
 # 检查当日是否是交易日，使用sina数据源
@@ -349,37 +787,7 @@ def check_is_open_day_sina(curr_date: str) -> bool:
     """
     curr_date example: '2024-12-31'
     """
-    curr_year = curr_date[:4]
-
-    # 内存缓存
-    if curr_date in trade_day_cache:
-        if curr_year <= trade_day_cache[trade_max_year_key]:
-            return trade_day_cache[curr_date]
-
-    # 文件缓存
-    if os.path.exists(TRADE_DAY_CACHE_PATH):  # 文件缓存存在
-        trade_day_list = get_disk_trade_day_list_and_update_max_year()
-        if curr_year <= trade_day_cache[trade_max_year_key]:  # 未过期
-            ans = curr_date in trade_day_list
-            trade_day_cache[curr_date] = ans
-            print(f'[{curr_date} is {ans} trade day in memory]')
-            return ans
-
-    # 网络缓存
-    df = ak.tool_trade_date_hist_sina()
-    df.to_csv(TRADE_DAY_CACHE_PATH)
-    print(f'Cache trade day list {curr_year} - {int(curr_year) + 1} in {TRADE_DAY_CACHE_PATH}.')
-
-    trade_day_list = get_disk_trade_day_list_and_update_max_year()
-    if curr_year <= trade_day_cache[trade_max_year_key]:  # 未过期
-        ans = curr_date in trade_day_list
-        trade_day_cache[curr_date] = ans
-        print(f'[{curr_date} is {ans} trade day in memory]')
-        return ans
-
-    # 实在拿不到数据默认为True
-    print(f'[DO NOT KNOW {curr_date}, default to True trade day]')
-    return True
+    return TradeCalendar().is_open(curr_date)
 
 
 def check_is_open_day(curr_date: str) -> bool:
@@ -1,16 +1,38 @@
+import atexit
 import base64
 import hashlib
 import hmac
 import json
 import time
+import queue
+import threading
 import requests
-import traceback
 import urllib.parse
 import urllib.request
+from collections import deque
+from typing import Dict, List, Optional
+
+
+DING_RATE_LIMIT = 20            # 钉钉机器人每分钟最多发送 20 条
+DING_RATE_PERIOD = 60.0
+DING_TEXT_LIMIT = 4000          # 合并后单条 markdown 正文的长度上限
+DING_RETRY_ERRCODES = {-1, 130101}  # 系统繁忙、发送过快，可以稍后重试
 
 
 class DingMessager(object):
-    def __init__(self, secret: str = None, url: str = None):
+    def __init__(
+        self,
+        secret: str = None,
+        url: str = None,
+        async_send: bool = True,        # 后台线程发送，send_text / send_markdown 只入队不等待
+        max_queue: int = 200,
+        timeout: float = 5.0,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,     # 第一次重试前等待的秒数，之后每次翻倍
+        coalesce_window: float = 1.0,   # 带标签的消息等待这么久，同标签的消息合并成一条
+        rate_limit: int = DING_RATE_LIMIT,
+        rate_period: float = DING_RATE_PERIOD,
+    ):
         """
         https://open.dingtalk.com/document/orgapp/custom-robots-send-group-messages
         :param secret: 安全设置的加签秘钥
@@ -21,6 +43,20 @@ class DingMessager(object):
         self.webhook_url = ''
         self.refresh_webhook()
 
+        self.session = requests.Session()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.rate_limit = rate_limit
+        self.rate_period = rate_period
+        self.sent_times = deque()       # 最近一个限流周期内的请求时间
+
+        self.async_send = async_send
+        self.coalesce_window = coalesce_window
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread: Optional[threading.Thread] = None
+        self.thread_lock = threading.Lock()
+
     def refresh_webhook(self):
         if self.secret is None or self.url is None:
             print('请先在钉钉申请secret')
@@ -53,45 +89,160 @@ class DingMessager(object):
                 send_data = json.dumps(data)
                 send_data = send_data.encode("utf-8")
 
-                response = requests.post(url=self.webhook_url, data=send_data, headers=header)
+                try:
+                    response = self.session.post(
+                        url=self.webhook_url, data=send_data, headers=header, timeout=self.timeout)
+                finally:
+                    # 记录请求返回的时间，服务端收到请求一定在这之前，按它限流不会超过服务端的计数
+                    self.sent_times.append(time.monotonic())
                 return json.loads(response.text)
-        except:
-            traceback.print_exc()
+            return {'errmsg': 'No webhook!'}
+        except Exception as e:
+            print(f'Ding message exception: {e}')
             return {'errmsg': 'Exception!'}
 
-    def send_text(self, msg: str, output: str = '', alert: bool = False, to_markdown: bool = True) -> bool:
-        if to_markdown:
-            title = msg.split('\n')[0]
-            text = msg.replace('\n', '\n>\n>')
+    # 发送失败时按指数退避重试，只重试网络异常和钉钉的限流、繁忙错误
+    def post(self, data) -> dict:
+        delay = self.retry_backoff
+        res = {'errmsg': 'Exception!'}
+        for attempt in range(self.max_retries + 1):
+            self.wait_rate_limit()
+            res = self.send_message(data)
+            if res.get('errmsg') == 'ok':
+                return res
+            if res.get('errmsg') != 'Exception!' and res.get('errcode') not in DING_RETRY_ERRCODES:
+                return res
+            if attempt < self.max_retries:
+                time.sleep(delay)
+                delay *= 2
+        return res
+
+    # 客户端限流：一个周期内的请求数达到上限时等到最早的一次过期
+    def wait_rate_limit(self) -> None:
+        while len(self.sent_times) >= self.rate_limit:
+            wait = self.rate_period - (time.monotonic() - self.sent_times[0])
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                self.sent_times.popleft()
+        while len(self.sent_times) > 0 and time.monotonic() - self.sent_times[0] > self.rate_period:
+            self.sent_times.popleft()
+
+    # ==========
+    # 后台发送
+    # ==========
+
+    def start(self) -> None:
+        with self.thread_lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run_send, daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
 
-            res = self.send_message(data={
+    def enqueue(self, message: Dict) -> bool:
+        if not self.async_send:
+            return self.deliver(message)
+
+        self.start()
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except queue.Full:
+            print(f'钉钉消息队列已满，丢弃: {message["title"]}')
+            return False
+
+    def run_send(self) -> None:
+        while True:
+            message = self.queue.get()
+            if message is None:
+                break
+
+            # 限流等待和合并窗口期间到达的消息一起合并
+            self.wait_rate_limit()
+            if message['tag']:
+                time.sleep(self.coalesce_window)
+            messages = [message]
+            stopped = False
+            while True:
+                try:
+                    message = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if message is None:
+                    stopped = True
+                    break
+                messages.append(message)
+
+            for message in coalesce_messages(messages):
+                self.deliver(message)
+            if stopped:
+                break
+
+    def deliver(self, message: Dict) -> bool:
+        if message['markdown']:
+            data = {
                 'msgtype': 'markdown',
                 'markdown': {
-                    'title': title,
-                    'text': text,
+                    'title': message['title'],
+                    'text': message['text'],
                 },
                 'at': {
-                    'isAtAll': alert,
+                    'isAtAll': message['alert'],
                 }
-            })
+            }
         else:
-            res = self.send_message(data={
+            data = {
                 "msgtype": "text",
                 "text": {
-                    "content": msg,
+                    "content": message['text'],
                 },
                 "at": {
-                    "isAtAll": alert,
+                    "isAtAll": message['alert'],
                 },
-            })
+            }
 
+        res = self.post(data)
         if res['errmsg'] == 'ok':
-            print(output, end='')
+            print(message['output'], end='')
             return True
         else:
             print('Ding message send failed: ', res['errmsg'])
             return False
 
+    # 退出前把队列里的消息发完，最多等待 timeout 秒
+    def close(self, timeout: float = 10.0) -> None:
+        if self.thread is None or not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+    # ==========
+    # 发送接口
+    # ==========
+
+    def send_text(self, msg: str, output: str = '', alert: bool = False, to_markdown: bool = True) -> bool:
+        if to_markdown:
+            return self.enqueue({
+                'markdown': True,
+                'title': msg.split('\n')[0],
+                'text': msg.replace('\n', '\n>\n>'),
+                'alert': alert,
+                'tag': output,
+                'output': output,
+            })
+        else:
+            return self.enqueue({
+                'markdown': False,
+                'title': msg.split('\n')[0],
+                'text': msg,
+                'alert': alert,
+                'tag': '',
+                'output': output,
+            })
+
     def send_markdown(self, title: str, text: str, alert: bool = False) -> bool:
         # my_data = {
         #     "msgtype": "markdown",
@@ -105,22 +256,46 @@ class DingMessager(object):
         #         "isAtAll": False}  # 是否@所有人
         # }
 
-        my_data = {
-            'msgtype': 'markdown',
-            'markdown': {
-                'title': title,
-                'text': text,
-            },
-            'at': {
-                'isAtAll': alert,
-            }
-        }
+        return self.enqueue({
+            'markdown': True,
+            'title': title,
+            'text': text,
+            'alert': alert,
+            'tag': '',
+            'output': 'Ding markdown send success!\n',
+        })
 
-        res = self.send_message(data=my_data)
 
-        if res['errmsg'] == 'ok':
-            print('Ding markdown send success!')
-            return True
+# 同一标签（如 [BUY]、[SELL]）且不 @所有人 的 markdown 消息合并成一条，按首次出现的顺序发送
+# 合并后的正文超过 DING_TEXT_LIMIT 时拆成多条
+def coalesce_messages(messages: List[Dict]) -> List[Dict]:
+    groups: Dict[tuple, List[Dict]] = {}  # 不合并的消息各自一组
+    for i, message in enumerate(messages):
+        if message['markdown'] and message['tag'] and not message['alert']:
+            key = ('tag', message['tag'])
         else:
-            print('Ding markdown send failed: ', res['errmsg'])
-            return False
+            key = ('single', i)
+        groups.setdefault(key, []).append(message)
+
+    merged = []
+    for group in groups.values():
+        chunk: List[Dict] = []
+        size = 0
+        for message in group + [None]:
+            if message is None or (len(chunk) > 0 and size + len(message['text']) > DING_TEXT_LIMIT):
+                if len(chunk) == 1:
+                    merged.append(chunk[0])
+                elif len(chunk) > 1:
+                    merged.append({
+                        'markdown': True,
+                        'title': f'{chunk[0]["title"]} 等{len(chunk)}条',
+                        'text': '\n\n'.join(m['text'] for m in chunk),
+                        'alert': False,
+                        'tag': chunk[0]['tag'],
+                        'output': chunk[0]['output'],
+                    })
+                chunk, size = [], 0
+            if message is not None:
+                chunk.append(message)
+                size += len(message['text'])
+    return merged
@@ -0,0 +1,184 @@
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from tools.utils_basic import is_stock
+from tools.utils_remote import DataSource, get_daily_history
+
+
+# 各数据源的限流配置：每秒请求数，突发容量，并发线程数
+DATA_SOURCE_LIMITS = {
+    DataSource.AKSHARE: {'rate': 5.0, 'burst': 5, 'workers': 4},
+    DataSource.TUSHARE: {'rate': 8.0, 'burst': 8, 'workers': 4},   # tushare 每分钟500次
+}
+
+
+# --------------------------------
+# 令牌桶限流，线程安全，acquire 阻塞到拿到令牌为止
+# --------------------------------
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,                            # 每秒补充的令牌数
+        capacity: int = 1,                      # 桶容量，即允许的突发请求数
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+
+        self.lock = threading.Lock()
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+# --------------------------------
+# 并发限流下载，单个 code 失败后指数退避重试，结果按 target_codes 的顺序返回
+# fetch 与 get_daily_history 签名一致，可替换为 FakeDataSource 做离线测试
+# 每次调用 fetch 只发一次请求（max_tries=1），重试都在这里进行，每次请求都先拿令牌
+# --------------------------------
+def download_daily_histories(
+    target_codes: List[str],
+    start: str,
+    end: str,
+    adjust: str,
+    columns: List[str],
+    data_source: int = DataSource.AKSHARE,
+    fetch: Callable[..., Optional[pd.DataFrame]] = get_daily_history,
+    bucket: TokenBucket = None,
+    max_workers: int = None,
+    max_retries: int = 2,
+    backoff: float = 0.5,                       # 第 n 次重试前等待 backoff * 2^(n-1) 秒
+    progress: Callable[[int, int, str], None] = None,
+) -> Dict[str, pd.DataFrame]:
+    limits = DATA_SOURCE_LIMITS.get(data_source, DATA_SOURCE_LIMITS[DataSource.AKSHARE])
+    if bucket is None:
+        bucket = TokenBucket(limits['rate'], limits['burst'])
+    if max_workers is None:
+        max_workers = limits['workers']
+    if progress is None:
+        progress = print_progress
+
+    codes = [code for code in target_codes if is_stock(code)]  # 非股票代码不会有数据，不占用请求额度
+    results: Dict[str, Optional[pd.DataFrame]] = {}
+    lock = threading.Lock()
+
+    def task(code: str) -> None:
+        df = None
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            bucket.acquire()
+            try:
+                df = fetch(code, start, end, columns=columns, adjust=adjust, data_source=data_source, max_tries=1)
+            except Exception as e:
+                print(f'[{code}] 下载失败 第{attempt + 1}次: {e}')
+                df = None
+            if df is not None:
+                break
+
+        with lock:
+            results[code] = df
+            done = len(results)
+        progress(done, len(codes), code)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for future in [executor.submit(task, code) for code in codes]:
+            future.result()
+
+    return {code: results[code] for code in codes if results.get(code) is not None}
+
+
+def print_progress(done: int, total: int, code: str, group_size: int = 200) -> None:
+    if done % group_size == 0 or done == total:
+        print(f'{done}/{total} finished, last: {code}')  # 已更新数量
+
+
+FAKE_EPOCH = '20150101'
+
+
+# --------------------------------
+# 离线测试用的确定性数据源：同一个 code 每次生成相同的日线
+# 记录每次请求的时间点，用来验证吞吐和限流是否达标
+# --------------------------------
+class FakeDataSource:
+    def __init__(
+        self,
+        latency: float = 0.0,                   # 模拟每次请求的网络耗时
+        fail_times: int = 0,                    # 每个 code 的前几次请求抛出异常
+        fail_ratio: float = 0.0,                # 需要失败的 code 占比，按 code 的哈希确定
+    ):
+        self.latency = latency
+        self.fail_times = fail_times
+        self.fail_ratio = fail_ratio
+
+        self.lock = threading.Lock()
+        self.calls: List[float] = []            # 每次请求的 monotonic 时间
+        self.attempts: Dict[str, int] = {}
+
+    def __call__(
+        self,
+        code: str,
+        start_date: str,
+        end_date: str,
+        columns: List[str] = None,
+        adjust: str = '',
+        data_source: int = None,
+        max_tries: int = 1,
+    ) -> Optional[pd.DataFrame]:
+        seed = zlib.crc32(code.encode())
+        with self.lock:
+            self.calls.append(time.monotonic())
+            attempt = self.attempts.get(code, 0)
+            self.attempts[code] = attempt + 1
+
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if attempt < self.fail_times and seed % 1000 < self.fail_ratio * 1000:
+            raise ConnectionError(f'fake failure {attempt + 1}')
+
+        # 从固定起点生成整段行情再截取，保证不同下载区间里同一天的K线完全相同
+        days = pd.bdate_range(pd.Timestamp(FAKE_EPOCH), pd.Timestamp(end_date))
+        noise = np.random.default_rng(seed).random((len(days), 5))  # 按行生成，第i天的随机数与区间长度无关
+        close = np.round(10 * np.exp(np.cumsum((noise[:, 0] - 0.5) * 0.04)), 2)
+        df = pd.DataFrame({
+            'datetime': days.strftime('%Y%m%d'),
+            'open': np.round(close * (1 + (noise[:, 1] - 0.5) * 0.01), 2),
+            'high': np.round(close * (1 + noise[:, 2] * 0.02), 2),
+            'low': np.round(close * (1 - noise[:, 3] * 0.02), 2),
+            'close': close,
+            'volume': (1000 + noise[:, 4] * 99000).astype(np.int64),
+            'amount': np.round(close * (100000 + noise[:, 4] * 9900000), 2),
+        })
+        df = df[df['datetime'] >= start_date].reset_index(drop=True)
+        if len(df) == 0:
+            return None
+        if columns is not None:
+            return df[columns]
+        return df
+
+    # 任意 window 秒内的最大请求数，用来检查是否超过限流
+    def max_calls_in_window(self, window: float = 1.0) -> int:
+        calls = np.sort(np.array(self.calls))
+        if len(calls) == 0:
+            return 0
+        return int((np.searchsorted(calls, calls + window, side='left') - np.arange(len(calls))).max())
@@ -0,0 +1,344 @@
+import os
+import shutil
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tools.utils_cache import load_pickle, save_pickle
+from tools.utils_download import download_daily_histories
+from tools.utils_remote import DataSource, get_daily_history
+
+try:
+    from pyarrow import feather
+except ImportError:
+    feather = None
+
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+HistoryKey = Tuple[str, str]  # (code, adjust)
+
+
+# --------------------------------
+# 列式存储的读写：有 pyarrow 时写一个不压缩的 feather 文件，没有则每列一个 .npy 文件
+# 两种格式读取时都是 memory map，不会把全部数据读进内存
+# datetime 列以 int32 的 YYYYMMDD 存储，保证所有列都是定长数值
+# --------------------------------
+def _save_columns(folder: str, columns: Dict[str, np.ndarray]) -> None:
+    if feather is not None:
+        feather.write_feather(pd.DataFrame(columns), f'{folder}/bars.feather', compression='uncompressed')
+    else:
+        for name, array in columns.items():
+            np.save(f'{folder}/{name}.npy', array)
+
+
+def _load_columns(folder: str, names: List[str]) -> Dict[str, np.ndarray]:
+    if feather is not None and os.path.exists(f'{folder}/bars.feather'):
+        table = feather.read_table(f'{folder}/bars.feather', memory_map=True)
+        return {name: table.column(name).to_numpy() for name in names}
+    # np.asarray 去掉 memmap 子类，切片时不再逐次构造 memmap 对象，数据仍然是映射的
+    return {name: np.asarray(np.load(f'{folder}/{name}.npy', mmap_mode='r')) for name in names}
+
+
+# --------------------------------
+# 所有 (code, adjust) 的日线首尾相接存成一张列式表，按 key 记录 offset 和 count
+# 每次保存写入一个新版本目录，再原子替换 CURRENT 指针，正在被 memory map 的旧版本不受影响
+# --------------------------------
+class ColumnarFrames(Mapping):
+    def __init__(self, path: str):
+        self.path = path
+        self.index: Dict[HistoryKey, Tuple[int, int]] = {}     # { key: (offset, count) }
+        self.columns: Dict[HistoryKey, List[str]] = {}         # 每个 key 自己的列
+        self.starts: Dict[HistoryKey, str] = {}
+        self.data: Dict[str, np.ndarray] = {}
+        self.version = None
+        self._date_keys = None      # 全部出现过的日期，int -> str 转换用查表代替逐个格式化
+        self._date_labels = None
+
+        current = f'{path}/CURRENT'
+        if os.path.exists(current):
+            with open(current, 'r') as r:
+                self.version = r.read().strip()
+            meta = load_pickle(f'{path}/{self.version}/index.pkl')
+            self.index = meta['index']
+            self.columns = meta['columns']
+            self.starts = meta['starts']
+            self.data = _load_columns(f'{path}/{self.version}', meta['names'])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __iter__(self) -> Iterator[HistoryKey]:
+        return iter(self.index)
+
+    def __contains__(self, key) -> bool:
+        return key in self.index
+
+    def __getitem__(self, key: HistoryKey) -> pd.DataFrame:
+        return self.frame(key)
+
+    def dates(self, key: HistoryKey) -> np.ndarray:
+        offset, count = self.index[key]
+        return self.data['datetime'][offset:offset + count]
+
+    def date_labels(self, dates: np.ndarray) -> np.ndarray:
+        if self._date_keys is None:
+            self._date_keys = np.unique(self.data['datetime'])
+            self._date_labels = self._date_keys.astype(str).astype(object)
+        return self._date_labels[np.searchsorted(self._date_keys, dates)]
+
+    def column(self, key: HistoryKey, name: str, lo: int = 0, hi: int = None) -> np.ndarray:
+        offset, count = self.index[key]
+        hi = count if hi is None else hi
+        array = self.data[name][offset + lo:offset + hi]
+        return self.date_labels(array) if name == 'datetime' else array
+
+    # 只在访问时把该 key 的切片转换成 DataFrame
+    def frame(self, key: HistoryKey, lo: int = 0, hi: int = None, columns: List[str] = None) -> pd.DataFrame:
+        names = columns if columns is not None else self.columns[key]
+        return pd.DataFrame({name: self.column(key, name, lo, hi) for name in names})
+
+    @staticmethod
+    def write(path: str, frames: Dict[HistoryKey, pd.DataFrame], starts: Dict[HistoryKey, str]) -> str:
+        names = ['datetime']
+        dtypes = {'datetime': np.int32}
+        for df in frames.values():
+            for name in df.columns:
+                if name not in dtypes:
+                    names.append(name)
+                    dtypes[name] = np.int64 if pd.api.types.is_integer_dtype(df[name]) else np.float64
+
+        counts = [len(df) for df in frames.values()]
+        offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+
+        columns = {}
+        for name in names:
+            array = np.full(int(offsets[-1]), np.nan if dtypes[name] == np.float64 else 0, dtype=dtypes[name])
+            for offset, df in zip(offsets, frames.values()):
+                if name in df.columns:
+                    array[offset:offset + len(df)] = df[name].values.astype(dtypes[name])
+            columns[name] = array
+
+        version = 'v' + pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')
+        folder = f'{path}/{version}'
+        os.makedirs(folder, exist_ok=True)
+        _save_columns(folder, columns)
+        save_pickle(f'{folder}/index.pkl', {
+            'names': names,
+            'index': {key: (int(offset), count) for key, offset, count in zip(frames.keys(), offsets, counts)},
+            'columns': {key: list(df.columns) for key, df in frames.items()},
+            'starts': {key: starts[key] for key in frames if key in starts},
+        })
+
+        with open(f'{path}/CURRENT.tmp', 'w') as w:
+            w.write(version)
+        os.replace(f'{path}/CURRENT.tmp', f'{path}/CURRENT')
+
+        for name in os.listdir(path):  # 清理旧版本，windows 下仍被映射的文件删不掉，下次保存再删
+            if name != version and os.path.isdir(f'{path}/{name}'):
+                shutil.rmtree(f'{path}/{name}', ignore_errors=True)
+        return version
+
+
+# --------------------------------
+# cache_history 的惰性视图：cache_history[code] 首次访问时才从列式存储切出窗口并生成 DataFrame
+# --------------------------------
+class HistoryView(Mapping):
+    def __init__(
+        self,
+        store: 'HistoryStore',
+        code_list: List[str],
+        start: str,
+        end: str,
+        adjust: str,
+        columns: List[str] = None,
+    ):
+        self.store = store
+        self.adjust = adjust
+        self.columns = columns
+        self.cache: Dict[str, pd.DataFrame] = {}
+
+        self.bounds: Dict[str, Tuple[int, int]] = {}  # { code: (lo, hi) } 窗口在该 key 内的下标范围
+        for code in code_list:
+            dates = store.dates((code, adjust))
+            if dates is None:
+                continue
+            lo = int(np.searchsorted(dates, int(start), side='left'))
+            hi = int(np.searchsorted(dates, int(end), side='right'))
+            if hi > lo:
+                self.bounds[code] = (lo, hi)
+
+    def __len__(self) -> int:
+        return len(self.bounds)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.bounds)
+
+    def __contains__(self, code) -> bool:
+        return code in self.bounds
+
+    def __getitem__(self, code: str) -> pd.DataFrame:
+        if code not in self.cache:
+            lo, hi = self.bounds[code]
+            self.cache[code] = self.store.frame((code, self.adjust), lo, hi, self.columns)
+        return self.cache[code]
+
+    # 不生成 DataFrame 直接取某一列，全市场扫描时省掉逐个构造 DataFrame 的开销
+    def column(self, code: str, name: str) -> np.ndarray:
+        if code in self.cache:
+            return self.cache[code][name].values
+        lo, hi = self.bounds[code]
+        return self.store.column((code, self.adjust), name, lo, hi)
+
+    def length(self, code: str) -> int:
+        lo, hi = self.bounds[code]
+        return hi - lo
+
+
+# --------------------------------
+# 按 (code, adjust) 持久化的增量日线缓存
+# 每天只下载上次存储日期之后的尾部，尾部第一根K线与存储的最后一根重叠，
+# 价格对不上说明前复权因子变了（除权除息），这只票整段重新下载
+# 尾部下载失败时保留已存储的K线，只标记过期不返回，下次运行仍只补尾部
+# 磁盘上是 ColumnarFrames，本次更新过的 key 暂存在内存里，save 时合并写入新版本
+# --------------------------------
+class HistoryStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.frames = ColumnarFrames(path)
+        self.starts: Dict[HistoryKey, str] = dict(self.frames.starts)  # 每个 key 完整下载时请求的起始日期
+        self.bars: Dict[HistoryKey, pd.DataFrame] = {}                  # 本次更新过的 key
+        self.removed = set()
+        self.stale = set()                                              # 本次尾部下载失败，数据不是最新的 key
+
+    def keys(self) -> List[HistoryKey]:
+        keys = [key for key in self.frames if key not in self.removed and key not in self.bars]
+        return keys + list(self.bars.keys())
+
+    def dates(self, key: HistoryKey) -> Optional[np.ndarray]:
+        if key in self.bars:
+            return self.bars[key]['datetime'].values.astype(np.int32)
+        if key in self.removed or key not in self.frames:
+            return None
+        return self.frames.dates(key)
+
+    def frame(self, key: HistoryKey, lo: int = 0, hi: int = None, columns: List[str] = None) -> Optional[pd.DataFrame]:
+        if key in self.bars:
+            df = self.bars[key].iloc[lo:hi].reset_index(drop=True)
+            return df[columns] if columns is not None else df
+        if key in self.removed or key not in self.frames:
+            return None
+        return self.frames.frame(key, lo, hi, columns)
+
+    def column(self, key: HistoryKey, name: str, lo: int = 0, hi: int = None) -> np.ndarray:
+        if key in self.bars:
+            return self.bars[key][name].values[lo:hi]
+        return self.frames.column(key, name, lo, hi)
+
+    def columns_of(self, key: HistoryKey) -> List[str]:
+        if key in self.bars:
+            return list(self.bars[key].columns)
+        return self.frames.columns.get(key, [])
+
+    def put(self, key: HistoryKey, df: pd.DataFrame, start: str) -> None:
+        self.bars[key] = df.reset_index(drop=True)
+        self.starts[key] = start
+        self.removed.discard(key)
+        self.stale.discard(key)
+
+    def remove(self, key: HistoryKey) -> None:
+        self.bars.pop(key, None)
+        self.removed.add(key)
+
+    def save(self) -> None:
+        if self.frames.version is not None and len(self.bars) == 0 and len(self.removed) == 0:
+            return  # 没有任何更新，不需要重写
+        os.makedirs(self.path, exist_ok=True)
+        ColumnarFrames.write(self.path, {key: self.frame(key) for key in self.keys()}, self.starts)
+
+    def last_date(self, code: str, adjust: str) -> Optional[str]:
+        dates = self.dates((code, adjust))
+        if dates is None or len(dates) == 0:
+            return None
+        return str(dates[-1])
+
+    # 需要整段下载返回 None，否则返回尾部下载的起始日期，即已存储的最后一根K线
+    def _tail_start(self, code: str, start: str, adjust: str, columns: List[str]) -> Optional[str]:
+        key = (code, adjust)
+        last_date = self.last_date(code, adjust)
+        if last_date is None or self.starts.get(key, '99999999') > start:
+            return None
+        if columns is not None and not set(columns).issubset(self.columns_of(key)):
+            return None
+        return last_date
+
+    def _merge_tail(self, key: HistoryKey, tail: pd.DataFrame, start: str) -> bool:
+        df = self.frame(key)
+        if len(tail) == 0 or tail['datetime'].iloc[0] != df['datetime'].iloc[-1]:
+            return False
+
+        columns = [column for column in PRICE_COLUMNS if column in df.columns and column in tail.columns]
+        if not np.allclose(df[columns].iloc[-1].values.astype(float), tail[columns].iloc[0].values.astype(float)):
+            return False  # 复权因子变化
+
+        df = pd.concat([df, tail[df.columns].iloc[1:]], ignore_index=True)
+        self.put(key, df[df['datetime'] >= start], start)  # 窗口起点之前的K线不再需要
+        return True
+
+    def update(
+        self,
+        code_list: List[str],
+        start: str,
+        end: str,
+        adjust: str,
+        columns: List[str],
+        data_source: int = DataSource.AKSHARE,
+        fetch: Callable[..., Optional[pd.DataFrame]] = get_daily_history,
+    ) -> HistoryView:
+        code_list = list(dict.fromkeys(code_list))  # 白名单和持仓可能重复
+        self.stale.difference_update((code, adjust) for code in code_list)
+        full_codes = []
+        tail_groups: Dict[str, List[str]] = {}  # 同一个尾部起始日期的 code 一起下载
+        for code in code_list:
+            tail_start = self._tail_start(code, start, adjust, columns)
+            if tail_start is None:
+                full_codes.append(code)
+            elif tail_start < end:
+                tail_groups.setdefault(tail_start, []).append(code)
+
+        for tail_start, codes in tail_groups.items():
+            print(f'Updating {len(codes)} stocks from {tail_start} to {end} ...')
+            tails = download_daily_histories(
+                codes, tail_start, end, adjust, columns, data_source=data_source, fetch=fetch)
+            for code in codes:
+                key = (code, adjust)
+                if code not in tails:
+                    self.stale.add(key)  # 下载失败宁可缺失，也不用过期数据，但保留已存储的K线
+                elif not self._merge_tail(key, tails[code], start):
+                    full_codes.append(code)
+
+        if len(full_codes) > 0:
+            print(f'Downloading {len(full_codes)} stocks from {start} to {end} ...')
+            fulls = download_daily_histories(
+                full_codes, start, end, adjust, columns, data_source=data_source, fetch=fetch)
+            for code in full_codes:
+                key = (code, adjust)
+                if code in fulls:
+                    self.put(key, fulls[code], start)
+                else:
+                    self.remove(key)
+
+        code_list = [code for code in code_list if (code, adjust) not in self.stale]
+        return self.get(code_list, start, end, adjust, columns)
+
+    def get(
+        self,
+        code_list: List[str],
+        start: str,
+        end: str,
+        adjust: str,
+        columns: List[str] = None,
+    ) -> HistoryView:
+        return HistoryView(self, code_list, start, end, adjust, columns)
@@ -0,0 +1,123 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+# 直方图的桶边界（毫秒），0.01ms 到约 100s 按 1.2 倍递增，百分位取所在桶的上界
+LATENCY_BOUNDS: List[float] = [0.01 * 1.2 ** i for i in range(90)]
+
+# 各阶段耗时都从本次行情回调进入时开始计算，tick 开头的两项从交易所时间戳 quote['time'] 开始计算
+LATENCY_STAGES = [
+    'tick_to_callback',     # 交易所时间 -> 回调进入
+    'strategy_start',       # 回调进入 -> 策略开始
+    'select',               # 回调进入 -> 选股完成
+    'submit',               # 回调进入 -> 委托提交返回
+    'strategy_end',         # 回调进入 -> 策略结束
+    'tick_to_submit',       # 交易所时间 -> 委托提交返回
+]
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.total = 0
+        self.max = 0.0
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BOUNDS, ms)] += 1
+        self.total += 1
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p: float) -> float:
+        target = self.total * p
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count > 0 and seen >= target:
+                return self.max if i == len(LATENCY_BOUNDS) else min(LATENCY_BOUNDS[i], self.max)
+        return self.max
+
+
+# --------------------------------
+# 从行情到委托的延迟打点，进程内单例，每个进程只跑一个策略
+#   回调进入时 begin 记下 perf_counter，之后各阶段 mark 记录相对耗时
+#   关闭时 begin/mark 只做一次属性判断就返回
+#   每隔 summary_interval 秒把各阶段 p50/p99/max 写一次日志，盘后 report 汇总全天
+# --------------------------------
+class LatencyMonitor:
+    def __init__(self):
+        self.enabled = False
+        self.strategy_name = ''
+        self.summary_interval = 300.0
+
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.local = threading.local()
+        self.last_summary = time.monotonic()
+
+    def configure(self, strategy_name: str, enabled: bool = True, summary_interval: float = 300.0) -> None:
+        self.strategy_name = strategy_name
+        self.enabled = enabled
+        self.summary_interval = summary_interval
+
+    def begin(self, quotes: Dict[str, Dict]) -> None:
+        if not self.enabled:
+            return
+        self.local.start = time.perf_counter()
+        self.local.wall = time.time()
+        self.local.quotes = quotes
+        self.local.tick_age = None
+
+    # 交易所时间戳到回调进入的延迟，只在策略真正执行时计算一次
+    def tick_age(self) -> Optional[float]:
+        if self.local.tick_age is None:
+            quotes = self.local.quotes
+            latest = max((quote.get('time', 0) for quote in quotes.values()), default=0) if quotes else 0
+            self.local.tick_age = self.local.wall * 1000 - latest if latest > 0 else -1.0
+            if self.local.tick_age >= 0:
+                self.add('tick_to_callback', self.local.tick_age)
+        return self.local.tick_age if self.local.tick_age >= 0 else None
+
+    def mark(self, stage: str) -> None:
+        if not self.enabled or getattr(self.local, 'start', None) is None:
+            return
+        elapsed = (time.perf_counter() - self.local.start) * 1000
+        self.add(stage, elapsed)
+
+        if stage == 'strategy_start':
+            self.tick_age()
+        elif stage == 'submit':
+            tick_age = self.tick_age()
+            if tick_age is not None:
+                self.add('tick_to_submit', tick_age + elapsed)
+        elif stage == 'strategy_end':
+            self.local.start = None
+            if time.monotonic() - self.last_summary > self.summary_interval:
+                self.last_summary = time.monotonic()
+                logging.info(self.summary())
+
+    def add(self, stage: str, ms: float) -> None:
+        with self.lock:
+            if stage not in self.histograms:
+                self.histograms[stage] = LatencyHistogram()
+            self.histograms[stage].add(ms)
+
+    def summary(self) -> str:
+        lines = [f'[{self.strategy_name}] 延迟统计(ms) p50/p99/max']
+        with self.lock:
+            for stage in LATENCY_STAGES:
+                histogram = self.histograms.get(stage)
+                if histogram is not None and histogram.total > 0:
+                    lines.append(f'{stage}: {histogram.percentile(0.5):.2f}/{histogram.percentile(0.99):.2f}/'
+                                 f'{histogram.max:.2f} n={histogram.total}')
+        return '\n'.join(lines)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+
+
+latency = LatencyMonitor()
@@ -0,0 +1,79 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+
+# 实时 quote 字段到日线列名的映射，与 append_ak_quote_dict 一致
+QUOTE_FIELDS = {
+    'open': 'open',
+    'high': 'high',
+    'low': 'low',
+    'close': 'lastPrice',
+    'volume': 'volume',
+    'amount': 'amount',
+}
+
+
+class HistoryPanel:
+    """
+    把 cache_history 按 code 堆叠成右对齐的 (codes × days) 二维数组，历史不足的部分在左侧补 nan
+    最后一列留给当日实时行情，盘中每次扫描只需要覆写这一列
+    """
+    def __init__(self, cache_history: Dict[str, pd.DataFrame], columns: List[str] = None, days: int = None):
+        if columns is None:
+            columns = list(QUOTE_FIELDS.keys())
+
+        # HistoryView 可以不生成 DataFrame 直接取列，普通 dict 则从 DataFrame 取列
+        if hasattr(cache_history, 'column'):
+            get_length, get_column = cache_history.length, cache_history.column
+        else:
+            get_length = lambda code: 0 if cache_history[code] is None else len(cache_history[code])
+            get_column = lambda code, column: cache_history[code][column].values
+
+        self.columns = [column for column in columns if column in QUOTE_FIELDS]
+        self.codes: List[str] = [code for code in cache_history.keys() if get_length(code) > 0]
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(self.codes)}
+        self.lengths = np.array([get_length(code) for code in self.codes], dtype=np.int64)
+
+        if days is None:
+            days = int(self.lengths.max()) if len(self.codes) > 0 else 0
+        self.days = days
+        self.lengths = np.minimum(self.lengths, days)
+
+        self.data: Dict[str, np.ndarray] = {}
+        for column in self.columns:
+            array = np.full((len(self.codes), days + 1), np.nan)
+            for i, code in enumerate(self.codes):
+                n = self.lengths[i]
+                if n > 0:
+                    array[i, days - n:days] = get_column(code, column)[-n:]
+            self.data[column] = array
+
+        self.quoted = np.zeros(len(self.codes), dtype=bool)  # 最后一列是否已写入实时行情
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.data[column]
+
+    # 把实时行情写进最后一列，返回有实时行情的 code 掩码
+    def set_quotes(self, quotes: Dict[str, Dict]) -> np.ndarray:
+        codes = [code for code in quotes if code in self.index]
+        rows = np.fromiter((self.index[code] for code in codes), dtype=np.int64, count=len(codes))
+
+        self.quoted[:] = False
+        self.quoted[rows] = True
+        for column in self.columns:
+            field = QUOTE_FIELDS[column]
+            array = self.data[column]
+            array[:, -1] = np.nan
+            array[rows, -1] = np.fromiter((quotes[code][field] for code in codes), dtype=float, count=len(codes))
+        return self.quoted
+
+    def get_codes(self, mask: np.ndarray) -> List[str]:
+        return [self.codes[i] for i in np.flatnonzero(mask)]
@@ -75,9 +75,10 @@ def get_daily_history(
     columns: list[str] = None,
     adjust='',
     data_source=DataSource.AKSHARE,
+    max_tries: int = 3,     # tushare 返回空数据时的请求次数，限流下载时由外层重试，传 1
 ) -> Optional[pd.DataFrame]:
     if data_source == DataSource.TUSHARE:
-        return get_ts_daily_history(code, start_date, end_date, columns, adjust)
+        return get_ts_daily_history(code, start_date, end_date, columns, adjust, max_tries)
     return get_ak_daily_history(code, start_date, end_date, columns, adjust)
 
 
@@ -141,13 +142,14 @@ def get_ts_daily_history(
     end_date: str,
     columns: list[str] = None,
     adjust='',
+    max_tries: int = 3,
 ) -> Optional[pd.DataFrame]:
     if not is_stock(code):
         return None
 
     try_times = 0
     df = None
-    while (df is None or len(df) <= 0) and try_times < 3:
+    while (df is None or len(df) <= 0) and try_times < max_tries:
         pro = get_tushare_pro()
         try_times += 1
         df = pro.daily(
@@ -0,0 +1,126 @@
+import os
+import pickle
+import queue
+import threading
+import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from tools.utils_tick import TickArchive, TICK_ARCHIVE_PATH
+
+
+# 回放的行情批次：(批次时间戳毫秒, { code: quote })，quote 与 xtdata 全推行情的字段一致
+QuoteBatch = Tuple[int, Dict[str, Dict]]
+
+QUOTE_RECORD_PATH = './_cache/debug/quotes_{}.pkl'     # 按日期 %Y%m%d 区分
+
+
+# --------------------------------
+# 全推行情录制：每次回调的增量行情作为一个批次追加写入，pickle 在后台线程完成，不占用行情回调
+# 文件由连续的 pickle 记录组成，进程中断最多丢掉最后一条写了一半的记录
+# --------------------------------
+class QuoteRecorder:
+    def __init__(self, path: str, max_queue: int = 1000):
+        self.path = path
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = threading.Thread(target=self.run_write, daemon=True)
+        self.thread.start()
+
+    def append(self, quotes: Dict[str, Dict], timestamp: int = None) -> None:
+        if timestamp is None:
+            timestamp = int(datetime.datetime.now().timestamp() * 1000)
+        self.queue.put((timestamp, dict(quotes)))
+
+    def run_write(self) -> None:
+        with open(self.path, 'ab') as w:
+            while True:
+                batch = self.queue.get()
+                if batch is None:
+                    break
+                pickle.dump(batch, w, protocol=pickle.HIGHEST_PROTOCOL)
+                if self.queue.empty():
+                    w.flush()
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+
+
+def read_recorded_quotes(path: str) -> Iterator[QuoteBatch]:
+    with open(path, 'rb') as r:
+        while True:
+            try:
+                yield pickle.load(r)
+            except (EOFError, pickle.UnpicklingError):
+                return
+
+
+# --------------------------------
+# 从当日 tick 归档还原行情批次，归档只有最新价、累计量和一档盘口
+# open/high/low 由逐笔最新价累计得到，lastClose 需要由调用方从日线缓存提供
+# 同一个 group_ms 时间窗内的所有 code 合成一个批次（同一 code 取最后一笔），按时间顺序返回
+# --------------------------------
+# tick 归档没有昨收，由 last_closes 提供；没有昨收的代码涨跌停判断会失真，跳过不回放
+def iter_tick_archive_quotes(
+    path_prefix: str,
+    last_closes: Dict[str, float],
+    group_ms: int = 1000,
+) -> Iterator[QuoteBatch]:
+    archive = TickArchive(path_prefix)
+    codes = archive.get_codes()
+    skipped = [code for code in codes if code not in last_closes]
+    if len(skipped) > 0:
+        print(f'{len(skipped)} 支没有昨收价，不回放：{skipped[:10]}{" ..." if len(skipped) > 10 else ""}')
+        codes = [code for code in codes if code in last_closes]
+    if len(codes) == 0:
+        return
+
+    ticks = [archive.get_ticks(code) for code in codes]
+    owners = np.concatenate([np.full(len(t), i, dtype=np.int32) for i, t in enumerate(ticks)])
+    records = np.concatenate(ticks)
+    order = np.lexsort((owners, records['time']))
+    records, owners = records[order], owners[order]
+
+    opens: Dict[str, float] = {}
+    highs: Dict[str, float] = {}
+    lows: Dict[str, float] = {}
+    times = records['time']
+    bounds = np.flatnonzero(np.diff(times // group_ms)) + 1
+    for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [len(times)]))):
+        batch = {}
+        for record, owner in zip(records[lo:hi].tolist(), owners[lo:hi].tolist()):
+            t, price, volume, ask_price, ask_vol, bid_price, bid_vol = record
+            code = codes[owner]
+            price = round(price, 3)
+            opens.setdefault(code, price)
+            highs[code] = max(highs.get(code, price), price)
+            lows[code] = min(lows.get(code, price), price)
+            batch[code] = {
+                'time': t,
+                'lastPrice': price,
+                'open': opens[code],
+                'high': highs[code],
+                'low': lows[code],
+                'lastClose': last_closes[code],
+                'volume': volume,
+                'amount': 0.0,
+                'askPrice': [round(ask_price, 3), 0, 0, 0, 0],
+                'askVol': [ask_vol, 0, 0, 0, 0],
+                'bidPrice': [round(bid_price, 3), 0, 0, 0, 0],
+                'bidVol': [bid_vol, 0, 0, 0, 0],
+            }
+        yield int(times[hi - 1]), batch
+
+
+def find_quote_source(date: str, last_closes: Dict[str, float]) -> Optional[Iterator[QuoteBatch]]:
+    """
+    date example: '20241231'，优先使用全推行情录制，其次使用 tick 归档
+    """
+    path = QUOTE_RECORD_PATH.format(date)
+    if os.path.exists(path):
+        return read_recorded_quotes(path)
+    prefix = TICK_ARCHIVE_PATH.format(date)
+    if os.path.exists(prefix + '.bin'):
+        return iter_tick_archive_quotes(prefix, last_closes)
+    return None
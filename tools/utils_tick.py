@@ -0,0 +1,314 @@
+import os
+import datetime
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+# tick 列定义：[ 成交时间, 成交价格, 累计成交量, 卖一价, 卖一量, 买一价, 买一量 ]
+TICK_COLUMNS = ['time', 'price', 'volume', 'askPrice', 'askVol', 'bidPrice', 'bidVol']
+TICK_DTYPES = {
+    'time': np.int64,           # 成交时间戳（毫秒）
+    'price': np.float32,        # 成交价格
+    'volume': np.int64,         # 累计成交量（手）
+    'askPrice': np.float32,     # 卖一价
+    'askVol': np.int32,         # 卖一量
+    'bidPrice': np.float32,     # 买一价
+    'bidVol': np.int32,         # 买一量
+}
+TICK_BYTES = sum(np.dtype(dtype).itemsize for dtype in TICK_DTYPES.values())
+
+# 磁盘归档：定长 tick 记录文件 + 每个 code 的分段偏移索引
+TICK_ARCHIVE_PATH = './_cache/debug/ticks_{}'   # 按日期 %Y%m%d 区分，后缀 .bin / .idx
+TICK_RECORD_DTYPE = np.dtype([(name, np.dtype(dtype).newbyteorder('<')) for name, dtype in TICK_DTYPES.items()])
+TICK_INDEX_DTYPE = np.dtype([('code', 'S16'), ('offset', '<i8'), ('count', '<i8')])
+
+
+def format_tick_times(times: np.ndarray) -> List[str]:
+    return [datetime.datetime.fromtimestamp(t / 1000).strftime('%H:%M:%S') for t in times.tolist()]
+
+
+class TickRingBuffer:
+    """
+    按列存储的当日 tick 缓存，每个 code 占一行
+    数据按 (code_chunk_size 行, chunk_size 笔) 分块存放，每块每列是一个 NumPy 二维数组，首次写到时才分配
+    扩容只新增分块，不复制已有数据，行情回调里不会出现整块拷贝的停顿
+    到达 max_ticks 后转为环形覆盖最早的数据，内存上限：code 行数 * max_ticks * TICK_BYTES
+    """
+    def __init__(self, chunk_size: int = 512, max_ticks: int = 6000, code_chunk_size: int = 1024):
+        self.chunk_size = chunk_size
+        self.max_ticks = max_ticks                  # 全天3秒一笔约4800笔，默认留出余量
+        self.code_chunk_size = code_chunk_size
+        self.tick_chunks = -(-max_ticks // chunk_size)
+
+        self._lock = threading.Lock()
+        self._rows: Dict[str, int] = {}             # { code: 行号 }
+        self._codes: List[str] = []
+        self._counts = np.zeros(code_chunk_size, dtype=np.int64)  # 每行累计写入的 tick 数
+        self._blocks: List[List[Optional[Dict[str, np.ndarray]]]] = []  # [行块][时间块] -> { 列名: 数组 }
+
+    def _block(self, row_block: int, tick_chunk: int) -> Dict[str, np.ndarray]:
+        while row_block >= len(self._blocks):
+            self._blocks.append([None] * self.tick_chunks)
+        block = self._blocks[row_block][tick_chunk]
+        if block is None:
+            block = {
+                name: np.zeros((self.code_chunk_size, self.chunk_size), dtype=dtype)
+                for name, dtype in TICK_DTYPES.items()
+            }
+            self._blocks[row_block][tick_chunk] = block
+        return block
+
+    def _get_row(self, code: str) -> int:
+        row = self._rows.get(code)
+        if row is None:
+            row = len(self._codes)
+            if row >= len(self._counts):  # 只有计数数组需要扩容，每个 code 8 字节
+                self._counts = np.concatenate((self._counts, np.zeros(self.code_chunk_size, dtype=np.int64)))
+            self._rows[code] = row
+            self._codes.append(code)
+        return row
+
+    # 读取一行里累计序号 [start, count) 的 tick，按时间顺序返回各列的拷贝
+    def _read(self, row: int, start: int, count: int) -> Dict[str, np.ndarray]:
+        row_block, offset = divmod(row, self.code_chunk_size)
+        positions = np.arange(start, count) % self.max_ticks
+        chunks = positions // self.chunk_size
+        ticks = {name: np.empty(len(positions), dtype=dtype) for name, dtype in TICK_DTYPES.items()}
+        for chunk in np.unique(chunks).tolist():
+            selected = chunks == chunk
+            block = self._blocks[row_block][chunk]
+            cols = positions[selected] - chunk * self.chunk_size
+            for name, column in block.items():
+                ticks[name][selected] = column[offset, cols]
+        return ticks
+
+    # 批量写入一次全推行情，一个 code 在一批中只会出现一次
+    def append_batch(self, quotes: Dict[str, Dict]) -> None:
+        n = len(quotes)
+        if n == 0:
+            return
+
+        values = quotes.values()
+        data = {
+            'time': np.fromiter((q['time'] for q in values), dtype=np.int64, count=n),
+            'price': np.fromiter((q['lastPrice'] for q in values), dtype=np.float32, count=n),
+            'volume': np.fromiter((q['volume'] for q in values), dtype=np.int64, count=n),
+            'askPrice': np.fromiter((q['askPrice'][0] for q in values), dtype=np.float32, count=n),
+            'askVol': np.fromiter((q['askVol'][0] for q in values), dtype=np.int32, count=n),
+            'bidPrice': np.fromiter((q['bidPrice'][0] for q in values), dtype=np.float32, count=n),
+            'bidVol': np.fromiter((q['bidVol'][0] for q in values), dtype=np.int32, count=n),
+        }
+
+        with self._lock:
+            rows = np.fromiter((self._get_row(code) for code in quotes), dtype=np.int64, count=n)
+            counts = self._counts[rows]
+            positions = counts % self.max_ticks
+
+            # 按 (行块, 时间块) 分组写入，通常一批行情只落在一两个分块里
+            row_blocks, offsets = np.divmod(rows, self.code_chunk_size)
+            chunks, cols = np.divmod(positions, self.chunk_size)
+            keys = row_blocks * self.tick_chunks + chunks
+            if keys.min() == keys.max():
+                groups = [(int(keys[0]), slice(None))]
+            else:
+                groups = [(key, keys == key) for key in np.unique(keys).tolist()]
+
+            for key, selected in groups:
+                block = self._block(*divmod(key, self.tick_chunks))
+                block_offsets, block_cols = offsets[selected], cols[selected]
+                for name, column in block.items():
+                    column[block_offsets, block_cols] = data[name][selected]
+            self._counts[rows] = counts + 1
+
+    # 返回单个 code 的各列数据（拷贝），回绕后按时间顺序排列
+    def get_ticks(self, code: str) -> Optional[Dict[str, np.ndarray]]:
+        with self._lock:
+            row = self._rows.get(code)
+            if row is None:
+                return None
+
+            count = int(self._counts[row])
+            return self._read(row, max(0, count - self.max_ticks), count)
+
+    # 返回累计序号 >= since 且仍保留在缓存中的 tick 以及当前累计序号，用于增量落盘
+    def get_ticks_since(self, code: str, since: int) -> (Optional[Dict[str, np.ndarray]], int):
+        with self._lock:
+            row = self._rows.get(code)
+            if row is None:
+                return None, since
+
+            count = int(self._counts[row])
+            start = max(since, count - self.max_ticks, 0)
+            if start >= count:
+                return None, count
+            return self._read(row, start, count), count
+
+    def get_count(self, code: str) -> int:
+        with self._lock:
+            row = self._rows.get(code)
+            if row is None:
+                return 0
+            return int(min(self._counts[row], self.max_ticks))
+
+    def get_codes(self) -> List[str]:
+        return list(self._codes)
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return self._counts.nbytes + sum(
+                column.nbytes for blocks in self._blocks for block in blocks if block is not None
+                for column in block.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows = {}
+            self._codes = []
+            self._counts = np.zeros(self.code_chunk_size, dtype=np.int64)
+            self._blocks = []
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._rows
+
+    # 转换成旧版的行格式 [ %H:%M:%S, 成交价格, 累计成交量, 卖一价, 卖一量, 买一价, 买一量 ]
+    def to_rows(self, code: str) -> list:
+        ticks = self.get_ticks(code)
+        if ticks is None:
+            return []
+        return ticks_to_rows(ticks)
+
+
+# 列数据或定长记录转换成行格式，价格保留3位小数
+def ticks_to_rows(ticks) -> list:
+    return [
+        list(row) for row in zip(
+            format_tick_times(ticks['time']),
+            np.round(ticks['price'].astype(np.float64), 3).tolist(),
+            ticks['volume'].tolist(),
+            np.round(ticks['askPrice'].astype(np.float64), 3).tolist(),
+            ticks['askVol'].tolist(),
+            np.round(ticks['bidPrice'].astype(np.float64), 3).tolist(),
+            ticks['bidVol'].tolist(),
+        )
+    ]
+
+
+class TickArchiveWriter:
+    """
+    盘中把 TickRingBuffer 的增量按 code 连续写入当日归档
+    每次落盘每个 code 追加一段连续记录，并在索引里登记 (code, offset, count)
+    先写数据再写索引，中途崩溃最多丢掉最后一次未登记的数据段
+    首次写入前把两个文件截断到索引登记过的完整记录，残缺的尾部不会让后续追加错位
+    """
+    def __init__(self, path_prefix: str):
+        self.path_prefix = path_prefix
+        self.path_bin = path_prefix + '.bin'
+        self.path_idx = path_prefix + '.idx'
+        self._flushed: Dict[str, int] = {}          # { code: 已落盘的累计序号 }
+        self._offset: Optional[int] = None          # 下一段数据的记录偏移，None 表示需要从文件恢复
+        self._lock = threading.Lock()
+
+    # 丢弃上次中断留下的残缺索引项和未登记的数据，返回有效记录数
+    def _recover(self) -> int:
+        if not os.path.exists(self.path_idx):
+            if os.path.exists(self.path_bin):
+                os.truncate(self.path_bin, 0)
+            return 0
+
+        index_size = os.path.getsize(self.path_idx) // TICK_INDEX_DTYPE.itemsize * TICK_INDEX_DTYPE.itemsize
+        os.truncate(self.path_idx, index_size)
+
+        records = os.path.getsize(self.path_bin) // TICK_RECORD_DTYPE.itemsize \
+            if os.path.exists(self.path_bin) else 0
+        index = np.fromfile(self.path_idx, dtype=TICK_INDEX_DTYPE)
+        end = index['offset'] + index['count']
+        complete = end <= records
+        if not complete.all():  # 索引已登记但数据没写完，丢弃这些索引项
+            index = index[complete]
+            end = end[complete]
+            with open(self.path_idx, 'wb') as w:
+                w.write(index.tobytes())
+
+        offset = int(end.max()) if len(end) > 0 else 0
+        if os.path.exists(self.path_bin):
+            os.truncate(self.path_bin, offset * TICK_RECORD_DTYPE.itemsize)
+        return offset
+
+    # 返回本次写入的记录数
+    def flush(self, buffer: TickRingBuffer) -> int:
+        with self._lock:
+            if self._offset is None:
+                self._offset = self._recover()
+
+            records = []
+            entries = []
+            offset = self._offset
+
+            for code in buffer.get_codes():
+                ticks, total = buffer.get_ticks_since(code, self._flushed.get(code, 0))
+                self._flushed[code] = total
+                if ticks is None:
+                    continue
+
+                count = len(ticks['time'])
+                block = np.empty(count, dtype=TICK_RECORD_DTYPE)
+                for name in TICK_COLUMNS:
+                    block[name] = ticks[name]
+                records.append(block)
+                entries.append((code.encode(), offset, count))
+                offset += count
+
+            if len(records) == 0:
+                return 0
+
+            self._offset = None  # 写入中途出错时，下次从文件重新恢复
+            with open(self.path_bin, 'ab') as w:
+                w.write(np.concatenate(records).tobytes())
+                w.flush()
+                os.fsync(w.fileno())
+            with open(self.path_idx, 'ab') as w:
+                w.write(np.array(entries, dtype=TICK_INDEX_DTYPE).tobytes())
+            self._offset = offset
+
+            return offset - entries[0][1]
+
+
+class TickArchive:
+    """
+    只读打开当日归档，记录文件使用 np.memmap 映射，读取单个 code 只会触及该 code 所在的页
+    """
+    def __init__(self, path_prefix: str):
+        self.path_bin = path_prefix + '.bin'
+        self.path_idx = path_prefix + '.idx'
+
+        # 只映射完整的记录，忽略写入中断留下的残缺尾部
+        records = os.path.getsize(self.path_bin) // TICK_RECORD_DTYPE.itemsize
+        self._records = np.memmap(self.path_bin, dtype=TICK_RECORD_DTYPE, mode='r', shape=(records,)) \
+            if records > 0 else np.empty(0, dtype=TICK_RECORD_DTYPE)
+        index_size = os.path.getsize(self.path_idx) // TICK_INDEX_DTYPE.itemsize
+        index = np.fromfile(self.path_idx, dtype=TICK_INDEX_DTYPE, count=index_size)
+
+        self._segments: Dict[str, List[tuple]] = {}
+        for code, offset, count in index.tolist():
+            if offset + count > len(self._records):
+                continue  # 数据段未完整写入
+            self._segments.setdefault(code.decode(), []).append((offset, count))
+
+    def get_codes(self) -> List[str]:
+        return list(self._segments.keys())
+
+    def get_ticks(self, code: str) -> Optional[np.ndarray]:
+        segments = self._segments.get(code)
+        if segments is None:
+            return None
+        if len(segments) == 1:
+            offset, count = segments[0]
+            return self._records[offset:offset + count]
+        return np.concatenate([self._records[offset:offset + count] for offset, count in segments])
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._segments
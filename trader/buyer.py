@@ -54,16 +54,24 @@ class BaseBuyer:
                     remark=remark,
                     strategy_name=self.strategy_name)
 
-            if log:
-                logging.warning(f'{buy_type}委托 {code} \t现价:{price:.3f} {volume}股')
+            def record():
+                if log:
+                    logging.warning(f'{buy_type}委托 {code} \t现价:{price:.3f} {volume}股')
 
-            if self.delegate.callback is not None:
-                self.delegate.callback.record_order(
-                    order_time=datetime.datetime.now().timestamp(),
-                    code=code,
-                    price=price,
-                    volume=volume,
-                    side=f'{buy_type}委托',
-                    remark=remark)
+                if self.delegate.callback is not None:
+                    self.delegate.callback.record_order(
+                        order_time=order_time,
+                        code=code,
+                        price=price,
+                        volume=volume,
+                        side=f'{buy_type}委托',
+                        remark=remark)
+
+            order_time = datetime.datetime.now().timestamp()
+            batch = self.delegate.current_batch()
+            if batch is not None:
+                batch.defer(record)  # 批量下单时等整批提交完再记录
+            else:
+                record()
         else:
             print(f'{code} 挂单买量为0，不委托')
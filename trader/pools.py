@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
-from typing import Set, Callable
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Set, Callable, Dict, List, Tuple
 
 from tools.utils_basic import symbol_to_code
 from tools.utils_cache import get_prefixes_stock_codes, get_index_constituent_codes
@@ -39,26 +42,46 @@ class StockPool:
     def refresh_black(self):
         self.cache_blacklist.clear()
 
+    # 板块成分股请求失败时白名单会变小，重试后仍然失败的板块需要通知
+    def report_failed_sections(self, kind: str, failed: List[str]):
+        if len(failed) == 0:
+            return
+        print(f'{kind}成分股获取失败 {len(failed)} 个: {failed}')
+        if self.ding_messager is not None:
+            self.ding_messager.send_text(
+                f'[{self.account_id}]{self.strategy_name} {kind}成分股获取失败{len(failed)}个\n'
+                f'{failed}')
+
     def refresh_white(self):
         self.cache_whitelist.clear()
 
     # 删除不符合模式和没有缓存的票池
-    def filter_white_list_by_selector(self, selector: Callable, cache_history: dict[str, pd.DataFrame]):
-        remove_list = []
+    # processes > 1 时用进程池并行预筛，selector 必须是模块级函数才能传给子进程
+    def filter_white_list_by_selector(
+        self,
+        selector: Callable,
+        cache_history: dict[str, pd.DataFrame],
+        processes: int = 1,
+        chunk_size: int = 200,
+        progress: Callable[[int, int], None] = None,    # 每完成一个 chunk 回调 (已完成数量, 总数)
+    ):
         print('filtering...', end='')
-
-        i = 0
-        for code in self.cache_whitelist:
-            i += 1
-            if i % 200 == 0:
-                print(f'{i}.', end='')
-            if code in cache_history:
-                df = selector(cache_history[code], code, None)  # 预筛公式默认不需要使用quote所以传None
-                if not df['PASS'].values[-1]:
-                    remove_list.append(code)
-            else:
-                remove_list.append(code)
-
+        if progress is None:
+            progress = print_filter_progress
+
+        codes = sorted(code for code in self.cache_whitelist if code in cache_history)
+        if processes > 1 and len(codes) > chunk_size:
+            passes = filter_codes_parallel(selector, cache_history, codes, processes, chunk_size, progress)
+        else:
+            passes = []
+            for i in range(0, len(codes), chunk_size):
+                for code in codes[i:i + chunk_size]:
+                    df = selector(cache_history[code], code, None)  # 预筛公式默认不需要使用quote所以传None
+                    passes.append(bool(df['PASS'].values[-1]))
+                progress(len(passes), len(codes))
+
+        passed = {code for code, ok in zip(codes, passes) if ok}
+        remove_list = sorted(self.cache_whitelist.difference(passed))
         for code in remove_list:
             self.cache_whitelist.discard(code)
 
@@ -68,6 +91,84 @@ class StockPool:
             self.ding_messager.send_text(f'[{self.account_id}]{self.strategy_name}:筛除{len(remove_list)}支\n')
 
 
+def print_filter_progress(done: int, total: int) -> None:
+    print(f'{done}.', end='')
+
+
+# --------------------------------
+# 并行预筛：所有票的日线首尾相接放进共享内存，子进程按 (code, offset, count) 自己切片构造 DataFrame
+# 每个任务只传一组 code 和下标，不再逐个 pickle DataFrame；结果按 codes 的顺序返回
+# --------------------------------
+_shared_columns: Dict[str, np.ndarray] = {}
+_shared_blocks: List[shared_memory.SharedMemory] = []
+
+
+def filter_codes_parallel(
+    selector: Callable,
+    cache_history: dict[str, pd.DataFrame],
+    codes: List[str],
+    processes: int,
+    chunk_size: int,
+    progress: Callable[[int, int], None],
+) -> List[bool]:
+    names = list(cache_history[codes[0]].columns)
+    has_column = hasattr(cache_history, 'column')  # HistoryView 可以不构造 DataFrame 直接取列
+
+    arrays = {name: [] for name in names}
+    layout: List[Tuple[str, int, int]] = []
+    offset = 0
+    for code in codes:
+        for name in names:
+            array = cache_history.column(code, name) if has_column else cache_history[code][name].values
+            arrays[name].append(array.astype(np.int32) if name == 'datetime' else array)
+        count = len(arrays[names[0]][-1])
+        layout.append((code, offset, count))
+        offset += count
+
+    blocks = []
+    meta = {}
+    try:
+        for name in names:
+            array = np.concatenate(arrays[name])
+            block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            blocks.append(block)
+            meta[name] = (block.name, array.dtype.str, len(array))
+        del arrays
+
+        chunks = [layout[i:i + chunk_size] for i in range(0, len(layout), chunk_size)]
+        passes = []
+        with ProcessPoolExecutor(max_workers=processes, initializer=_attach_shared, initargs=(meta,)) as executor:
+            for result in executor.map(_select_chunk, [selector] * len(chunks), chunks):
+                passes.extend(result)
+                progress(len(passes), len(codes))
+        return passes
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+
+def _attach_shared(meta: Dict[str, Tuple[str, str, int]]) -> None:
+    for name, (block_name, dtype, length) in meta.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _shared_blocks.append(block)
+        _shared_columns[name] = np.ndarray(length, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _select_chunk(selector: Callable, chunk: List[Tuple[str, int, int]]) -> List[bool]:
+    passes = []
+    for code, offset, count in chunk:
+        df = pd.DataFrame({
+            name: array[offset:offset + count].astype(str).astype(object) if name == 'datetime'
+            else array[offset:offset + count].copy()
+            for name, array in _shared_columns.items()
+        })
+        df = selector(df, code, None)
+        passes.append(bool(df['PASS'].values[-1]))
+    return passes
+
+
 # -----------------------
 # Black Empty
 # -----------------------
@@ -204,7 +305,11 @@ class StocksPoolWhitePrefixesIndustry(StocksPoolBlackWencai):
             self.ding_messager.send_text(
                 f'[{self.account_id}]{self.strategy_name} 行业板块\n'
                 f'{section_names}')
-        t_white_codes = get_dfcf_industry_stock_codes(section_names)
+        t_white_codes, failed = get_dfcf_industry_stock_codes(section_names)
+        if len(failed) > 0:
+            retry_codes, failed = get_dfcf_industry_stock_codes(failed)
+            t_white_codes.update(retry_codes)
+        self.report_failed_sections('行业板块', failed)
 
         filter_codes = [code for code in t_white_codes if code[:2] in self.white_prefixes]
         self.cache_whitelist.update(filter_codes)
@@ -223,6 +328,10 @@ class StocksPoolWhitePrefixesConcept(StocksPoolBlackWencai):
             self.ding_messager.send_text(
                 f'[{self.account_id}]{self.strategy_name} 概念板块\n'
                 f'{section_names}')
-        t_white_codes = get_ths_concept_stock_codes(section_names)
+        t_white_codes, failed = get_ths_concept_stock_codes(section_names)
+        if len(failed) > 0:
+            retry_codes, failed = get_ths_concept_stock_codes(failed)
+            t_white_codes.update(retry_codes)
+        self.report_failed_sections('概念板块', failed)
         filter_codes = [code for code in t_white_codes if code[:2] in self.white_prefixes]
         self.cache_whitelist.update(filter_codes)
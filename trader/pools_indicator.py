@@ -1,21 +1,102 @@
+import os
+import time
 import datetime
 import akshare as ak
 
 from mytt.MyTT_advance import *
+from tools.utils_cache import load_pickle, save_pickle
 
 
-def get_ma_trend_indicator(
-    symbol: str = '000985',
-    p: int = 5,
-) -> (bool, dict):
-    end_dt = datetime.datetime.now() - datetime.timedelta(days=0)
-    start_dt = end_dt - datetime.timedelta(days=250)  # EMA 时间必须够长
+INDEX_CACHE_PATH = './_cache/_index_bars'   # 指数日线缓存，每个指数一个文件，多个策略进程共用
+INDEX_HISTORY_DAYS = 250                    # EMA 时间必须够长
+INDEX_LOCK_TIMEOUT = 60.0                   # 等待其他进程下载的最长时间（秒）
+INDEX_LOCK_STALE = 300.0                    # 锁文件超过该时长未释放视为持有者异常退出，须明显长于等待时间
+
+
+# --------------------------------
+# 指数日线的文件缓存：{'fetched': 上次请求时间, 'start': 完整下载时请求的起始日期, 'df': 全部已缓存日线}
+#   起始日期常落在周末节假日，第一根K线会晚于它，覆盖范围按请求的起始日期判断，不按第一根K线
+#   盘前请求过或收盘后请求过的当日缓存直接使用，否则只下载最后一根之后的尾部（重叠一根，盘中覆盖未走完的K线）
+#   同一时刻只有一个进程在下载，其他进程等待 .lock 释放后直接读缓存
+# --------------------------------
+def _is_fresh(fetched: datetime.datetime, now: datetime.datetime) -> bool:
+    if fetched.date() != now.date():
+        return False
+    return now.strftime('%H:%M') < '09:15' or fetched.strftime('%H:%M') >= '15:05'
+
+
+def _acquire_file_lock(path: str, timeout: float = INDEX_LOCK_TIMEOUT, stale: float = INDEX_LOCK_STALE) -> bool:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale:  # 持有者异常退出留下的锁
+                    os.remove(path)
+                    continue
+            except FileNotFoundError:  # 持有者刚释放，或其他等待者已清理过期锁
+                continue
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.2)
+
+
+def _fetch_index_bars(symbol: str, start: datetime.datetime, end: datetime.datetime) -> pd.DataFrame:
     df = ak.index_zh_a_hist(
         symbol=symbol,
         period="daily",
-        start_date=start_dt.strftime('%Y%m%d'),
-        end_date=end_dt.strftime('%Y%m%d'),
+        start_date=start.strftime('%Y%m%d'),
+        end_date=end.strftime('%Y%m%d'),
     )
+    df['日期'] = df['日期'].astype(str)
+    return df
+
+
+def get_index_daily_bars(symbol: str, days: int = INDEX_HISTORY_DAYS) -> pd.DataFrame:
+    now = datetime.datetime.now()
+    start_date = (now - datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+    path = f'{INDEX_CACHE_PATH}/{symbol}.pkl'
+    os.makedirs(INDEX_CACHE_PATH, exist_ok=True)
+
+    def covered_start(cached: dict) -> str:
+        return cached.get('start', cached['df']['日期'].values[0] if len(cached['df']) > 0 else '9999-99-99')
+
+    def is_usable(cached: dict) -> bool:
+        return cached is not None and _is_fresh(cached['fetched'], now) and covered_start(cached) <= start_date
+
+    cached = load_pickle(path)
+    if not is_usable(cached):
+        locked = _acquire_file_lock(path + '.lock')
+        try:
+            cached = load_pickle(path)  # 等锁期间可能已被其他进程更新
+            if not is_usable(cached):
+                if cached is None or len(cached['df']) == 0 or covered_start(cached) > start_date:
+                    df = _fetch_index_bars(symbol, now - datetime.timedelta(days=days), now)
+                    fetched_start = start_date
+                else:
+                    df = cached['df']
+                    last_date = df['日期'].values[-1]
+                    tail = _fetch_index_bars(symbol, datetime.datetime.strptime(last_date, '%Y-%m-%d'), now)
+                    df = pd.concat([df[df['日期'] < last_date], tail], ignore_index=True)
+                    fetched_start = covered_start(cached)
+                cached = {'fetched': now, 'start': fetched_start, 'df': df}
+                save_pickle(path + '.tmp', cached)
+                os.replace(path + '.tmp', path)
+        finally:
+            if locked:
+                os.remove(path + '.lock')
+
+    df = cached['df']
+    return df[df['日期'] >= start_date].reset_index(drop=True)
+
+
+def get_ma_trend_indicator(
+    symbol: str = '000985',
+    p: int = 5,
+) -> (bool, dict):
+    df = get_index_daily_bars(symbol)
     close = df['收盘'].values
     df['MA5'] = MA(close, p)
     df['SAFE'] = df['MA5'] < df['收盘']
@@ -29,14 +110,7 @@ def get_macd_trend_indicator(
     ap: int = 7,
     sa: int = 5,
 ) -> (bool, dict):
-    end_dt = datetime.datetime.now() - datetime.timedelta(days=0)
-    start_dt = end_dt - datetime.timedelta(days=250)  # EMA 时间必须够长
-    df = ak.index_zh_a_hist(
-        symbol=symbol,
-        period="daily",
-        start_date=start_dt.strftime('%Y%m%d'),
-        end_date=end_dt.strftime('%Y%m%d'),
-    )
+    df = get_index_daily_bars(symbol)
     close = df['收盘'].values
 
     # DIF = EMA(CLOSE, 10) - EMA(CLOSE, 22)
@@ -1,11 +1,84 @@
-import time
+import os
+import shutil
+import hashlib
 import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
 
 import pywencai
 import akshare as ak
 
 from mytt.MyTT_advance import *
 from tools.utils_basic import pd_show_all, symbol_to_code
+from tools.utils_cache import load_pickle, save_pickle
+from tools.utils_download import TokenBucket
+
+
+SECTION_CACHE_PATH = './_cache/_sections'     # 板块接口的当日响应缓存，按日期分目录
+SECTION_FETCH_LIMITS = {'rate': 2.0, 'burst': 2, 'workers': 4}
+
+_section_bucket: Optional[TokenBucket] = None
+_section_bucket_lock = threading.Lock()
+
+
+# 进程内共用的板块限流令牌桶，按当前的 SECTION_FETCH_LIMITS 创建，限额修改后下次调用时重建
+def get_section_bucket() -> TokenBucket:
+    global _section_bucket
+    with _section_bucket_lock:
+        rate, burst = SECTION_FETCH_LIMITS['rate'], SECTION_FETCH_LIMITS['burst']
+        if _section_bucket is None or _section_bucket.rate != rate or _section_bucket.capacity != burst:
+            _section_bucket = TokenBucket(rate, burst)
+        return _section_bucket
+
+
+# --------------------------------
+# 板块接口的当日缓存调用：以 (函数名, 参数) 为 key 存在当天的目录里，同一天内多个票池、多个策略进程共用
+# 没有命中时先拿限流令牌再请求，旧日期的目录在第一次写入时清理
+# --------------------------------
+def cached_section_call(func: Callable, bucket: TokenBucket = None, **kwargs):
+    today = datetime.datetime.now().strftime('%Y%m%d')
+    key = f'{func.__module__}.{func.__qualname__}:{sorted(kwargs.items())}'
+    path = f'{SECTION_CACHE_PATH}/{today}/{hashlib.md5(key.encode()).hexdigest()}.pkl'
+
+    try:
+        cached = load_pickle(path) if os.path.exists(path) else None
+    except Exception:
+        cached = None   # 文件损坏当作没有命中，重新请求后覆盖
+    if cached is not None and cached.get('key') == key:
+        return cached['value']
+
+    (bucket or get_section_bucket()).acquire()
+    value = func(**kwargs)
+    if value is not None:
+        if not os.path.exists(f'{SECTION_CACHE_PATH}/{today}'):
+            os.makedirs(f'{SECTION_CACHE_PATH}/{today}', exist_ok=True)
+            for name in os.listdir(SECTION_CACHE_PATH):
+                if name != today:
+                    shutil.rmtree(f'{SECTION_CACHE_PATH}/{name}', ignore_errors=True)
+        # 其他进程可能同时在读，先写临时文件再原子替换，读到的要么是旧文件要么是完整的新文件
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        save_pickle(temp_path, {'key': key, 'value': value})
+        os.replace(temp_path, path)
+    return value
+
+
+# 并发拉取多个板块，结果按 kwargs_list 的顺序返回，失败的位置为 None
+def fetch_sections(
+    func: Callable,
+    kwargs_list: List[dict],
+    max_workers: int = None,
+    bucket: TokenBucket = None,
+) -> List[Optional[object]]:
+    def task(kwargs: dict):
+        try:
+            return cached_section_call(func, bucket=bucket, **kwargs)
+        except Exception as e:
+            print(f'[{func.__name__}] {kwargs} 请求失败: {e}')
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers or SECTION_FETCH_LIMITS['workers']) as executor:
+        return list(executor.map(task, kwargs_list))
 
 
 def select_industry_sections(
@@ -40,6 +113,8 @@ def select_dfcf_industry_sections(
     start_date: str = None,
     end_date: str = None,
     adjust: str = 'qfq',
+    max_workers: int = None,
+    bucket: TokenBucket = None,
 ):
     # 根据指标筛选板块
     now = datetime.datetime.now()
@@ -48,18 +123,21 @@ def select_dfcf_industry_sections(
     if end_date is None:
         end_date = (now - datetime.timedelta(days=1)).strftime("%Y%m%d")
 
+    dfs = fetch_sections(ak.stock_board_industry_hist_em, [{
+        'symbol': section_name,
+        'start_date': start_date,
+        'end_date': end_date,
+        'period': '日k',
+        'adjust': adjust,
+    } for section_name in section_names], max_workers=max_workers, bucket=bucket)
+
     section_result = []
-    for section_name in section_names:
+    for section_name, df in zip(section_names, dfs):
         print(section_name, end=' ')
+        if df is None:
+            continue
 
-        time.sleep(1)
-        df = ak.stock_board_industry_hist_em(
-            symbol=section_name,
-            start_date=start_date,
-            end_date=end_date,
-            period="日k",
-            adjust=adjust,
-        ).rename(columns={
+        df = df.rename(columns={
             '日期': 'datetime',
             '开盘': 'open',
             '收盘': 'close',
@@ -102,14 +180,25 @@ def get_dfcf_industry_sections(limit: int = 2000) -> list[str]:
     return section_names
 
 
-def get_dfcf_industry_stock_codes(section_result: list[str]) -> set:
+# 返回 (成分股, 请求失败的板块)，失败的板块由调用方重试或通知
+def get_dfcf_industry_stock_codes(
+    section_result: list[str],
+    max_workers: int = None,
+    bucket: TokenBucket = None,
+) -> Tuple[set, List[str]]:
+    dfs = fetch_sections(ak.stock_board_industry_cons_em, [
+        {'symbol': section_name} for section_name in section_result], max_workers=max_workers, bucket=bucket)
+
     stock_list = set()
-    for section_name in section_result:
-        df = ak.stock_board_industry_cons_em(symbol=section_name)
+    failed = []
+    for section_name, df in zip(section_result, dfs):
+        if df is None:
+            failed.append(section_name)
+            continue
         codes = {symbol_to_code(symbol) for symbol in df['代码'].values}
         stock_list.update(codes)
 
-    return stock_list
+    return stock_list, failed
 
 
 def get_ths_concept_sections(limit: int = 2000, period: int = 0):
@@ -146,16 +235,26 @@ def get_ths_concept_sections(limit: int = 2000, period: int = 0):
     return section_names.values
 
 
-def get_ths_concept_stock_codes(section_names: list[str]):
+# 返回 (成分股, 请求失败的板块)，失败的板块由调用方重试或通知
+def get_ths_concept_stock_codes(
+    section_names: list[str],
+    max_workers: int = None,
+    bucket: TokenBucket = None,
+) -> Tuple[set, List[str]]:
+    dfs = fetch_sections(pywencai.get, [
+        {'query': f'{section_name}概念板块', 'perpage': 100, 'loop': True} for section_name in section_names],
+        max_workers=max_workers, bucket=bucket)
+
     stock_list = set()
-    for section_name in section_names:
-        query = f'{section_name}概念板块'
-        df = pywencai.get(query=query, perpage=100, loop=True)
-        if df is not None and type(df) != dict and df.shape[0] > 0:
+    failed = []
+    for section_name, df in zip(section_names, dfs):
+        if df is None:
+            failed.append(section_name)
+        elif type(df) != dict and df.shape[0] > 0:
             codes = df['股票代码'].values
             stock_list.update(codes)
 
-    return stock_list
+    return stock_list, failed
 
 
 def get_sw_sections():
@@ -190,8 +289,8 @@ def test_dfcf():
     sections = get_dfcf_industry_sections()
     print(sections)
 
-    codes = get_dfcf_industry_stock_codes(sections)
-    print(len(codes))
+    codes, failed = get_dfcf_industry_stock_codes(sections)
+    print(len(codes), failed)
     print({code for code in codes if code[:2] in {'00', '60'}})
 
 
@@ -199,8 +298,8 @@ def test_ths():
     names = get_ths_concept_sections()
     print(names)
 
-    codes = get_ths_concept_stock_codes(names)
-    print(codes)
+    codes, failed = get_ths_concept_stock_codes(names)
+    print(codes, failed)
 
 
 if __name__ == '__main__':
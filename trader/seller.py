@@ -1,5 +1,6 @@
 import datetime
 import logging
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Optional
 
@@ -7,6 +8,66 @@ from xtquant.xttype import XtPosition
 
 from delegate.base_delegate import BaseDelegate
 from tools.utils_basic import get_limit_down_price
+from trader.seller_indicators import IndicatorCache
+
+
+# --------------------------------
+# 一次卖出扫描的全部持仓，按行整理成数组，供各卖出组件整体计算掩码
+# 只收录有行情且有持仓天数记录的持仓，和 execute_sell 的过滤条件一致
+# max_price 没有记录的行为 nan，用 has_max 区分
+# --------------------------------
+class SellBatch:
+    def __init__(
+        self,
+        quotes: Dict[str, Dict],
+        positions: List[XtPosition],
+        held_days: Dict[str, int],
+        max_prices: Dict[str, float],
+        cache_history: Dict[str, pd.DataFrame],
+    ):
+        self.positions = [p for p in positions if (p.stock_code in quotes) and (p.stock_code in held_days)]
+        self.codes = [p.stock_code for p in self.positions]
+        self.quotes = [quotes[code] for code in self.codes]
+        self.max_prices = [max_prices[code] if code in max_prices else None for code in self.codes]
+        self.histories = [cache_history[code] if code in cache_history else None for code in self.codes]
+
+        self.held = np.array([held_days[code] for code in self.codes], dtype=np.int64)
+        self.cost = np.array([p.open_price for p in self.positions], dtype=np.float64)
+        self.price = self.column('lastPrice')
+        self.has_max = np.array([m is not None for m in self.max_prices], dtype=bool)
+        self.max_price = np.array([np.nan if m is None else m for m in self.max_prices], dtype=np.float64)
+
+        self.cache_columns: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def column(self, field: str) -> np.ndarray:
+        return np.array([quote[field] for quote in self.quotes], dtype=np.float64)
+
+    # 与逐只判断时 round(quote[field], 3) 的结果一致，用 Python 的 round 而不是 np.round
+    def rounded(self, field: str) -> np.ndarray:
+        key = field + '_r3'
+        if key not in self.cache_columns:
+            self.cache_columns[key] = np.array([round(quote[field], 3) for quote in self.quotes], dtype=np.float64)
+        return self.cache_columns[key]
+
+    def quote_column(self, field: str) -> np.ndarray:
+        if field not in self.cache_columns:
+            self.cache_columns[field] = self.column(field)
+        return self.cache_columns[field]
+
+
+# 多个按优先级排列的 (掩码, 卖出备注)，前面命中的行不再被后面的覆盖，返回 { 行号: 备注 }
+def mask_remarks(*hits) -> Dict[int, str]:
+    remarks = {}
+    for mask, remark in hits:
+        if not mask.any():
+            continue
+        for i in np.flatnonzero(mask).tolist():
+            if i not in remarks:
+                remarks[i] = remark
+    return dict(sorted(remarks.items()))
 
 
 class BaseSeller:
@@ -14,6 +75,7 @@ class BaseSeller:
         self.strategy_name = strategy_name
         self.delegate = delegate
         self.order_premium = parameters.order_premium
+        self.indicators = IndicatorCache()  # 持仓股的增量指标缓存
 
     def order_sell(self, code, quote, volume, remark, log=True) -> None:
         # TODO: 20cm
@@ -36,17 +98,25 @@ class BaseSeller:
                     remark=remark,
                     strategy_name=self.strategy_name)
 
-            if log:
-                logging.warning(f'{remark} {code}\t现价:{order_price:.3f} {volume}股')
+            def record():
+                if log:
+                    logging.warning(f'{remark} {code}\t现价:{order_price:.3f} {volume}股')
 
-            if self.delegate.callback is not None:
-                self.delegate.callback.record_order(
-                    order_time=datetime.datetime.now().timestamp(),
-                    code=code,
-                    price=order_price,
-                    volume=volume,
-                    side='卖出委托',
-                    remark=remark)
+                if self.delegate.callback is not None:
+                    self.delegate.callback.record_order(
+                        order_time=order_time,
+                        code=code,
+                        price=order_price,
+                        volume=volume,
+                        side='卖出委托',
+                        remark=remark)
+
+            order_time = datetime.datetime.now().timestamp()
+            batch = self.delegate.current_batch()
+            if batch is not None:
+                batch.defer(record)  # 批量下单时等整批提交完再记录
+            else:
+                record()
 
         else:
             print(f'{code} 挂单卖量为0，不委托')
@@ -61,21 +131,26 @@ class BaseSeller:
         max_prices: Dict[str, float],
         cache_history: Dict[str, pd.DataFrame]
     ) -> None:
-        for position in positions:
-            code = position.stock_code
+        with self.delegate.order_batch(f'{self.strategy_name}卖出'):
+            for position in positions:
+                code = position.stock_code
 
-            # 如果有数据且有持仓时间记录
-            if (code in quotes) and (code in held_days):
-                self.check_sell(
-                    code=code,
-                    quote=quotes[code],
-                    curr_date=curr_date,
-                    curr_time=curr_time,
-                    position=position,
-                    held_day=held_days[code],
-                    max_price=max_prices[code] if code in max_prices else None,
-                    history=cache_history[code] if code in cache_history else None,
-                )
+                # 如果有数据且有持仓时间记录
+                if (code in quotes) and (code in held_days):
+                    self.check_sell(
+                        code=code,
+                        quote=quotes[code],
+                        curr_date=curr_date,
+                        curr_time=curr_time,
+                        position=position,
+                        held_day=held_days[code],
+                        max_price=max_prices[code] if code in max_prices else None,
+                        history=cache_history[code] if code in cache_history else None,
+                    )
+
+    # 该分钟内 check_sell 是否可能卖出，卖出组合据此在构造时预先生成每分钟的组件表
+    def is_active(self, curr_time: str) -> bool:
+        return True
 
     def check_sell(
         self, code: str, quote: Dict, curr_date: str, curr_time: str,
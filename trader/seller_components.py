@@ -2,12 +2,11 @@ import logging
 
 from mytt.MyTT_advance import *
 # from mytt.MyTT_custom import *
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from xtquant.xttype import XtPosition
 from tools.utils_basic import get_limit_up_price
-from tools.utils_remote import append_ak_quote_dict
-from trader.seller import BaseSeller
+from trader.seller import BaseSeller, SellBatch, mask_remarks
 
 
 # --------------------------------
@@ -22,6 +21,9 @@ class HardSeller(BaseSeller):
         self.risk_limit = parameters.risk_limit
         self.risk_tight = parameters.risk_tight
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.hard_time_range[0] <= curr_time < self.hard_time_range[1]
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -39,6 +41,17 @@ class HardSeller(BaseSeller):
                 return True
         return False
 
+    def check_sell_batch(self, batch: SellBatch, curr_time: str, pending: np.ndarray) -> Dict[int, str]:
+        if not (self.hard_time_range[0] <= curr_time < self.hard_time_range[1]):
+            return {}
+
+        active = pending & (batch.held > 0)
+        switch_lower = batch.cost * (self.risk_limit + batch.held * self.risk_tight)
+        return mask_remarks(
+            (active & (batch.price <= switch_lower), f'跌{int((1 - self.risk_limit) * 100)}%硬止损'),
+            (active & (batch.price >= batch.cost * self.earn_limit), f'涨{int((self.earn_limit - 1) * 100)}%硬止盈'),
+        )
+
 
 # --------------------------------
 # 盈利未达预期则卖出换仓
@@ -51,6 +64,9 @@ class SwitchSeller(BaseSeller):
         self.switch_hold_days = parameters.switch_hold_days
         self.switch_demand_daily_up = parameters.switch_demand_daily_up
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.switch_time_range[0] <= curr_time < self.switch_time_range[1]
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -65,6 +81,16 @@ class SwitchSeller(BaseSeller):
                 return True
         return False
 
+    def check_sell_batch(self, batch: SellBatch, curr_time: str, pending: np.ndarray) -> Dict[int, str]:
+        if not (self.switch_time_range[0] <= curr_time < self.switch_time_range[1]):
+            return {}
+
+        switch_upper = batch.cost * (1 + batch.held * self.switch_demand_daily_up)
+        return mask_remarks(
+            (pending & (batch.held >= self.switch_hold_days) & (batch.price < switch_upper),
+             f'{self.switch_hold_days}日换仓卖单'),
+        )
+
 
 # --------------------------------
 # 历史最高价回落比例止盈
@@ -76,6 +102,9 @@ class FallSeller(BaseSeller):
         self.fall_time_range = parameters.fall_time_range
         self.fall_from_top = parameters.fall_from_top
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.fall_time_range[0] <= curr_time < self.fall_time_range[1]
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -96,6 +125,25 @@ class FallSeller(BaseSeller):
                         return True
         return False
 
+    def check_sell_batch(self, batch: SellBatch, curr_time: str, pending: np.ndarray) -> Dict[int, str]:
+        if not (self.fall_time_range[0] <= curr_time < self.fall_time_range[1]):
+            return {}
+
+        active = pending & batch.has_max & (batch.held > 0)
+        hits = []
+        for inc_min, inc_max, fall_threshold in self.fall_from_top:  # 逐级回落卖出，先命中的级别优先
+            hit = active & (batch.cost * inc_min <= batch.max_price) & (batch.max_price < batch.cost * inc_max) \
+                & (batch.price < batch.max_price * (1 - fall_threshold))
+            active &= ~hit
+            hits.append((hit, f'涨{int((inc_min - 1) * 100)}%回落{int(fall_threshold * 100)}%'))
+            if not hit.any():
+                continue
+            for i in np.flatnonzero(hit).tolist():
+                logging.warning(f'[Sell]'
+                                f'cost_p:{batch.positions[i].open_price} max_p:{batch.max_prices[i]} '
+                                f'inc_min:{inc_min} inc_max:{inc_max}')
+        return mask_remarks(*hits)
+
 
 # --------------------------------
 # 浮盈回撤百分止盈
@@ -107,6 +155,9 @@ class ReturnSeller(BaseSeller):
         self.return_time_range = parameters.return_time_range
         self.return_of_profit = parameters.return_of_profit
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.return_time_range[0] <= curr_time < self.return_time_range[1]
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -127,6 +178,25 @@ class ReturnSeller(BaseSeller):
                         return True
         return False
 
+    def check_sell_batch(self, batch: SellBatch, curr_time: str, pending: np.ndarray) -> Dict[int, str]:
+        if not (self.return_time_range[0] <= curr_time < self.return_time_range[1]):
+            return {}
+
+        active = pending & batch.has_max & (batch.held > 0)
+        hits = []
+        for inc_min, inc_max, fall_percentage in self.return_of_profit:  # 逐级回落止盈，先命中的级别优先
+            hit = active & (batch.cost * inc_min <= batch.max_price) & (batch.max_price < batch.cost * inc_max) \
+                & (batch.price < batch.max_price - (batch.max_price - batch.cost) * fall_percentage)
+            active &= ~hit
+            hits.append((hit, f'涨{int((inc_min - 1) * 100)}%回撤{int(fall_percentage * 100)}%'))
+            if not hit.any():
+                continue
+            for i in np.flatnonzero(hit).tolist():
+                logging.warning(f'[Sell]'
+                                f'cost_p:{batch.positions[i].open_price} max_p:{batch.max_prices[i]} '
+                                f'inc_min:{inc_min} inc_max:{inc_max}')
+        return mask_remarks(*hits)
+
 
 # # --------------------------------
 # # 尾盘涨停卖出（暂时先别用）
@@ -199,6 +269,9 @@ class MASeller(BaseSeller):
         self.ma_time_range = parameters.ma_time_range
         self.ma_above = parameters.ma_above
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.ma_time_range[0] <= curr_time < self.ma_time_range[1]
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -208,10 +281,7 @@ class MASeller(BaseSeller):
 
                 curr_price = quote['lastPrice']
 
-                df = append_ak_quote_dict(history, quote, curr_date)
-
-                ma_values = MA(df.close.tail(self.ma_above + 1), self.ma_above)
-                ma_value = ma_values[-1]
+                ma_value = self.indicators.get(code, history).ma(quote, self.ma_above)
 
                 if curr_price <= ma_value - 0.01:
                     self.order_sell(code, quote, sell_volume, f'破{self.ma_above}日均线{ma_value:.2f}')
@@ -230,6 +300,9 @@ class CCISeller(BaseSeller):
         self.cci_upper = parameters.cci_upper
         self.cci_lower = parameters.cci_lower
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.cci_time_range[0] <= curr_time < self.cci_time_range[1] and int(curr_time[-2:]) % 5 == 0
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -237,10 +310,7 @@ class CCISeller(BaseSeller):
             if (held_day > 0) and int(curr_time[-2:]) % 5 == 0:  # 每隔5分钟 CCI 卖出
                 sell_volume = position.can_use_volume
 
-                df = append_ak_quote_dict(history, quote, curr_date)
-
-                df['CCI'] = CCI(df['close'], df['high'], df['low'], 14)
-                cci = df['CCI'].tail(2).values
+                cci = self.indicators.get(code, history).cci(quote, 14)
 
                 if cci[0] > self.cci_lower > cci[1]:  # CCI 下穿
                     self.order_sell(code, quote, sell_volume, f'CCI高于{self.cci_lower}')
@@ -262,6 +332,9 @@ class WRSeller(BaseSeller):
         self.wr_time_range = parameters.wr_time_range
         self.wr_cross = parameters.wr_cross
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.wr_time_range[0] <= curr_time < self.wr_time_range[1] and int(curr_time[-2:]) % 5 == 0
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -269,10 +342,7 @@ class WRSeller(BaseSeller):
             if held_day > 0 and int(curr_time[-2:]) % 5 == 0:  # 每隔5分钟 WR 卖出
                 sell_volume = position.can_use_volume
 
-                df = append_ak_quote_dict(history, quote, curr_date)
-
-                df['WR'] = WR(df['close'], df['high'], df['low'], 14)
-                wr = df['WR'].tail(2).values
+                wr = self.indicators.get(code, history).wr(quote, 14)
 
                 if wr[0] < self.wr_cross < wr[1]:  # WR 上穿
                     self.order_sell(code, quote, sell_volume, f'WR上穿{self.wr_cross}卖')
@@ -292,6 +362,10 @@ class VolumeDropSeller(BaseSeller):
         self.next_volume_dec_minute = parameters.vol_dec_time
         self.next_volume_dec_limit = parameters.vol_dec_limit
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.next_time_range[0] <= curr_time < self.next_time_range[1] \
+            and curr_time == self.next_volume_dec_minute
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -323,6 +397,9 @@ class DropSeller(BaseSeller):
         self.drop_time_range = parameters.drop_time_range
         self.drop_out_limits = parameters.drop_out_limits
 
+    def is_active(self, curr_time: str) -> bool:
+        return self.drop_time_range[0] <= curr_time < self.drop_time_range[1]
+
     def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
                    held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
 
@@ -349,6 +426,30 @@ class DropSeller(BaseSeller):
 
         return False
 
+    def check_sell_batch(self, batch: SellBatch, curr_time: str, pending: np.ndarray) -> Dict[int, str]:
+        if not (self.drop_time_range[0] <= curr_time < self.drop_time_range[1]):
+            return {}
+
+        active = pending & (batch.held > 0) & (batch.price < batch.quote_column('open'))
+        if not active.any():
+            return {}
+
+        o = batch.rounded('open')
+        l = batch.rounded('low')
+        h = batch.rounded('high')
+        c = batch.rounded('lastPrice')
+        active &= (c == l) & (h - o < o - c)  # 下跌过程且实心大于上影线
+
+        last_close = batch.quote_column('lastClose')
+        drop_price = o - c
+        hits = []
+        for inc_min, inc_max, drop_threshold in self.drop_out_limits:  # 逐级高开卖出，先命中的级别优先
+            hit = active & (last_close * inc_min <= o) & (o < last_close * inc_max) \
+                & (drop_price > last_close * drop_threshold)
+            active &= ~hit
+            hits.append((hit, f'高开{int((inc_min - 1) * 100)}跌{int(drop_threshold * 100)}%'))
+        return mask_remarks(*hits)
+
 
 # --------------------------------
 # 上涨过程阻断器
@@ -382,17 +483,11 @@ class UppingBlocker(BaseSeller):
 
         if history is not None:
             if held_day > 0:
-                df = append_ak_quote_dict(history, quote, curr_date)
-
-                _, _, df['MACD'] = MACD(df['close'])
-                macd = df['MACD'].tail(2).values
-
-                close = df['close'].tail(2).values
-                high = df['high'].tail(2).values
-                low = df['low'].tail(2).values
+                indicators = self.indicators.get(code, history)
+                macd = indicators.macd(quote)
 
-                yesterday_price = close[0] + high[0] + low[0]
-                today_price = close[1] + high[1] + low[1]
+                yesterday_price = indicators.close[-1] + indicators.high[-1] + indicators.low[-1]
+                today_price = quote['lastPrice'] + quote['high'] + quote['low']
 
                 if macd[0] < macd[1] and yesterday_price < today_price:  # macd上行 & 价格上行
                     # self.order_sell(code, quote, sell_volume, '上行不卖')
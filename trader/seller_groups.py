@@ -1,104 +1,131 @@
 from trader.seller_components import *
 
 
-class GroupSellers:
-    def __init__(self):
-        pass
-
-    def group_init(self, strategy_name, delegate, parameters):
-        for parent in self.__class__.__bases__:
-            if parent.__name__ != 'GroupSellers':
-                parent.__init__(self, strategy_name, delegate, parameters)
+# 一天内所有的 'HH:MM'，策略传入的 curr_time 都在其中
+DAY_MINUTES = [f'{h:02d}:{m:02d}' for h in range(24) for m in range(60)]
+
+
+# --------------------------------
+# 卖出组合：按顺序排列的卖出组件，对每个持仓先命中的组件卖出，后面的组件不再检查
+#   每个组件是独立的实例，各自从 parameters 读取参数，共用组合的指标缓存
+#   构造时按每个组件的 is_active 生成每分钟的组件表，扫描时只运行当前分钟可能卖出的组件
+#   组合可以直接传 components 构造，也可以像下面的具名组合一样在子类里声明 components
+# --------------------------------
+class GroupSellers(BaseSeller):
+    components: List[type] = []
+
+    def __init__(self, strategy_name, delegate, parameters, components: List[type] = None):
+        BaseSeller.__init__(self, strategy_name, delegate, parameters)
+        if components is None:
+            components = self.components
+        if len(components) == 0:
+            # 兼容按继承写的组合 class G(GroupSellers, HardSeller, ...)，按基类顺序作为组件
+            components = [base for base in self.__class__.__bases__
+                          if issubclass(base, BaseSeller) and not issubclass(base, GroupSellers)]
+        if len(components) == 0:
+            raise ValueError(f'{self.__class__.__name__} 没有卖出组件，请声明 components = [...]')
+
+        self.pipeline: List[BaseSeller] = []
+        for component in components:
+            seller = component(strategy_name, delegate, parameters)
+            seller.indicators = self.indicators
+            self.pipeline.append(seller)
         print('>> 初始化完成')
 
-    def group_check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
-                         held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
-        sold = False
-        for parent in self.__class__.__bases__:
-            if parent.__name__ != 'GroupSellers':
-                if sold:
+        self.minute_table: Dict[str, tuple] = {}
+        shared: Dict[tuple, tuple] = {}  # 相同的组件组合共用一个 tuple
+        for minute in DAY_MINUTES:
+            active = tuple(seller for seller in self.pipeline if seller.is_active(minute))
+            self.minute_table[minute] = shared.setdefault(active, active)
+
+    def active_sellers(self, curr_time: str) -> tuple:
+        active = self.minute_table.get(curr_time)
+        if active is None:  # 不是 'HH:MM' 格式的时间，逐个判断
+            active = tuple(seller for seller in self.pipeline if seller.is_active(curr_time))
+        return active
+
+    def check_sell(self, code: str, quote: Dict, curr_date: str, curr_time: str, position: XtPosition,
+                   held_day: int, max_price: Optional[float], history: Optional[pd.DataFrame]) -> bool:
+        for seller in self.active_sellers(curr_time):
+            if seller.check_sell(code=code, quote=quote, curr_date=curr_date, curr_time=curr_time,
+                                 position=position, held_day=held_day, max_price=max_price, history=history):
+                return True
+        return False
+
+    # 批量卖出：持仓整理成数组，按组件顺序求卖出掩码，和逐只 check_sell 一样先命中的组件卖出
+    # 有 check_sell_batch 的组件整体计算，其余组件（指标类、阻断器）对还没有结论的持仓逐只调用 check_sell
+    def execute_sell(
+        self,
+        quotes: Dict[str, Dict],
+        curr_date: str,
+        curr_time: str,
+        positions: List[XtPosition],
+        held_days: Dict[str, int],
+        max_prices: Dict[str, float],
+        cache_history: Dict[str, pd.DataFrame],
+    ) -> None:
+        active = self.active_sellers(curr_time)
+        if len(active) == 0:
+            return
+
+        batch = SellBatch(quotes, positions, held_days, max_prices, cache_history)
+        if len(batch) == 0:
+            return
+
+        with self.delegate.order_batch(f'{self.strategy_name}卖出'):
+            pending = np.ones(len(batch), dtype=bool)
+            for seller in active:
+                if not pending.any():
                     break
+
+                if hasattr(seller, 'check_sell_batch'):
+                    for i, remark in seller.check_sell_batch(batch, curr_time, pending).items():
+                        pending[i] = False
+                        seller.order_sell(batch.codes[i], batch.quotes[i], batch.positions[i].can_use_volume, remark)
                 else:
-                    sold = parent.check_sell(self, code=code, quote=quote, curr_date=curr_date, curr_time=curr_time,
-                                             position=position, held_day=held_day, max_price=max_price, history=history)
-        return sold
+                    for i in np.flatnonzero(pending).tolist():
+                        if seller.check_sell(code=batch.codes[i], quote=batch.quotes[i], curr_date=curr_date,
+                                             curr_time=curr_time, position=batch.positions[i],
+                                             held_day=int(batch.held[i]), max_price=batch.max_prices[i],
+                                             history=batch.histories[i]):
+                            pending[i] = False
 
 
 # 传统卖出
-class ClassicGroupSeller(GroupSellers, HardSeller, FallSeller, ReturnSeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class ClassicGroupSeller(GroupSellers):
+    components = [HardSeller, FallSeller, ReturnSeller]
 
 
 # 均线卖出
-class ClassicMAGroupSeller(GroupSellers, HardSeller, FallSeller, ReturnSeller, MASeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class ClassicMAGroupSeller(GroupSellers):
+    components = [HardSeller, FallSeller, ReturnSeller, MASeller]
 
 
 # 监控卖出
-class ShieldGroupSeller(GroupSellers, HardSeller, FallSeller, ReturnSeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class ShieldGroupSeller(GroupSellers):
+    components = [HardSeller, FallSeller, ReturnSeller]
 
 
 # Deepseek
-class DeepseekGroupSeller(GroupSellers, HardSeller, SwitchSeller, FallSeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class DeepseekGroupSeller(GroupSellers):
+    components = [HardSeller, SwitchSeller, FallSeller]
 
 
 # 龙抬头
-class LTT2GroupSeller(GroupSellers, HardSeller, OpenDaySeller, SwitchSeller, ReturnSeller, CCISeller, MASeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class LTT2GroupSeller(GroupSellers):
+    components = [HardSeller, OpenDaySeller, SwitchSeller, ReturnSeller, CCISeller, MASeller]
 
 
 # 三倍量突破
-class T3BLGroupSeller(GroupSellers, HardSeller, SwitchSeller, FallSeller, MASeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class T3BLGroupSeller(GroupSellers):
+    components = [HardSeller, SwitchSeller, FallSeller, MASeller]
 
 
 # 平台绿缩
-class PTLSGroupSeller(GroupSellers, HardSeller, UppingBlocker, FallSeller, ReturnSeller, SwitchSeller, MASeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class PTLSGroupSeller(GroupSellers):
+    components = [HardSeller, UppingBlocker, FallSeller, ReturnSeller, SwitchSeller, MASeller]
 
 
 # 金雀突破
-class JQTPGroupSeller(GroupSellers, FallSeller, DropSeller, HardSeller, WRSeller, ReturnSeller):
-    def __init__(self, strategy_name, delegate, parameters):
-        super().__init__()
-        self.group_init(strategy_name, delegate, parameters)
-
-    def check_sell(self, code, quote, curr_date, curr_time, position, held_day, max_price, history):
-        self.group_check_sell(code, quote, curr_date, curr_time, position, held_day, max_price, history)
+class JQTPGroupSeller(GroupSellers):
+    components = [FallSeller, DropSeller, HardSeller, WRSeller, ReturnSeller]
@@ -0,0 +1,108 @@
+from typing import Dict, Tuple
+
+from mytt.MyTT_advance import *
+
+
+# 与 pandas ewm(adjust=False) 的单步递推完全一致，保证和 MyTT.EMA 结果逐位相同
+def ewm_step(prev: float, value: float, alpha: float) -> float:
+    if prev != value:
+        old_wt = 1. - alpha
+        return (old_wt * prev + alpha * value) / (old_wt + alpha)
+    return prev
+
+
+# --------------------------------
+# 单只股票的增量指标状态
+# history 只在首次使用时计算一次，之后每个 quote 只更新"今日"这根K线
+# --------------------------------
+class CodeIndicators:
+    def __init__(self, history: pd.DataFrame):
+        self.history = history
+        self.close = history['close'].values.astype(float)
+        self.high = history['high'].values.astype(float)
+        self.low = history['low'].values.astype(float)
+        self.tp = (self.high + self.low + self.close) / 3  # 与 MyTT.CCI 的 TP 计算顺序一致
+
+        self._ma_sums: Dict[int, float] = {}
+        self._cci_prev: Dict[int, float] = {}
+        self._wr_prev: Dict[int, float] = {}
+        self._macd_prev: Dict[tuple, tuple] = {}
+
+    def __len__(self):
+        return len(self.close)
+
+    # 今日N日均线，前 N-1 日收盘价之和只算一次
+    def ma(self, quote: Dict, n: int) -> float:
+        if len(self) < n - 1:
+            return np.nan
+
+        if n not in self._ma_sums:
+            self._ma_sums[n] = float(np.sum(self.close[len(self) - (n - 1):]))
+        return (self._ma_sums[n] + quote['lastPrice']) / n
+
+    # 返回（昨日CCI，今日CCI）
+    def cci(self, quote: Dict, n: int = 14) -> Tuple[float, float]:
+        if n not in self._cci_prev:
+            self._cci_prev[n] = CCI(self.close, self.high, self.low, n)[-1] if len(self) > 0 else np.nan
+
+        if len(self) < n - 1:
+            return self._cci_prev[n], np.nan
+
+        tp = (quote['high'] + quote['low'] + quote['lastPrice']) / 3
+        window = np.append(self.tp[len(self) - (n - 1):], tp)
+        mean = window.mean()
+        avedev = np.abs(window - mean).mean()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._cci_prev[n], (tp - mean) / (0.015 * avedev)
+
+    # 返回（昨日WR，今日WR）
+    def wr(self, quote: Dict, n: int = 10) -> Tuple[float, float]:
+        if n not in self._wr_prev:
+            self._wr_prev[n] = WR(self.close, self.high, self.low, n)[-1] if len(self) > 0 else np.nan
+
+        if len(self) < n - 1:
+            return self._wr_prev[n], np.nan
+
+        hhv = max(self.high[len(self) - (n - 1):].max(initial=-np.inf), quote['high'])
+        llv = min(self.low[len(self) - (n - 1):].min(initial=np.inf), quote['low'])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wr = (np.float64(hhv) - quote['lastPrice']) / (np.float64(hhv) - llv) * 100
+        return self._wr_prev[n], RD(wr)
+
+    # 返回（昨日MACD，今日MACD），EMA 状态只在首次使用时从历史计算
+    def macd(self, quote: Dict, short: int = 12, long: int = 26, m: int = 9) -> Tuple[float, float]:
+        key = (short, long, m)
+        if key not in self._macd_prev:
+            if len(self) == 0:
+                return np.nan, np.nan
+            ema_short = EMA(self.close, short)
+            ema_long = EMA(self.close, long)
+            dea = EMA(ema_short - ema_long, m)
+            _, _, macd = MACD(self.close, short, long, m)
+            self._macd_prev[key] = (ema_short[-1], ema_long[-1], dea[-1], macd[-1])
+
+        prev_short, prev_long, prev_dea, prev_macd = self._macd_prev[key]
+        close = quote['lastPrice']
+        ema_short = ewm_step(prev_short, close, 2.0 / (1.0 + short))
+        ema_long = ewm_step(prev_long, close, 2.0 / (1.0 + long))
+        dif = ema_short - ema_long
+        dea = ewm_step(prev_dea, dif, 2.0 / (1.0 + m))
+        return prev_macd, RD((dif - dea) * 2)
+
+
+# --------------------------------
+# 按 code 缓存增量指标，cache_history 换成新的 DataFrame 时自动重新计算
+# --------------------------------
+class IndicatorCache:
+    def __init__(self):
+        self._states: Dict[str, CodeIndicators] = {}
+
+    def get(self, code: str, history: pd.DataFrame) -> CodeIndicators:
+        state = self._states.get(code)
+        if state is None or state.history is not history:
+            state = CodeIndicators(history)
+            self._states[code] = state
+        return state
+
+    def clear(self):
+        self._states.clear()